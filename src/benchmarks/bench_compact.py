@@ -0,0 +1,46 @@
+"""
+Benchmarks the memory used to hold a large rule set as a list of Rule tuples versus make.compact.CompactRules, on
+its own and indexed by a BuildGraph.
+
+Usage: python -m benchmarks.bench_compact [RULES]
+"""
+from benchmarks.bench_graph import generate_rules, iter_rules
+from make.compact import CompactRules
+from make.graph import BuildGraph
+import gc
+import sys
+import time
+import tracemalloc
+
+
+def measure(build) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"retained": current, "peak": peak, "time": elapsed}
+
+
+def run(n_rules: int) -> dict:
+    return {
+        "rules": n_rules,
+        "tuples": measure(lambda: generate_rules(n_rules)),
+        # Feed the store from a generator so the tuple list never exists in full
+        "compact": measure(lambda: CompactRules(iter_rules(n_rules))),
+        "graph_tuples": measure(lambda: BuildGraph(generate_rules(n_rules))),
+        "graph_compact": measure(lambda: BuildGraph(CompactRules(iter_rules(n_rules)))),
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    results = run(n)
+    print(f"{'rules':>13}: {results['rules']}")
+    for name in ("tuples", "compact", "graph_tuples", "graph_compact"):
+        r = results[name]
+        print(f"{name:>13}: retained {r['retained'] / 2**20:7.1f} MiB, peak {r['peak'] / 2**20:7.1f} MiB, "
+              f"{r['time'] * 1000:8.1f} ms")
@@ -0,0 +1,68 @@
+"""
+Compares the peak memory of streaming commands.find.descend with collecting all of its results first, on a
+synthetic tree.
+
+Usage: python -m benchmarks.bench_find_memory [FILES] [FILES_PER_DIR]
+
+The default tree has 1,000,000 empty files and takes a while to create. It is built in a temporary directory and
+removed afterwards.
+"""
+from commands.find import descend
+from pathlib import Path
+from typing import Callable
+import tempfile
+import tracemalloc
+import shutil
+import sys
+import os
+import time
+
+
+def generate_tree(root: str, n_files: int, files_per_dir: int = 1000):
+    """
+    Creates `n_files` empty files under root, spread over directories of `files_per_dir` files each.
+    """
+    for i in range(n_files):
+        d = os.path.join(root, f"d{i // files_per_dir}")
+        if i % files_per_dir == 0:
+            os.mkdir(d)
+
+        os.close(os.open(os.path.join(d, f"f{i}.c"), os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def measure(func: Callable[[], int]) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"files": count, "seconds": elapsed, "peak_mb": peak / 2**20}
+
+
+def collect(root: Path) -> int:
+    return len(list(descend(root, None)))
+
+
+def stream(root: Path) -> int:
+    count = 0
+    for _ in descend(root, None):
+        count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    root = tempfile.mkdtemp(prefix="bench_find_")
+    try:
+        generate_tree(root, n_files, files_per_dir)
+
+        for name, func in (("collect", collect), ("stream", stream)):
+            r = measure(lambda: func(Path(root)))
+            print(f"{name:>8}: {r['files']} files  {r['seconds']:7.2f}s  peak {r['peak_mb']:8.1f} MiB")
+    finally:
+        shutil.rmtree(root)
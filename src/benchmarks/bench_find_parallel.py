@@ -0,0 +1,48 @@
+"""
+Measures how commands.find.parallel_descend scales from 1 to 16 workers on a wide tree.
+
+Usage: python -m benchmarks.bench_find_parallel [FILES] [FILES_PER_DIR] [ROOT]
+
+If ROOT is given, the tree is created there (for example on a network filesystem), otherwise in a temporary
+directory. Scaling on a local, warm-cache filesystem is limited by the GIL; the gains come from overlapping I/O.
+"""
+from benchmarks.bench_find_memory import generate_tree
+from commands.find import descend, parallel_descend, expr_from_tokens, tokenize_operands
+import tempfile
+import shutil
+import sys
+import time
+
+WORKERS = [1, 2, 4, 8, 16]
+
+
+def run(root: str, tree) -> list:
+    results = []
+
+    start = time.perf_counter()
+    baseline = sum(1 for _ in descend(root, tree))
+    results.append({"workers": "serial", "matches": baseline, "seconds": time.perf_counter() - start})
+
+    for jobs in WORKERS:
+        start = time.perf_counter()
+        matches = sum(1 for _ in parallel_descend(root, tree, jobs))
+        results.append({"workers": jobs, "matches": matches, "seconds": time.perf_counter() - start})
+
+    return results
+
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    root = tempfile.mkdtemp(prefix="bench_find_", dir=sys.argv[3] if len(sys.argv) > 3 else None)
+    tree = expr_from_tokens(tokenize_operands(["-name", "*1.c"]))
+
+    try:
+        generate_tree(root, n_files, files_per_dir)
+
+        results = run(root, tree)
+        serial = results[0]["seconds"]
+        for r in results:
+            print(f"{r['workers']:>7}: {r['matches']} matches  {r['seconds']:7.3f}s  {serial / r['seconds']:5.2f}x")
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,37 @@
+"""
+Compares predicate calls per second of interpreted find expressions (`evaluate`) and compiled ones (`compile`).
+
+Usage: python -m benchmarks.bench_find_predicate [CALLS]
+"""
+from commands.find import ASTBinOr, tokenize_operands
+from commands.walk import Entry
+import sys
+import time
+
+EXPRESSIONS = [
+    "-name *.py",
+    "-name *.c -o -name *.h -o -name *.py",
+    "( -name a* -o -name b* ) ! -name *.txt -name *z*",
+]
+
+NAMES = ["main.c", "util.h", "setup.py", "abc.txt", "bz.py", "README"]
+
+
+def calls_per_second(predicate, entries, calls: int) -> float:
+    n = len(entries)
+    start = time.perf_counter()
+    for i in range(calls):
+        predicate(entries[i % n])
+
+    return calls / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    entries = [Entry(name, name, 1) for name in NAMES]
+
+    for expression in EXPRESSIONS:
+        tree = ASTBinOr.from_tokens(tokenize_operands(expression.split()))
+        interpreted = calls_per_second(tree.evaluate, entries, calls)
+        compiled = calls_per_second(tree.compile(), entries, calls)
+        print(f"{expression!r:<52} evaluate {interpreted:>12,.0f}/s  compiled {compiled:>12,.0f}/s  {compiled / interpreted:5.1f}x")
@@ -0,0 +1,80 @@
+"""
+Counts the stat system calls made by the pathlib-based traversal that find used to use and by the os.scandir
+based walker, for a name-only expression (`-name '*.c'`) on a synthetic tree.
+
+Usage: python -m benchmarks.bench_find_syscalls [FILES] [FILES_PER_DIR]
+
+Calls are counted at the Python level: os.stat/os.lstat, os.listdir/os.scandir and stat calls made through
+commands.walk.Entry. Type checks that DirEntry answers from d_type make no system call and are not counted.
+"""
+from benchmarks.bench_find_memory import generate_tree
+from commands.find import descend, expr_from_tokens, tokenize_operands
+from commands.walk import Entry
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+import tempfile
+import shutil
+import sys
+import os
+import time
+
+
+def pathlib_descend(path: Path, tree):
+    """
+    The traversal find used before the scandir walker: Path.is_dir() on every entry and Path.iterdir() on directories.
+    """
+    path_stack = [path]
+    i = 0
+    while i < len(path_stack):
+        current_item = path_stack[i]
+        if current_item.is_dir():
+            path_stack.extend(current_item.iterdir())
+        elif tree.evaluate(current_item):
+            yield current_item
+        i += 1
+
+
+def count_calls(func) -> Counter:
+    counts = Counter()
+
+    def counting(name, real):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return real(*args, **kwargs)
+        return wrapper
+
+    fetch = Entry._fetch
+
+    def counting_fetch(self, follow_symlinks):
+        # Entries without a DirEntry (the roots) call os.stat, which is already counted
+        if self._dirent is not None:
+            counts["stat"] += 1
+        return fetch(self, follow_symlinks)
+
+    with mock.patch("os.stat", counting("stat", os.stat)), \
+            mock.patch("os.lstat", counting("stat", os.lstat)), \
+            mock.patch("os.listdir", counting("readdir", os.listdir)), \
+            mock.patch("os.scandir", counting("readdir", os.scandir)), \
+            mock.patch.object(Entry, "_fetch", counting_fetch):
+        start = time.perf_counter()
+        counts["matches"] = sum(1 for _ in func())
+        counts["ms"] = int((time.perf_counter() - start) * 1000)
+
+    return counts
+
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    tree = expr_from_tokens(tokenize_operands(["-name", "*.c"]))
+
+    root = tempfile.mkdtemp(prefix="bench_find_")
+    try:
+        generate_tree(root, n_files, files_per_dir)
+
+        for name, func in (("pathlib", lambda: pathlib_descend(Path(root), tree)), ("scandir", lambda: descend(Path(root), tree))):
+            c = count_calls(func)
+            print(f"{name:>8}: {c['matches']} matches  stat {c['stat']:>8}  readdir {c['readdir']:>6}  {c['ms']:>6} ms")
+    finally:
+        shutil.rmtree(root)
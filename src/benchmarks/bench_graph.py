@@ -0,0 +1,58 @@
+"""
+Benchmarks make.graph.BuildGraph construction, cycle detection, ordering and out-of-date checks on a large DAG.
+
+Usage: python -m benchmarks.bench_graph [NODES]
+"""
+from make.graph import BuildGraph
+from make.parser import Rule
+from typing import Iterator, List
+import random
+import sys
+import time
+
+
+def iter_rules(n_nodes: int, fan_in: int = 4, seed: int = 0) -> Iterator[Rule]:
+    """
+    Yields a random DAG of `n_nodes` rules. Each rule depends on up to `fan_in` rules generated before it.
+    """
+    # A single goal that depends on every node, so the whole graph is reachable
+    yield Rule(["all"], [f"t{i}" for i in range(n_nodes)], [])
+
+    rng = random.Random(seed)
+    for i in range(n_nodes):
+        deps = [f"t{rng.randrange(i)}" for _ in range(min(i, fan_in))]
+        yield Rule([f"t{i}"], deps, [f"build t{i}"])
+
+
+def generate_rules(n_nodes: int, fan_in: int = 4, seed: int = 0) -> List[Rule]:
+    return list(iter_rules(n_nodes, fan_in, seed))
+
+
+def run(n_nodes: int) -> dict:
+    rules = generate_rules(n_nodes)
+    timings = {"nodes": n_nodes}
+
+    start = time.perf_counter()
+    graph = BuildGraph(rules)
+    timings["index"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.find_cycles()
+    timings["find_cycles"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    order = graph.topological_order(["all"])
+    timings["topological_order"] = time.perf_counter() - start
+
+    mtimes = {t: float(i) for i, t in enumerate(order)}
+    start = time.perf_counter()
+    graph.out_of_date(["all"], mtimes)
+    timings["out_of_date"] = time.perf_counter() - start
+
+    return timings
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for name, value in run(n).items():
+        print(f"{name:>18}: {value}" if name == "nodes" else f"{name:>18}: {value * 1000:8.1f} ms")
@@ -0,0 +1,48 @@
+"""
+Benchmarks make.parser.parse_file on synthetic makefiles to show that parse time grows linearly with file length.
+
+Usage: python -m benchmarks.bench_parser [LINES ...]
+"""
+from make.parser import parse_file
+from typing import List
+import sys
+import time
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def generate_makefile(n_lines: int) -> str:
+    """
+    Generates a makefile with roughly `n_lines` lines made of macros, comments and rules with two-line recipes.
+    """
+    lines = []
+    i = 0
+    while len(lines) < n_lines:
+        lines.append(f"# object {i}")
+        lines.append(f"CFLAGS_{i} = -O2 -DOBJ={i}")
+        lines.append(f"obj{i}.o: src{i}.c common.h")
+        lines.append(f"\tcc $(CFLAGS_{i}) -c src{i}.c")
+        lines.append(f"\techo built obj{i}.o")
+        i += 1
+
+    return "\n".join(lines[:n_lines])
+
+
+def run(sizes: List[int]) -> List[dict]:
+    results = []
+    for n in sizes:
+        text = generate_makefile(n)
+
+        start = time.perf_counter()
+        parse_file(text)
+        elapsed = time.perf_counter() - start
+
+        results.append({"lines": n, "seconds": elapsed, "us_per_line": elapsed / n * 1e6})
+
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or DEFAULT_SIZES
+    for r in run(sizes):
+        print(f"{r['lines']:>10} lines  {r['seconds']:8.3f}s  {r['us_per_line']:6.2f} us/line")
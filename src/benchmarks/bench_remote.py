@@ -0,0 +1,109 @@
+"""
+Measures how make --workers scales from 1 to N build workers, in jobs per second, against running the recipes locally.
+
+Usage: python -m benchmarks.bench_remote [JOBS] [MAX_WORKERS] [SECONDS_PER_JOB]
+
+Every job copies its own source file after sleeping for SECONDS_PER_JOB, which stands in for a compiler. The workers
+are make.worker processes with one slot each, listening on Unix domain sockets on this machine, so the results show
+the overhead of the protocol and the scheduling rather than the gain of more machines.
+"""
+from make.cli import make
+from io import StringIO
+import subprocess
+import tempfile
+import shutil
+import sys
+import time
+import os
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_project(root: str, n_jobs: int, seconds: float):
+    os.makedirs(os.path.join(root, "src"))
+    for i in range(n_jobs):
+        with open(os.path.join(root, "src", f"{i}.c"), "w") as f:
+            f.write(f"int f{i}(void) {{ return {i}; }}\n")
+
+    objects = " ".join(f"{i}.o" for i in range(n_jobs))
+    with open(os.path.join(root, "Makefile"), "w") as f:
+        f.write(f"all: {objects}\n.PHONY: all\n")
+        f.write("".join(f"{i}.o: src/{i}.c\n\t@sleep {seconds}; cp src/{i}.c {i}.o\n" for i in range(n_jobs)))
+
+
+def start_workers(root: str, n: int) -> list:
+    procs = []
+    for i in range(n):
+        address = os.path.join(root, f"w{i}.sock")
+        procs.append(subprocess.Popen([sys.executable, "-m", "make.worker", "--dir", os.path.join(root, f"w{i}"),
+                                       address], cwd=SRC))
+        procs[-1].address = address
+
+    deadline = time.monotonic() + 30
+    while not all(os.path.exists(p.address) for p in procs):
+        if time.monotonic() > deadline:
+            stop_workers(procs)
+            raise OSError("the workers did not start")
+        time.sleep(0.01)
+
+    return procs
+
+
+def stop_workers(procs: list):
+    for proc in procs:
+        proc.terminate()
+        proc.wait()
+
+
+def build(root: str, args: list) -> float:
+    for name in os.listdir(root):
+        if name.endswith(".o"):
+            os.unlink(os.path.join(root, name))
+
+    f_err = StringIO()
+    start = time.perf_counter()
+    status = make(args, {"PATH": os.environ["PATH"]}, StringIO(), f_err)
+    seconds = time.perf_counter() - start
+    if status or f_err.getvalue():
+        raise RuntimeError(f"the build failed: {f_err.getvalue()}")
+
+    return seconds
+
+
+def run(root: str, n_jobs: int, max_workers: int) -> list:
+    results = [{"workers": "local", "seconds": build(root, [])}]
+
+    n = 1
+    while n <= max_workers:
+        procs = start_workers(root, n)
+        try:
+            results.append({"workers": n, "seconds": build(root, ["--workers", ",".join(p.address for p in procs)])})
+        finally:
+            stop_workers(procs)
+        n *= 2
+
+    for r in results:
+        r["jobs_per_second"] = n_jobs / r["seconds"]
+
+    return results
+
+
+if __name__ == "__main__":
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    root = tempfile.mkdtemp(prefix="bench_remote_")
+    cwd = os.getcwd()
+
+    try:
+        generate_project(root, n_jobs, seconds)
+        os.chdir(root)
+
+        results = run(root, n_jobs, max_workers)
+        local = results[0]["seconds"]
+        for r in results:
+            print(f"{r['workers']:>7}: {r['seconds']:7.3f}s  {r['jobs_per_second']:8.1f} jobs/s  "
+                  f"{local / r['seconds']:5.2f}x")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
@@ -0,0 +1,87 @@
+"""
+Measures the startup cost of main.py for each kind of invocation: the time spent importing modules, as reported by
+`python -X importtime`, and the wall time of the whole process. Both are compared with a bare `python -c pass`.
+
+Usage: python -m benchmarks.bench_startup [RUNS]
+
+The tree is byte-compiled first, so that the import times do not include compiling the sources. The target for
+built-in commands such as echo is a few milliseconds of imports on top of the interpreter's own.
+"""
+from typing import List, Dict
+import compileall
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INVOCATIONS = [
+    ["echo", "hi"],
+    ["grep", "-F", "x"],
+    ["find", SRC, "-name", "nothing"],
+    ["make", "-f", os.devnull],
+]
+
+# Import time, in milliseconds above `python -c pass`, that an invocation of a built-in command should stay within
+TARGET_MS = 5.0
+
+
+def import_times(stderr: str) -> Dict[str, int]:
+    """
+    Parses the output of -X importtime into a dictionary mapping each module to its own import time in microseconds.
+    """
+    rv = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, _, module = line[len("import time:"):].split("|")
+        rv[module.strip()] = int(self_us)
+
+    return rv
+
+
+def measure(args: List[str], runs: int) -> dict:
+    """
+    Runs the command `runs` times and keeps the fastest run.
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=SRC, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall = time.perf_counter() - start
+
+        modules = import_times(proc.stderr)
+        result = {"wall": wall, "imports": sum(modules.values()) / 1e6, "modules": modules}
+        if best is None or result["imports"] < best["imports"]:
+            best = result
+
+    return best
+
+
+def run(runs: int) -> List[dict]:
+    compileall.compile_dir(SRC, quiet=1)
+
+    baseline = measure(["-c", "pass"], runs)
+    results = []
+    for args in INVOCATIONS:
+        result = measure(["main.py"] + args, runs)
+        result["command"] = args[0]
+        result["extra_imports"] = result["imports"] - baseline["imports"]
+        result["extra_wall"] = result["wall"] - baseline["wall"]
+        # The modules the interpreter does not import by itself, slowest first
+        result["slowest"] = sorted((m for m in result["modules"] if m not in baseline["modules"]),
+                                   key=result["modules"].get, reverse=True)[:5]
+        results.append(result)
+
+    return results
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for r in run(runs):
+        flag = "" if r["command"] == "make" or r["extra_imports"] * 1000 <= TARGET_MS else "  OVER TARGET"
+        print(f"{r['command']:>6}: +{r['extra_imports'] * 1000:6.1f} ms imports, +{r['extra_wall'] * 1000:6.1f} ms wall"
+              f"  ({', '.join(r['slowest'])}){flag}")
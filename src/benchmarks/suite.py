@@ -0,0 +1,238 @@
+"""
+Runs the benchmark suite: parsing makefiles, parsing find expressions, walking wide and deep trees, and analysing and
+scheduling a large DAG. Results are written as JSON and can be compared against a saved baseline, failing when a
+benchmark got slower than the allowed threshold.
+
+Usage: python -m benchmarks.suite [--quick] [--repeat N] [--only NAME[,NAME...]] [--output FILE]
+                                  [--baseline FILE] [--threshold FRACTION]
+
+    python -m benchmarks.suite --output baseline.json          # on the main branch
+    python -m benchmarks.suite --baseline baseline.json        # on a change; exits 1 on a regression
+
+Every input is generated from a fixed seed, so two runs on the same machine measure the same work. The minimum of the
+repeats is compared, since it is the measurement least disturbed by other processes.
+"""
+from benchmarks.bench_parser import generate_makefile
+from benchmarks.bench_find_memory import generate_tree
+from benchmarks.bench_graph import generate_rules
+from commands.find import descend, tokenize_operands, expr_from_tokens, ASTBinOr
+from make.graph import BuildGraph
+from make.parser import parse_file
+from make.scheduler import schedule
+from make.aio import schedule_async
+from typing import List, Callable, NamedTuple, Optional
+from getopt import getopt, GetoptError
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Called once with the scratch directory and the size preset; returns the function to time
+    setup: Callable[[str, dict], Callable[[], object]]
+    sizes: dict
+    quick_sizes: dict
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float("inf")
+
+
+def generate_deep_tree(root: str, depth: int, breadth: int, files_per_dir: int):
+    """
+    Creates a tree of `depth` levels below root in which every directory has `breadth` subdirectories (except at the
+    bottom) and `files_per_dir` empty files.
+    """
+    level = [root]
+    for d in range(depth + 1):
+        next_level = []
+        for directory in level:
+            for i in range(files_per_dir):
+                os.close(os.open(os.path.join(directory, f"f{i}.c"), os.O_CREAT | os.O_WRONLY, 0o644))
+
+            if d < depth:
+                for i in range(breadth):
+                    sub = os.path.join(directory, f"d{i}")
+                    os.mkdir(sub)
+                    next_level.append(sub)
+        level = next_level
+
+
+def find_expression(n_terms: int) -> List[str]:
+    args = ["-name", "f0.c"]
+    for i in range(1, n_terms):
+        args += ["-o", "-name", f"f{i}.c"]
+    return args
+
+
+def _setup_parse_file(scratch: str, sizes: dict):
+    text = generate_makefile(sizes["lines"])
+    return lambda: parse_file(text)
+
+
+def _setup_find_parse(scratch: str, sizes: dict):
+    args = find_expression(sizes["terms"])
+    # from_tokens removes the tokens it parses, but the tokenizer builds a new list on every call and leaves args alone
+    return lambda: ASTBinOr.from_tokens(tokenize_operands(args))
+
+
+def _setup_walk(generate):
+    def setup(scratch: str, sizes: dict):
+        root = tempfile.mkdtemp(dir=scratch)
+        generate(root, sizes)
+        tree = expr_from_tokens(tokenize_operands(["-name", "*1.c"]))
+        return lambda: sum(1 for _ in descend(root, tree))
+
+    return setup
+
+
+def _setup_graph(scratch: str, sizes: dict):
+    rules = generate_rules(sizes["nodes"])
+    mtimes = {f"t{i}": float(i) for i in range(sizes["nodes"])}
+
+    def run():
+        graph = BuildGraph(rules)
+        return graph.out_of_date(["all"], mtimes)
+
+    return run
+
+
+def _setup_schedule(scratch: str, sizes: dict):
+    graph = BuildGraph(generate_rules(sizes["nodes"]))
+    targets = graph.topological_order(["all"])
+    return lambda: schedule(graph, targets, lambda target: 0, jobs=4)
+
+
+def _setup_schedule_async(scratch: str, sizes: dict):
+    graph = BuildGraph(generate_rules(sizes["nodes"]))
+    targets = graph.topological_order(["all"])
+
+    async def run_target(target: str) -> int:
+        return 0
+
+    return lambda: asyncio.run(schedule_async(graph, targets, run_target, jobs=4))
+
+
+BENCHMARKS = [
+    Benchmark("parse_file", _setup_parse_file, {"lines": 200_000}, {"lines": 10_000}),
+    Benchmark("find_parse", _setup_find_parse, {"terms": 2_000}, {"terms": 200}),
+    Benchmark("descend_wide", _setup_walk(lambda root, s: generate_tree(root, s["files"], s["files_per_dir"])),
+              {"files": 100_000, "files_per_dir": 1_000}, {"files": 2_000, "files_per_dir": 100}),
+    Benchmark("descend_deep", _setup_walk(lambda root, s: generate_deep_tree(root, s["depth"], 2, s["files_per_dir"])),
+              {"depth": 12, "files_per_dir": 4}, {"depth": 7, "files_per_dir": 2}),
+    Benchmark("build_graph", _setup_graph, {"nodes": 100_000}, {"nodes": 5_000}),
+    Benchmark("schedule", _setup_schedule, {"nodes": 20_000}, {"nodes": 1_000}),
+    Benchmark("schedule_async", _setup_schedule_async, {"nodes": 20_000}, {"nodes": 1_000}),
+]
+
+
+def run(benchmarks: List[Benchmark], quick: bool = False, repeat: int = 5, f_log=sys.stderr) -> dict:
+    """
+    Runs each benchmark `repeat` times after its setup and one untimed run. Returns the JSON-serializable results.
+    """
+    results = {}
+    scratch = tempfile.mkdtemp(prefix="pymake_bench_")
+    try:
+        for bench in benchmarks:
+            sizes = bench.quick_sizes if quick else bench.sizes
+            func = bench.setup(scratch, sizes)
+
+            # Warm up caches (the page cache for the trees, the allocator, lazily imported modules) before timing
+            func()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+
+            results[bench.name] = {"params": sizes, "min": min(timings), "median": statistics.median(timings),
+                                   "timings": timings}
+            print(f"{bench.name:>16}: {min(timings) * 1000:10.2f} ms", file=f_log)
+    finally:
+        shutil.rmtree(scratch)
+
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "quick": quick,
+                 "repeat": repeat, "time": time.time()},
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> List[Comparison]:
+    """
+    Pairs up the benchmarks present in both result sets that ran with the same parameters.
+    """
+    rv = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is not None and base["params"] == result["params"]:
+            rv.append(Comparison(name, base["min"], result["min"]))
+
+    return rv
+
+
+def regressions(comparisons: List[Comparison], threshold: float) -> List[Comparison]:
+    return [c for c in comparisons if c.ratio > 1 + threshold]
+
+
+def main(args: List[str], f_out=sys.stdout, f_err=sys.stderr) -> int:
+    try:
+        opt, rest = getopt(args, "", ["quick", "repeat=", "only=", "output=", "baseline=", "threshold="])
+        options = dict(opt)
+        repeat = int(options.get("--repeat", 5))
+        threshold = float(options.get("--threshold", 0.2))
+    except (GetoptError, ValueError) as e:
+        print(f"suite: {e}", file=f_err)
+        return 2
+
+    benchmarks = BENCHMARKS
+    if "--only" in options:
+        names = options["--only"].split(",")
+        benchmarks = [b for b in BENCHMARKS if b.name in names]
+        unknown = set(names) - {b.name for b in benchmarks}
+        if unknown:
+            print(f"suite: unknown benchmarks: {', '.join(sorted(unknown))}", file=f_err)
+            return 2
+
+    baseline: Optional[dict] = None
+    if "--baseline" in options:
+        with open(options["--baseline"]) as f:
+            baseline = json.load(f)
+
+    results = run(benchmarks, "--quick" in options, repeat, f_err)
+
+    if "--output" in options:
+        with open(options["--output"], "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, f_out, indent=2)
+        print(file=f_out)
+
+    if baseline is None:
+        return 0
+
+    comparisons = compare(baseline, results)
+    slow = regressions(comparisons, threshold)
+    for c in comparisons:
+        flag = "  REGRESSION" if c in slow else ""
+        print(f"{c.name:>16}: {c.baseline * 1000:10.2f} ms -> {c.current * 1000:10.2f} ms  {c.ratio:5.2f}x{flag}",
+              file=f_err)
+
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    quit(main(sys.argv[1:]))
@@ -1,4 +1,16 @@
+import importlib
+
 command_map = {}
+# Maps the name of a command to a function that returns whether the command supports an argument list
+command_arguments = {}
+
+# Maps the name of every built-in command to the module that defines it. A module is only imported when one of its
+# commands is first looked up with resolve_command, so running one command does not pay for importing all of them.
+COMMAND_MODULES = {
+    "echo": "commands.echo",
+    "find": "commands.find",
+    "grep": "commands.grep",
+}
 
 class CommandError(Exception):
     """
@@ -16,29 +28,73 @@ class CommandParseError(CommandError):
         name -- Name of the command that caused the error
         expression -- The expression that caused the error
         message -- Explanation of the error
+        position -- Index of the argument that caused the error, if known
     """
 
-    def __init__(self, name, expression, message):
+    def __init__(self, name, expression, message, position=None):
         self.name = name
         self.expression = expression
         self.message = message
+        self.position = position
     
     def __str__(self):
+        if self.position is not None:
+            return f"{self.name}: parse error on {self.expression} at argument {self.position}: {self.message}"
+
         return f"{self.name}: parse error on {self.expression}: {self.message}"
 
-def command(name: str):
+def command(name: str, supports=None):
     """
     A decorator the defines a command. 
     
     A command should be a callable that takes a list of strings that define arguments, 
     a dictionary definining environment variables, a file-like object representing the input stream, 
     and a file-like object representing the output stream.
+
+    `supports`, if given, takes a list of arguments and returns False if the command does not handle them like the
+    program of the same name would, such as an option it does not implement.
     """
     def wrapper(func):
         if name in command_map:
             raise ValueError(f"Command {name} is already defined.")
         
         command_map[name] = func
+        if supports is not None:
+            command_arguments[name] = supports
 
         return func
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def is_command(name: str) -> bool:
+    """
+    Returns whether a built-in command is defined with that name, without importing its module.
+    """
+    return name in command_map or name in COMMAND_MODULES
+
+
+def resolve_command(name: str):
+    """
+    Returns the function of a built-in command, importing the module that defines it if needed.
+
+    If there is no such command, a KeyError is thrown.
+    """
+    try:
+        return command_map[name]
+    except KeyError:
+        pass
+
+    importlib.import_module(COMMAND_MODULES[name])
+    return command_map[name]
+
+
+def supports_arguments(name: str, args) -> bool:
+    """
+    Returns whether a built-in command handles the arguments like the program of the same name, so that it can run
+    in its place. Commands that do not say support every argument list.
+
+    If there is no such command, a KeyError is thrown.
+    """
+    resolve_command(name)
+    supports = command_arguments.get(name)
+    return supports is None or supports(args)
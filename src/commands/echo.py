@@ -2,7 +2,13 @@ from .command import command
 from typing import List, Dict
 from io import IOBase
 
-@command("echo")
+
+def _supports(args: List[str]) -> bool:
+    # Options and backslash escapes differ between the echo of each shell, so they are left to the shell
+    return not (args and args[0].startswith("-") and args[0] != "-") and not any("\\" in a for a in args)
+
+
+@command("echo", supports=_supports)
 def echo(args: List[str], env: Dict[str, str], f_in: IOBase, f_out: IOBase) -> int:
     print(*args, file=f_out)
 
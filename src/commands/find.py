@@ -1,21 +1,35 @@
 from .command import command, CommandParseError
+from .walk import Entry, walk, parallel_walk
+from .fsindex import FSIndex
 from enum import Enum, unique, auto
-from typing import List, Dict, Tuple, Any, NamedTuple, Union
+from typing import List, Dict, Tuple, Any, NamedTuple, Union, Iterator, Optional, Callable
 from io import IOBase
 from itertools import takewhile
-from getopt import getopt
+from getopt import getopt, GetoptError
 from pathlib import Path
-from functools import reduce
+import re
 import sys
+import time
+import inspect
 import os
 import fnmatch
 
 
 class SymlinkBehavior(Enum):
-    NEVER_FOLLOW = "P",
-    ALWAYS_FOLLOW = "L",
+    NEVER_FOLLOW = "P"
+    ALWAYS_FOLLOW = "L"
     WHEN_PROCESSING = "H"
 
+    @property
+    def follow_roots(self) -> bool:
+        """Whether symbolic links given on the command line are followed"""
+        return self is not SymlinkBehavior.NEVER_FOLLOW
+
+    @property
+    def follow_symlinks(self) -> bool:
+        """Whether symbolic links found while walking are followed"""
+        return self is SymlinkBehavior.ALWAYS_FOLLOW
+
 
 def determine_behavior(options: List[str]) -> SymlinkBehavior:
     rv = None
@@ -45,11 +59,12 @@ class OperandTokens(Enum):
 
 
 def tokenize_operands(operand_strings: List[str]) -> List[Tuple[OperandTokens, str]]:
+    """
+    Returns one token for each operand string, so the index of a token is the index of its argument.
+    """
     rv = []
 
-    while operand_strings:
-        s = operand_strings.pop(0)
-
+    for s in operand_strings:
         if s == "(":
             rv.append((OperandTokens.LPAREN, s))
         elif s == ")":
@@ -95,26 +110,213 @@ def eat_token(tokens: List[Tuple[OperandTokens, str]], token: OperandTokens, i:
 
 
 
-# Maps operand names to functions that consume a path and return a Boolean
+# Maps operand names to functions that consume an Entry and return a Boolean
 PATH_OPERAND_EVALUATORS = {}
 
+# Maps operand names to functions that take the operand's values and return a predicate over Entries. Operands with
+# a compiler do their per-expression work (such as compiling patterns) once, when the expression is compiled.
+PATH_OPERAND_COMPILERS = {}
+
+# Relative cost of evaluating each operand. Cheaper tests are evaluated first in AND and OR expressions. Operands
+# with side effects cost COST_ACTION, and expressions containing them are never reordered.
+COST_NAME = 0
+COST_TYPE = 1
+COST_STAT = 2
+COST_ACTION = 3
+PATH_OPERAND_COSTS = {}
+
+# Maps operand names to the number of values they take
+PATH_OPERAND_ARITY = {}
 
-def operand(name: str):
+
+def operand(name: str, cost: int = COST_STAT):
     def wrapper(func):
         if name in PATH_OPERAND_EVALUATORS:
             raise ValueError(f"{name} already defined as an operand!")
 
         PATH_OPERAND_EVALUATORS[name] = func
+        PATH_OPERAND_COSTS[name] = cost
+        PATH_OPERAND_ARITY[name] = len(inspect.signature(func).parameters) - 1
        
         return func
     return wrapper
 
 
-@operand("name")
-def op_name(path: Path, pattern: str) -> bool:
+def operand_compiler(name: str):
+    """
+    Registers a compiler for an operand that has already been defined with `operand`.
+    """
+    def wrapper(func):
+        if name not in PATH_OPERAND_EVALUATORS:
+            raise ValueError(f"{name} is not defined as an operand!")
+        if name in PATH_OPERAND_COMPILERS:
+            raise ValueError(f"{name} already has a compiler!")
+
+        PATH_OPERAND_COMPILERS[name] = func
+
+        return func
+    return wrapper
+
+
+Predicate = Callable[[Entry], bool]
+
+
+@operand("name", cost=COST_NAME)
+def op_name(path: Entry, pattern: str) -> bool:
     return fnmatch.fnmatch(path.name, pattern)
 
 
+@operand_compiler("name")
+def compile_name(pattern: str) -> Predicate:
+    match = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+
+    if os.path.normcase("A") == "A":
+        return lambda path: match(path.name) is not None
+
+    return lambda path: match(os.path.normcase(path.name)) is not None
+
+
+# Characters that make a -name pattern a glob rather than a literal file name
+GLOB_CHARACTERS = set("*?[")
+
+
+def compile_name_set(patterns: List[str]) -> Predicate:
+    """
+    Returns a predicate that is true if an entry's name matches any of the patterns, like an OR of -name tests.
+    Literal names are looked up in a set and the globs are combined into a single regular expression.
+    """
+    literals = set()
+    globs = []
+    for pattern in patterns:
+        pattern = os.path.normcase(pattern)
+        if GLOB_CHARACTERS.isdisjoint(pattern):
+            literals.add(pattern)
+        else:
+            globs.append(fnmatch.translate(pattern))
+
+    literals = frozenset(literals)
+    match = re.compile("|".join(globs)).match if globs else None
+
+    if os.path.normcase("A") == "A":
+        if match is None:
+            return lambda path: path.name in literals
+        return lambda path: path.name in literals or match(path.name) is not None
+
+    def predicate(path: Entry) -> bool:
+        name = os.path.normcase(path.name)
+        return name in literals or (match is not None and match(name) is not None)
+
+    return predicate
+
+
+@operand("prune", cost=COST_ACTION)
+def op_prune(path: Entry) -> bool:
+    path.prune = True
+    return True
+
+
+# -maxdepth and -mindepth are global options rather than tests. They always evaluate to true, and the traversal reads
+# their values from the expression tree (see depth_limits).
+@operand("maxdepth", cost=COST_NAME)
+def op_maxdepth(path: Entry, levels: str) -> bool:
+    return True
+
+
+@operand("mindepth", cost=COST_NAME)
+def op_mindepth(path: Entry, levels: str) -> bool:
+    return True
+
+
+def parse_numeric(operand_name: str, value: str) -> Tuple[int, int]:
+    """
+    Parses a numeric operand value of the form `n`, `+n` (more than n) or `-n` (less than n).
+    Returns a tuple of (comparison, n), where comparison is 1, -1 or 0 for exactly n.
+
+    If the value is not a number, a CommandParseError is thrown.
+    """
+    comparison = {"+": 1, "-": -1}.get(value[:1], 0)
+    digits = value[1:] if comparison else value
+
+    if not digits.isdigit():
+        raise CommandParseError("find", f"-{operand_name} {value}", "Expected a number")
+
+    return (comparison, int(digits))
+
+
+def compare(comparison: int, actual: int, n: int) -> bool:
+    if comparison > 0:
+        return actual > n
+    if comparison < 0:
+        return actual < n
+    return actual == n
+
+
+@operand("type", cost=COST_TYPE)
+def op_type(path: Entry, file_type: str) -> bool:
+    return path.file_type() == file_type
+
+
+@operand_compiler("type")
+def compile_type(file_type: str) -> Predicate:
+    if len(file_type) != 1 or file_type not in "bcdpfls":
+        raise CommandParseError("find", f"-type {file_type}", "Expected one of b, c, d, p, f, l or s")
+
+    return lambda path: path.file_type() == file_type
+
+
+# Units accepted by -size. Without a unit, sizes are counted in 512-byte blocks, rounded up.
+SIZE_UNITS = {"c": 1, "w": 2, "b": 512, "k": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+@operand("size")
+def op_size(path: Entry, size: str) -> bool:
+    return compile_size(size)(path)
+
+
+@operand_compiler("size")
+def compile_size(size: str) -> Predicate:
+    unit = SIZE_UNITS["b"]
+    if size[-1:] in SIZE_UNITS:
+        unit = SIZE_UNITS[size[-1]]
+        size = size[:-1]
+
+    comparison, n = parse_numeric("size", size)
+
+    return lambda path: compare(comparison, -(-path.info().st_size // unit), n)
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+@operand("mtime")
+def op_mtime(path: Entry, days: str) -> bool:
+    return compile_mtime(days)(path)
+
+
+@operand_compiler("mtime")
+def compile_mtime(days: str) -> Predicate:
+    comparison, n = parse_numeric("mtime", days)
+
+    # Ages are measured from when the expression is compiled, like find measures them from when it starts
+    now = time.time()
+    return lambda path: compare(comparison, int((now - path.info().st_mtime) // SECONDS_PER_DAY), n)
+
+
+@operand("newer")
+def op_newer(path: Entry, reference: str) -> bool:
+    return compile_newer(reference)(path)
+
+
+@operand_compiler("newer")
+def compile_newer(reference: str) -> Predicate:
+    # The reference file is stat'ed once, here, rather than once per file
+    try:
+        reference_mtime = os.stat(reference).st_mtime_ns
+    except OSError as e:
+        raise CommandParseError("find", f"-newer {reference}", e.strerror)
+
+    return lambda path: path.info().st_mtime_ns > reference_mtime
+
 
 class ASTPrimary(NamedTuple):
     """
@@ -123,42 +325,64 @@ class ASTPrimary(NamedTuple):
     name: str
     values: List[str]
 
-    def evaluate(self, path: Path):
+    def evaluate(self, path: Entry):
         return PATH_OPERAND_EVALUATORS[self.name](path, *self.values)
 
     def size(self):
         return 1
 
+    def cost(self) -> int:
+        return PATH_OPERAND_COSTS.get(self.name, COST_STAT)
+
+    def compile(self) -> Predicate:
+        """
+        Returns a predicate equivalent to `evaluate`.
+
+        If the operand is not defined or is given the wrong number of values, a CommandParseError is thrown.
+        """
+        try:
+            evaluator = PATH_OPERAND_EVALUATORS[self.name]
+        except KeyError:
+            raise CommandParseError("find", f"-{self.name}", "Unknown operand")
+
+        if len(self.values) != PATH_OPERAND_ARITY[self.name]:
+            raise CommandParseError("find", " ".join([f"-{self.name}"] + self.values),
+                                    f"Expected {PATH_OPERAND_ARITY[self.name]} value(s)")
+
+        if self.name in PATH_OPERAND_COMPILERS:
+            return PATH_OPERAND_COMPILERS[self.name](*self.values)
+
+        values = tuple(self.values)
+        return lambda path: evaluator(path, *values)
+
     @classmethod
     def from_tokens(cls, tokens: List[Tuple[OperandTokens, str]]):
         """
         Consumes tokens from the list to form a primary. Assumes that the list of tokens starts with a valid primary.
-        EBNF: `primary = NAME, {VALUE}`
+        EBNF: `primary = NAME, {VALUE}`, where a NAME is also read as a value if the operand needs more values.
 
         If the list is empty, a ValueError is thrown.
         If the list does not begin with a valid primary, a CommandParseError is thrown.
         """
-        if not tokens:
-            raise ValueError("tokens is empty")
-
-        name = eat_token(tokens, OperandTokens.OPERAND_NAME)
-        values = []
-
-        while tokens and tokens[0][0] == OperandTokens.OPERAND_VALUE:
-            values.append(eat_token(tokens, OperandTokens.OPERAND_VALUE))
-
-        return cls(name, values)
+        return _consume(tokens, ExpressionParser.parse_primary)
 
 
 class ASTBinNot(NamedTuple):
     expr: Union[ASTPrimary, "ASTBinNot", "ASTBinOr"]
 
-    def evaluate(self, path: Path) -> bool:
+    def evaluate(self, path: Entry) -> bool:
         return not self.expr.evaluate(path)
     
     def size(self) -> int:
         return 1 + self.expr.size()
 
+    def cost(self) -> int:
+        return self.expr.cost()
+
+    def compile(self) -> Predicate:
+        predicate = self.expr.compile()
+        return lambda path: not predicate(path)
+
     @classmethod
     def from_tokens(cls, tokens: List[Tuple[OperandTokens, str]]):
         """
@@ -168,8 +392,7 @@ class ASTBinNot(NamedTuple):
         If the list is empty, a ValueError is thrown.
         If the list does not begin with a valid expression a CommandParserError is thrown.
         """
-        eat_token(tokens, OperandTokens.NOT)
-        return cls(expr_from_tokens(tokens))
+        return _consume(tokens, ExpressionParser.parse_not)
 
 
 class ASTBinAnd(NamedTuple):
@@ -178,14 +401,39 @@ class ASTBinAnd(NamedTuple):
     """
     expressions: List[Union[ASTPrimary, ASTBinNot, "ASTBinOr"]]
 
-    def evaluate(self, path: Path) -> bool:
-        if len(self.expressions) == 1:
-            return self.expressions[0].evaluate(path)
-        
-        return reduce(lambda a, b: a.evaluate(path) & b.evaluate(path), self.expressions)
+    def evaluate(self, path: Entry) -> bool:
+        return all(e.evaluate(path) for e in self.expressions)
 
     def size(self) -> int:
-        return 1 + reduce(lambda a, b: a.size() + b.size())
+        return 1 + sum(e.size() for e in self.expressions)
+
+    def cost(self) -> int:
+        return max(e.cost() for e in self.expressions)
+
+    def compile(self) -> Predicate:
+        """
+        Returns a predicate equivalent to `evaluate` that stops at the first false expression, testing cheap
+        expressions first unless any of them has side effects.
+        """
+        expressions = self.expressions
+        if self.cost() < COST_ACTION:
+            expressions = sorted(expressions, key=lambda e: e.cost())
+
+        predicates = [e.compile() for e in expressions]
+
+        if len(predicates) == 1:
+            return predicates[0]
+        if len(predicates) == 2:
+            first, second = predicates
+            return lambda path: first(path) and second(path)
+
+        def predicate(path: Entry) -> bool:
+            for p in predicates:
+                if not p(path):
+                    return False
+            return True
+
+        return predicate
 
     @classmethod
     def from_tokens(cls, tokens: List[Tuple[OperandTokens, str]]):
@@ -197,20 +445,22 @@ class ASTBinAnd(NamedTuple):
         If tokens is empty, a ValueError is thrown.
         If the list does not begin with a valid expression a CommandParserError is thrown.
         """
-        expr = [expr_from_tokens(tokens)]
+        return _consume(tokens, ExpressionParser.parse_and)
 
-        while tokens:
-            if peek_token(tokens) == OperandTokens.AND:
-                tokens.pop(0)
 
-            # Additional expressions are optional and '-a' does not have to exist. So, we try to parse an expression.
-            # If we encounter an exception, then it's not an expression, so we move on.
-            try:
-                expr.append(expr_from_tokens(tokens))
-            except Exception:
-                break
+# Smallest number of -name tests in an OR expression that compile_name_set replaces
+NAME_SET_THRESHOLD = 3
+
 
-        return cls(expr)
+def _name_pattern(child: Union[ASTPrimary, ASTBinNot, ASTBinAnd, "ASTBinOr"]) -> Optional[str]:
+    """Returns the pattern of an OR expression's child that consists of a single -name test, or None"""
+    if isinstance(child, ASTBinAnd) and len(child.expressions) == 1:
+        child = child.expressions[0]
+
+    if isinstance(child, ASTPrimary) and child.name == "name" and len(child.values) == 1:
+        return child.values[0]
+
+    return None
 
 
 class ASTBinOr(NamedTuple):
@@ -221,16 +471,49 @@ class ASTBinOr(NamedTuple):
     """
     children: List[ASTBinAnd]
 
-    def evaluate(self, path: Path) -> bool:
+    def evaluate(self, path: Entry) -> bool:
         """Evaluates the OR expression"""
-        if len(self.children) == 1:
-            return self.children[0].evaluate(path)
-
-        return reduce(lambda a, b: a.evaluate(path) | b.evaluate(path), self.children)
+        return any(c.evaluate(path) for c in self.children)
 
     def size(self) -> int:
         """Returns the size of the tree"""
-        return 1 + reduce(lambda a, b: a.size() + b.size())
+        return 1 + sum(c.size() for c in self.children)
+
+    def cost(self) -> int:
+        return max(c.cost() for c in self.children)
+
+    def compile(self) -> Predicate:
+        """
+        Returns a predicate equivalent to `evaluate` that stops at the first true child, testing cheap children first
+        unless any of them has side effects.
+        """
+        children = self.children
+        predicates = []
+        if self.cost() < COST_ACTION:
+            # Generated expressions often list thousands of files as `-name a -o -name b ...`. Testing the names
+            # one pattern at a time would make every entry cost one match per file.
+            patterns = [p for p in map(_name_pattern, children) if p is not None]
+            if len(patterns) >= NAME_SET_THRESHOLD:
+                predicates.append(compile_name_set(patterns))
+                children = [c for c in children if _name_pattern(c) is None]
+
+            children = sorted(children, key=lambda c: c.cost())
+
+        predicates.extend(c.compile() for c in children)
+
+        if len(predicates) == 1:
+            return predicates[0]
+        if len(predicates) == 2:
+            first, second = predicates
+            return lambda path: first(path) or second(path)
+
+        def predicate(path: Entry) -> bool:
+            for p in predicates:
+                if p(path):
+                    return True
+            return False
+
+        return predicate
 
     @classmethod
     def from_tokens(cls, tokens: List[Tuple[OperandTokens, str]]):
@@ -242,15 +525,7 @@ class ASTBinOr(NamedTuple):
         If tokens is empty, a ValueError is thrown.
         If the list does not begin with a valid AND expression a CommandParserError is thrown.
         """
-        rv = [ASTBinAnd.from_tokens(tokens)]
-
-        while tokens and peek_token(tokens) == OperandTokens.OR:
-            # Pop the OR token, then parse the expected expression
-            tokens.pop(0)
-
-            rv.append(ASTBinAnd.from_tokens(tokens))
-
-        return cls(rv)
+        return _consume(tokens, ExpressionParser.parse_or)
 
 
 def expr_from_tokens(tokens: List[Tuple[OperandTokens, str]]) -> Union[ASTPrimary, ASTBinNot, ASTBinOr]:
@@ -261,79 +536,355 @@ def expr_from_tokens(tokens: List[Tuple[OperandTokens, str]]) -> Union[ASTPrimar
     If the list is empty, a ValueError is thrown.
     If the list does not begin with a valid expression a CommandParserError is thrown.
     """
-    if peek_token(tokens) == OperandTokens.LPAREN:
-        eat_token(tokens, OperandTokens.LPAREN)
-        rv = ASTBinOr.from_tokens(tokens)
-        eat_token(tokens, OperandTokens.RPAREN)
+    return _consume(tokens, ExpressionParser.parse_expr)
+
+
+# Tokens that can begin an expression
+EXPRESSION_START = (OperandTokens.OPERAND_NAME, OperandTokens.NOT, OperandTokens.LPAREN)
+
+
+class ExpressionParser(object):
+    """
+    A recursive-descent parser for find expressions that walks the token list by index instead of consuming it, so
+    parsing takes time linear in the number of tokens. CommandParseErrors carry the index of the offending token,
+    which is also the index of its argument in the expression.
+    """
+
+    def __init__(self, tokens: List[Tuple[OperandTokens, str]], pos: int = 0):
+        self.tokens = tokens
+        self.pos = pos
+
+    def peek(self) -> Optional[OperandTokens]:
+        """Returns the type of the next token, or None at the end of the expression"""
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][0]
+        return None
+
+    def error(self, message: str, pos: Optional[int] = None) -> CommandParseError:
+        pos = self.pos if pos is None else pos
+        expression = self.tokens[pos][1] if pos < len(self.tokens) else "end of expression"
+        return CommandParseError("find", expression, message, pos)
+
+    def expect(self, token: OperandTokens, message: str) -> str:
+        if self.peek() != token:
+            raise self.error(message)
+
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def parse(self) -> ASTBinOr:
+        """
+        Parses the whole token list as one expression.
+
+        If tokens are left over after the expression, a CommandParseError is thrown.
+        """
+        rv = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise self.error("Unexpected token")
 
         return rv
-    if peek_token(tokens) == OperandTokens.NOT:
-        return ASTBinNot.from_tokens(tokens)
-    else:
-        return ASTPrimary.from_tokens(tokens)
 
+    def parse_or(self) -> ASTBinOr:
+        # binor = binand {OR binand}
+        rv = [self.parse_and()]
+
+        while self.peek() == OperandTokens.OR:
+            self.pos += 1
+            rv.append(self.parse_and())
+
+        return ASTBinOr(rv)
+
+    def parse_and(self) -> ASTBinAnd:
+        # binand = expr {[AND] expr}
+        rv = [self.parse_expr()]
+
+        while True:
+            token = self.peek()
+            if token == OperandTokens.AND:
+                self.pos += 1
+            elif token not in EXPRESSION_START:
+                break
+
+            rv.append(self.parse_expr())
+
+        return ASTBinAnd(rv)
+
+    def parse_expr(self) -> Union[ASTPrimary, ASTBinNot, ASTBinOr]:
+        # expr = LPAREN binor RPAREN | binnot | primary
+        token = self.peek()
+        if token == OperandTokens.LPAREN:
+            start = self.pos
+            self.pos += 1
+            rv = self.parse_or()
+            if self.peek() != OperandTokens.RPAREN:
+                raise self.error("Unclosed parenthesis", start)
+
+            self.pos += 1
+            return rv
+        if token == OperandTokens.NOT:
+            return self.parse_not()
+        if token == OperandTokens.OPERAND_NAME:
+            return self.parse_primary()
+
+        raise self.error("Expected an expression")
+
+    def parse_not(self) -> ASTBinNot:
+        # binnot = NOT expr
+        self.expect(OperandTokens.NOT, "Expected '!'")
+        return ASTBinNot(self.parse_expr())
+
+    def parse_primary(self) -> ASTPrimary:
+        # primary = NAME, {VALUE}
+        name = self.expect(OperandTokens.OPERAND_NAME, "Expected an operand")
+        values = []
+
+        while self.peek() == OperandTokens.OPERAND_VALUE:
+            values.append(self.tokens[self.pos][1])
+            self.pos += 1
 
+        # Values such as the '-7' in `-mtime -7` are tokenized as operand names. A known operand that is still short
+        # of values takes them as values instead.
+        arity = PATH_OPERAND_ARITY.get(name, 0)
+        while len(values) < arity and self.peek() == OperandTokens.OPERAND_NAME:
+            values.append("-" + self.tokens[self.pos][1])
+            self.pos += 1
 
-def descend(path: Union[Path, List[Path]], tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr], verbose=False) -> List[Path]:
+        return ASTPrimary(name, values)
+
+
+def _consume(tokens: List[Tuple[OperandTokens, str]], parse: Callable[[ExpressionParser], Any]):
     """
-    Decends the given path. Returns a list of Paths to all files.
+    Parses the start of the token list with one of ExpressionParser's methods and removes the tokens it used.
+    The list is left untouched if parsing fails.
     """
-    rv = []
+    if not tokens:
+        raise ValueError("tokens is empty")
+
+    parser = ExpressionParser(tokens)
+    rv = parse(parser)
+    del tokens[:parser.pos]
+
+    return rv
 
-    try:
-        path_stack = path[:]
-    except TypeError:
-        path_stack = [path]
-    
-    i = 0
 
-    # A while loop is used here instead of a for loop so we can iterate over the "stack" while adding items to it
-    while i < len(path_stack):
-        current_item: Path = path_stack[i]
 
-        if current_item.is_dir():
-            path_stack.extend(current_item.iterdir())
+def iter_primaries(tree: Union[None, ASTPrimary, ASTBinNot, ASTBinAnd, ASTBinOr]) -> Iterator[ASTPrimary]:
+    """
+    Yields every primary in the tree.
+    """
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ASTPrimary):
+            yield node
+        elif isinstance(node, ASTBinNot):
+            stack.append(node.expr)
+        elif isinstance(node, ASTBinAnd):
+            stack.extend(reversed(node.expressions))
+        else:
+            stack.extend(reversed(node.children))
+
+
+def depth_limits(tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr]) -> Tuple[int, Optional[int]]:
+    """
+    Returns the (mindepth, maxdepth) given by the -mindepth and -maxdepth options in the tree. The last occurrence of
+    each wins. maxdepth is None if there is no limit.
+
+    If a limit is not a non-negative integer, a CommandParseError is thrown.
+    """
+    limits = {"mindepth": 0, "maxdepth": None}
+
+    for primary in iter_primaries(tree):
+        if primary.name in limits:
+            try:
+                levels, = map(int, primary.values)
+                if levels < 0:
+                    raise ValueError()
+            except ValueError:
+                raise CommandParseError("find", f"-{primary.name} {' '.join(primary.values)}", "Expected a non-negative integer")
+
+            limits[primary.name] = levels
+
+    return (limits["mindepth"], limits["maxdepth"])
+
+
+def compile_expression(tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr]) -> Predicate:
+    """
+    Compiles an expression tree into a single predicate. A tree of None matches everything.
+
+    If the tree uses an operand that is not defined, a CommandParseError is thrown.
+    """
+    if tree is None:
+        return lambda path: True
+
+    return tree.compile()
+
+
+def prunes(tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr]) -> bool:
+    """
+    Returns True if the tree can prune directories, in which case it has to be evaluated on directories as well.
+    """
+    return any(p.name == "prune" for p in iter_primaries(tree))
+
+
+def matches_directories(tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr]) -> bool:
+    """
+    Returns True if the tree selects directories with -type d, in which case directories are evaluated and yielded
+    like other files.
+    """
+    return any(p.name == "type" and p.values == ["d"] for p in iter_primaries(tree))
+
+
+def descend(path: Union[Path, List[Path]], tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr], verbose=False,
+            behavior: SymlinkBehavior = SymlinkBehavior.NEVER_FOLLOW, index: Optional[FSIndex] = None) -> Iterator[Entry]:
+    """
+    Decends the given path depth-first. Yields an Entry for each file that matches the tree as soon as it is found, or
+    for every file if tree is None.
+
+    The walk is done by `walk`, so memory use depends on the depth of the tree rather than on the number of files in
+    it, and operands share one cached stat result per entry. Directories are only evaluated if the tree uses -prune
+    or -type d, and only yielded in the latter case. Subtrees that are pruned or below -maxdepth are never listed.
+    Symbolic links are followed according to `behavior`. If an index is given, directories that have not changed
+    since they were indexed are not read again.
+    """
+    if isinstance(path, (str, os.PathLike)):
+        path = [path]
+
+    predicate = compile_expression(tree)
+    min_depth, max_depth = depth_limits(tree)
+    yield_directories = matches_directories(tree)
+    visit_directories = yield_directories or prunes(tree)
+
+    scandir = index.scandir if index is not None else None
+
+    for current_item in walk(path, behavior.follow_symlinks, max_depth, behavior.follow_roots, scandir):
+        if current_item.depth < min_depth:
+            continue
+
+        if current_item.is_dir(current_item.follow):
+            if visit_directories and predicate(current_item) and yield_directories:
+                yield current_item
 
             if verbose:
-                print(f"Verbose: {str(current_item)} is directory, adding to stack.")
+                print(f"Verbose: {str(current_item)} is directory, {'pruned' if current_item.prune else 'adding to stack'}.")
         else:
-            evaluation = tree.evaluate(current_item)
+            evaluation = predicate(current_item)
             if evaluation:
-                rv.append(current_item)
-            
+                yield current_item
+
             if verbose:
                 print(f"Verbose: {str(current_item)} evaluated to {evaluation}")
 
-        i += 1
 
-    return rv
+def parallel_descend(path: Union[Path, List[Path]], tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr], jobs: int,
+                     ordered: bool = False, behavior: SymlinkBehavior = SymlinkBehavior.NEVER_FOLLOW,
+                     index: Optional[FSIndex] = None) -> Iterator[Entry]:
+    """
+    Like descend, but lists directories and evaluates the tree on `jobs` threads. Matches are yielded as soon as
+    they are found, or in lexicographical depth-first order if ordered is True.
+    """
+    if isinstance(path, (str, os.PathLike)):
+        path = [path]
 
+    predicate = compile_expression(tree)
+    min_depth, max_depth = depth_limits(tree)
+    if min_depth:
+        evaluate = predicate
+        predicate = lambda entry: entry.depth >= min_depth and evaluate(entry)  # noqa: E731
 
-@command("find")
-def find(args: List[str], env: Dict[str, str], f_in: IOBase, f_out: IOBase) -> int:
-    opt: Tuple[List[Tuple[str, str]], List[str]] = getopt(args, "HLPv")
+    scandir = index.scandir if index is not None else None
+
+    return parallel_walk(path, predicate, jobs, behavior.follow_symlinks, ordered, prunes(tree), max_depth, behavior.follow_roots,
+                         scandir, matches_directories(tree))
+
+
+class FindArguments(NamedTuple):
+    """
+    A parsed find command line.
+    """
+    options: List[str]
+    values: Dict[str, str]
+    jobs: int
+    paths: List[Path]
+    tree: Union[None, ASTPrimary, ASTBinNot, ASTBinOr]
+    token_count: int
+
+
+def parse_arguments(args: List[str]) -> FindArguments:
+    """
+    Parses the command line of find.
+
+    If an option is not recognized, a GetoptError is thrown. If the expression is not valid, a CommandParseError is
+    thrown.
+    """
+    opt: Tuple[List[Tuple[str, str]], List[str]] = getopt(args, "HLPvsJ:I:")
 
     # Flatten the options into a list of strings
     options: List[str] = [i[0][1:] for i in opt[0]]
+    values: Dict[str, str] = {i[0][1:]: i[1] for i in opt[0]}
+
+    try:
+        jobs = int(values.get("J", 1))
+        if jobs < 1:
+            raise ValueError()
+    except ValueError:
+        raise CommandParseError("find", values["J"], "Expected a number of jobs")
+
+    file_paths = list(map(Path, takewhile(lambda s: s != "!" and s != "(" and not s.startswith("-"), opt[1])))
+    operands = opt[1][len(file_paths):]
+    operand_tokens = tokenize_operands(operands)
+
+    # With no expression, every file matches
+    tree = ExpressionParser(operand_tokens).parse() if operand_tokens else None
+
+    return FindArguments(options, values, jobs, file_paths, tree, len(operand_tokens))
+
+
+def _supports(args: List[str]) -> bool:
+    """
+    Returns False for command lines that the find program runs differently, such as ones with primaries that are not
+    implemented here (-print, -delete, -exec, ...) or without a path.
+    """
+    try:
+        arguments = parse_arguments(args)
+        compile_expression(arguments.tree)
+        depth_limits(arguments.tree)
+    except (CommandParseError, GetoptError):
+        return False
+
+    # -v writes to the standard output of the process rather than to the command's output
+    return bool(arguments.paths) and "v" not in arguments.options
+
+
+@command("find", supports=_supports)
+def find(args: List[str], env: Dict[str, str], f_in: IOBase, f_out: IOBase) -> int:
+    options, values, jobs, file_paths, tree, token_count = parse_arguments(args)
 
     # Set variables to control program behavior
     behavior = determine_behavior(options)
     verbose = "v" in options
+    ordered = "s" in options
 
     if verbose:
         print("Verbose: Enabled")
+        print(f"Verbose: paths: {len(file_paths)}, parsed tokens: {token_count}, tree size: {tree.size() if tree else 0}")
 
-    file_paths = list(map(Path, takewhile(lambda s: s != "!" and s != "(" and not s.startswith("-"), opt[1])))
-    operands = opt[1][len(file_paths):]
-    operand_tokens = tokenize_operands(operands)
-    tree = expr_from_tokens(operand_tokens)
+    # -I FILE keeps an index of directory listings between runs
+    index = FSIndex(values["I"]) if "I" in values else None
 
-    if verbose:
-        print(f"Verbose: paths: {len(file_paths)}, parsed tokens: {len(operand_tokens)}, tree size: {tree.size()}")
+    try:
+        if jobs > 1 or ordered:
+            files = parallel_descend(file_paths, tree, jobs, ordered, behavior, index)
+        else:
+            files = descend(file_paths, tree, verbose, behavior, index)
+
+        for f in files:
+            print(f, file=f_out)
+    finally:
+        if index is not None:
+            index.close()
 
-    files = descend(file_paths, tree, verbose)
-    for f in files:
-        print(f, file=f_out)
+    return 0
 
 if __name__ == "__main__":
     quit(find(sys.argv[1:], os.environ, sys.stdin, sys.stdout))
@@ -0,0 +1,293 @@
+from typing import List, Dict, Set, Tuple, Optional, NamedTuple, Iterator
+import threading
+import sqlite3
+import stat
+import time
+import os
+
+
+# A directory modified this recently may still change within the same timestamp tick, so its listing is not reused
+RACY_SECONDS = 2
+
+
+class FileRecord(NamedTuple):
+    """
+    The metadata kept in an FSIndex for each file. A record read from the directory entry alone only has the file
+    type bits of `mode` and the inode; its size and modification time are -1.
+    """
+    mode: int
+    size: int
+    mtime_ns: int
+    inode: int
+
+    @property
+    def complete(self) -> bool:
+        return self.mtime_ns >= 0
+
+    def to_stat(self) -> os.stat_result:
+        """
+        Returns the record as an os.stat_result. Fields that are not recorded are zero.
+        """
+        mtime = self.mtime_ns / 1e9
+        return os.stat_result((self.mode, self.inode, 0, 0, 0, 0, self.size, 0, mtime, 0), {"st_mtime_ns": self.mtime_ns})
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result) -> "FileRecord":
+        return cls(st.st_mode, st.st_size, st.st_mtime_ns, st.st_ino)
+
+    @classmethod
+    def from_dirent(cls, dirent: os.DirEntry) -> "FileRecord":
+        """
+        Returns the record of a directory entry, only statting it if its type is not known from the directory
+        listing itself (d_type) or is not a regular file, a directory or a symbolic link.
+
+        If the entry has to be statted and no longer exists, an OSError is thrown.
+        """
+        if dirent.is_symlink():
+            return cls(stat.S_IFLNK, -1, -1, dirent.inode())
+        if dirent.is_dir(follow_symlinks=False):
+            return cls(stat.S_IFDIR, -1, -1, dirent.inode())
+        if dirent.is_file(follow_symlinks=False):
+            return cls(stat.S_IFREG, -1, -1, dirent.inode())
+
+        return cls.from_stat(dirent.stat(follow_symlinks=False))
+
+
+class IndexedDirEntry(object):
+    """
+    A stand-in for os.DirEntry that is served from an FSIndex.
+
+    Type checks never make a system call. `stat` returns the recorded metadata if the index trusts it and the record is
+    complete, and otherwise stats the file.
+    """
+    __slots__ = ("name", "path", "record", "_trusted")
+
+    def __init__(self, directory: str, name: str, record: FileRecord, trusted: bool):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self.record = record
+        self._trusted = trusted
+
+    def is_symlink(self) -> bool:
+        return stat.S_ISLNK(self.record.mode)
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        if follow_symlinks and self.is_symlink():
+            try:
+                return stat.S_ISDIR(os.stat(self.path).st_mode)
+            except OSError:
+                return False
+
+        return stat.S_ISDIR(self.record.mode)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        if follow_symlinks and self.is_symlink():
+            try:
+                return stat.S_ISREG(os.stat(self.path).st_mode)
+            except OSError:
+                return False
+
+        return stat.S_ISREG(self.record.mode)
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if follow_symlinks and self.is_symlink():
+            return os.stat(self.path)
+        if self._trusted and self.record.complete:
+            return self.record.to_stat()
+
+        return os.lstat(self.path)
+
+    def inode(self) -> int:
+        return self.record.inode
+
+
+class IndexedListing(object):
+    """
+    An iterator over IndexedDirEntry objects that can be used like the iterator returned by os.scandir.
+    """
+
+    def __init__(self, entries: List[IndexedDirEntry]):
+        self._it = iter(entries)
+
+    def __iter__(self) -> Iterator[IndexedDirEntry]:
+        return self
+
+    def __next__(self) -> IndexedDirEntry:
+        return next(self._it)
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "IndexedListing":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FSIndex(object):
+    """
+    A persistent index of filesystem metadata, stored in an SQLite database, mapping each path to its type, size,
+    modification time and inode.
+
+    Listing a directory costs one stat of the directory when its modification time has not changed since it was
+    indexed, instead of reading it again. A directory's modification time only changes when entries are added,
+    removed or renamed, so the names and types of its entries are always safe to reuse: a path that is missing from
+    the listing of an unchanged directory does not exist, without a stat of its own. File sizes and modification times
+    can change without touching the directory; they are only served from the index when `trust_files` is set, and
+    otherwise the `stat` of an existing file is a real system call. For the same reason, a directory is read without
+    statting its entries unless `trust_files` is set, since their types are known from the listing.
+
+    Each directory is validated at most once, until `revalidate` is called; listings stay in memory, so an index kept
+    between builds (as the build server does) only stats the directories again. Changes are written by `save` (or on
+    leaving a with block). The index is safe to share between threads.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS entries (
+            dir TEXT NOT NULL, name TEXT NOT NULL,
+            mode INTEGER NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL,
+            PRIMARY KEY (dir, name)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str, trust_files: bool = False):
+        self.path = path
+        self.trust_files = trust_files
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+        # The listing of each directory read so far, with the modification time it is valid for
+        self._listings: Dict[str, Tuple[int, Dict[str, FileRecord]]] = {}
+        self._validated: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, directory: str, mtime_ns: int) -> Optional[Dict[str, FileRecord]]:
+        row = self._db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (directory,)).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return None
+
+        rows = self._db.execute("SELECT name, mode, size, mtime_ns, inode FROM entries WHERE dir = ?", (directory,))
+        listing = {name: FileRecord(*record) for name, *record in rows}
+        # A listing read without trusting files is read again in full, so that its records can be trusted from now on
+        if self.trust_files and not all(record.complete for record in listing.values()):
+            return None
+
+        return listing
+
+    def _store(self, directory: str, mtime_ns: int, listing: Dict[str, FileRecord]) -> int:
+        """
+        Writes a listing to the database. Returns the modification time it is valid for.
+        """
+        # Listings taken while the directory may still be changing are kept for this run but not reused later
+        if time.time_ns() - mtime_ns < RACY_SECONDS * 10**9:
+            mtime_ns = -1
+
+        self._db.execute("DELETE FROM entries WHERE dir = ?", (directory,))
+        self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (directory, mtime_ns))
+        self._db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                             ((directory, name, *record) for name, record in listing.items()))
+        return mtime_ns
+
+    def _read(self, directory: str) -> Dict[str, FileRecord]:
+        listing = {}
+        trusted = self.trust_files
+        with os.scandir(directory) as it:
+            for dirent in it:
+                try:
+                    if trusted:
+                        listing[dirent.name] = FileRecord.from_stat(dirent.stat(follow_symlinks=False))
+                    else:
+                        listing[dirent.name] = FileRecord.from_dirent(dirent)
+                except OSError:
+                    continue
+
+        return listing
+
+    def listing(self, directory: str) -> Dict[str, FileRecord]:
+        """
+        Returns a dictionary mapping the name of each entry in the directory to its FileRecord.
+
+        If the directory cannot be read, an OSError is thrown.
+        """
+        directory = os.path.abspath(directory)
+
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached is not None and directory in self._validated:
+                return cached[1]
+
+            mtime_ns = os.stat(directory).st_mtime_ns
+            if cached is not None and cached[0] == mtime_ns:
+                self.hits += 1
+                listing = cached[1]
+            else:
+                listing = self._load(directory, mtime_ns)
+                if listing is None:
+                    self.misses += 1
+                    listing = self._read(directory)
+                    self._listings[directory] = (self._store(directory, mtime_ns, listing), listing)
+                else:
+                    self.hits += 1
+                    self._listings[directory] = (mtime_ns, listing)
+
+            self._validated.add(directory)
+            return listing
+
+    def revalidate(self):
+        """
+        Makes the next listing of each directory check its modification time again. Call it before each build when
+        the index is kept between builds.
+        """
+        with self._lock:
+            self._validated.clear()
+
+    def scandir(self, directory: str) -> IndexedListing:
+        """
+        Lists a directory like os.scandir, serving the entries from the index when the directory has not changed.
+        """
+        trusted = self.trust_files
+        return IndexedListing([IndexedDirEntry(directory, name, record, trusted) for name, record in self.listing(directory).items()])
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        Returns the stat result of a path, following symbolic links, or None if it does not exist. A path that is not
+        in the listing of its directory is missing without a stat. The result comes from the index if `trust_files`
+        is set, the path is not a symbolic link and its directory has not changed.
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        try:
+            record = self.listing(directory).get(name)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except OSError:
+            # A directory that cannot be listed may still be searchable
+            record = None
+        else:
+            if record is None:
+                return None
+
+        if self.trust_files and record is not None and record.complete and not stat.S_ISLNK(record.mode):
+            return record.to_stat()
+
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def save(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def __enter__(self) -> "FSIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,120 @@
+from .command import command, CommandParseError
+from typing import List, Dict, Tuple, Callable, Iterable
+from io import IOBase
+from getopt import getopt, GetoptError
+import re
+
+OPTIONS = "vFEqinclse:"
+
+# Characters that mean something else in a basic regular expression (the default syntax of grep) than in re
+BRE_DIFFERENCES = set("+?|(){}\\")
+
+
+def _parse(args: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Parses the command line of grep. Returns a tuple of (options, patterns, files).
+
+    If an option is not recognized, or no pattern is given, a CommandParseError is thrown.
+    """
+    try:
+        opt, operands = getopt(args, OPTIONS)
+    except GetoptError as e:
+        raise CommandParseError("grep", " ".join(args), str(e))
+
+    options = [o[0][1:] for o in opt]
+    patterns = [value for name, value in opt if name == "-e"]
+    if not patterns:
+        if not operands:
+            raise CommandParseError("grep", " ".join(args), "Expected a pattern")
+        patterns, operands = [operands[0]], operands[1:]
+
+    return (options, patterns, operands)
+
+
+def _supports(args: List[str]) -> bool:
+    try:
+        options, patterns, _ = _parse(args)
+    except CommandParseError:
+        return False
+
+    # Basic regular expressions are only run here where they mean the same as in re
+    return "F" in options or "E" in options or not any(BRE_DIFFERENCES.intersection(p) for p in patterns)
+
+
+def _compile(options: List[str], patterns: List[str]) -> Callable[[str], object]:
+    if "F" in options:
+        patterns = [re.escape(p) for p in patterns]
+
+    pattern = "|".join(f"(?:{p})" for p in patterns) if len(patterns) > 1 else patterns[0]
+    try:
+        return re.compile(pattern, re.IGNORECASE if "i" in options else 0).search
+    except re.error as e:
+        raise CommandParseError("grep", pattern, str(e))
+
+
+def _grep_lines(lines: Iterable[str], search, invert: bool, prefix: str, options: List[str], f_out: IOBase) -> int:
+    """
+    Writes the selected lines to f_out as the options ask. Returns the number of selected lines, stopping after the
+    first for -q and -l.
+    """
+    count = 0
+    for number, line in enumerate(lines, 1):
+        if bool(search(line)) == invert:
+            continue
+
+        count += 1
+        if "q" in options or "l" in options:
+            break
+
+        if "c" not in options:
+            if not line.endswith("\n"):
+                line += "\n"
+            f_out.write(f"{prefix}{number}:{line}" if "n" in options else f"{prefix}{line}")
+
+    return count
+
+
+@command("grep", supports=_supports)
+def grep(args: List[str], env: Dict[str, str], f_in: IOBase, f_out: IOBase) -> int:
+    """
+    Copies the lines of the input stream, or of the files given after the pattern, that match a pattern to the output
+    stream, one line at a time. Supports -v (invert the match), -F (fixed string pattern), -E (extended pattern),
+    -e PATTERN (any number of patterns), -i (ignore case), -n (line numbers), -c (count the lines), -l (list the
+    files), -q (no output) and -s (no messages about missing files).
+    With several files, each line is prefixed with the name of its file.
+    Returns 0 if any line was selected, 1 if none was, and 2 if a file could not be read.
+    """
+    options, patterns, files = _parse(args)
+    search = _compile(options, patterns)
+    invert = "v" in options
+    selected = False
+    error = False
+
+    for name in files or ["-"]:
+        prefix = f"{name}:" if len(files) > 1 else ""
+        try:
+            if name == "-":
+                count = _grep_lines(f_in, search, invert, prefix, options, f_out)
+            else:
+                with open(name, errors="surrogateescape") as f:
+                    count = _grep_lines(f, search, invert, prefix, options, f_out)
+        except OSError as e:
+            if "s" not in options:
+                f_out.write(f"grep: {name}: {e.strerror}\n")
+            error = True
+            continue
+
+        if "c" in options and "q" not in options:
+            f_out.write(f"{prefix}{count}\n")
+        elif "l" in options and count and "q" not in options:
+            f_out.write(f"{'(standard input)' if name == '-' else name}\n")
+
+        if count:
+            selected = True
+            if "q" in options:
+                return 0
+
+    if error:
+        return 2
+
+    return 0 if selected else 1
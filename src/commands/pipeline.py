@@ -0,0 +1,150 @@
+from .command import resolve_command
+from typing import List, Dict, Optional
+from io import IOBase
+from queue import Queue, Full, Empty
+import threading
+
+
+class Pipe(object):
+    """
+    A bounded, thread-safe text stream that connects the output of one command to the input of another.
+
+    The writing side blocks once `maxsize` chunks are waiting to be read, so a fast producer cannot run ahead of its
+    consumer. The writer calls `close` to signal end of file. The reader calls `abandon` when it stops reading, after
+    which writes raise BrokenPipeError so the producer can stop early.
+    """
+
+    _EOF = object()
+
+    def __init__(self, maxsize: int = 64):
+        self._queue = Queue(maxsize)
+        self._buffer = ""
+        self._eof = False
+        self._abandoned = threading.Event()
+
+    def write(self, s: str) -> int:
+        while True:
+            if self._abandoned.is_set():
+                raise BrokenPipeError("pipe reader has exited")
+            try:
+                self._queue.put(s, timeout=0.05)
+                return len(s)
+            except Full:
+                continue
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """
+        Signals end of file to the reader.
+        """
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(self._EOF, timeout=0.05)
+                return
+            except Full:
+                continue
+
+    def abandon(self):
+        """
+        Signals that nothing more will be read. Pending and future writes raise BrokenPipeError.
+        """
+        self._abandoned.set()
+
+        # Drain the queue so that a blocked writer wakes up
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+
+    def _fill(self) -> bool:
+        """
+        Moves the next chunk from the queue into the buffer. Returns False at end of file.
+        """
+        if self._eof:
+            return False
+
+        chunk = self._queue.get()
+        if chunk is self._EOF:
+            self._eof = True
+            return False
+
+        self._buffer += chunk
+        return True
+
+    def readline(self) -> str:
+        while "\n" not in self._buffer:
+            if not self._fill():
+                break
+
+        line, sep, self._buffer = self._buffer.partition("\n")
+        return line + sep
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            if not self._fill():
+                break
+
+        if size < 0:
+            size = len(self._buffer)
+
+        rv, self._buffer = self._buffer[:size], self._buffer[size:]
+        return rv
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+
+        return line
+
+
+def run_pipeline(stages: List[List[str]], env: Dict[str, str], f_in: IOBase, f_out: IOBase, maxsize: int = 64) -> int:
+    """
+    Runs built-in commands connected by pipes, like `find . -name '*.py' | grep test`. Every stage runs on its own
+    thread, so each one consumes the output of the previous stage while it is still being produced.
+
+    `stages` is a list of command lines, each split into words. Returns the exit status of the last stage. If a stage
+    raises an exception, the first one (in pipeline order) is re-raised once every stage has stopped.
+
+    If a stage is not a built-in command, a KeyError is thrown.
+    """
+    funcs = [resolve_command(words[0]) for words in stages]
+    pipes = [Pipe(maxsize) for _ in stages[1:]]
+    inputs: List[IOBase] = [f_in] + pipes
+    outputs: List[IOBase] = pipes + [f_out]
+    statuses: List[Optional[int]] = [None] * len(stages)
+    errors: List[Optional[BaseException]] = [None] * len(stages)
+
+    def run_stage(i: int):
+        try:
+            statuses[i] = funcs[i](stages[i][1:], env, inputs[i], outputs[i]) or 0
+        except BrokenPipeError:
+            # The next stage stopped reading, which is not an error
+            statuses[i] = 0
+        except BaseException as e:
+            errors[i] = e
+            statuses[i] = 1
+        finally:
+            if i > 0:
+                pipes[i - 1].abandon()
+            if i < len(pipes):
+                pipes[i].close()
+
+    threads = [threading.Thread(target=run_stage, args=(i,), name=f"pipeline-{stages[i][0]}", daemon=True)
+               for i in range(len(stages))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for e in errors:
+        if e is not None:
+            raise e
+
+    return statuses[-1]
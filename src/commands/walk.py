@@ -0,0 +1,431 @@
+from typing import List, Dict, Iterable, Iterator, Optional, Union, Tuple, Callable
+from collections import deque
+from queue import Queue
+import threading
+import os
+import stat
+
+
+_FILE_TYPES = {
+    stat.S_IFBLK: "b",
+    stat.S_IFCHR: "c",
+    stat.S_IFDIR: "d",
+    stat.S_IFIFO: "p",
+    stat.S_IFREG: "f",
+    stat.S_IFLNK: "l",
+    stat.S_IFSOCK: "s",
+}
+
+
+class Entry(object):
+    """
+    A file visited by `walk`.
+
+    Type information comes from the directory entry (d_type) when the OS provides it, so `is_dir` and `is_symlink`
+    normally cost no system calls. `stat` and `lstat` are fetched at most once per entry and cached, so any number of
+    operands can inspect the same entry for the price of a single system call.
+
+    Setting `prune` on a directory entry while it is being visited stops the walk from descending into it. `follow`
+    records whether symbolic links are followed for this entry; see `info`.
+    """
+    __slots__ = ("path", "name", "depth", "follow", "prune", "_dirent", "_stat", "_lstat")
+
+    def __init__(self, path: str, name: str, depth: int, dirent: Optional[os.DirEntry] = None, follow: bool = False):
+        self.path = path
+        self.name = name
+        self.depth = depth
+        self.follow = follow
+        self.prune = False
+        self._dirent = dirent
+        self._stat: Optional[os.stat_result] = None
+        self._lstat: Optional[os.stat_result] = None
+
+    def _fetch(self, follow_symlinks: bool) -> os.stat_result:
+        """
+        Performs the stat system call. Every stat of an entry goes through here.
+        """
+        if self._dirent is not None:
+            return self._dirent.stat(follow_symlinks=follow_symlinks)
+
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+    def lstat(self) -> os.stat_result:
+        """
+        Returns the stat result of the entry itself, without following symbolic links.
+        """
+        if self._lstat is None:
+            self._lstat = self._fetch(False)
+
+        return self._lstat
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        """
+        Returns the stat result of the entry, following symbolic links unless follow_symlinks is False.
+        """
+        if not follow_symlinks:
+            return self.lstat()
+
+        if self._stat is None:
+            if self._lstat is not None and not stat.S_ISLNK(self._lstat.st_mode):
+                self._stat = self._lstat
+            else:
+                self._stat = self._fetch(True)
+
+        return self._stat
+
+    def info(self) -> os.stat_result:
+        """
+        Returns the stat result that tests on this entry should use: the target of a symbolic link if links are
+        followed for this entry and the target exists, otherwise the entry itself.
+        """
+        if self.follow:
+            try:
+                return self.stat()
+            except OSError:
+                pass
+
+        return self.lstat()
+
+    def file_type(self) -> str:
+        """
+        Returns the type of the entry (after following symbolic links if `follow` is set) as one of the letters
+        used by find's -type: b, c, d, p, f, l or s. Directories, regular files and links are answered from the
+        directory entry without a system call where possible.
+        """
+        if self._dirent is not None:
+            try:
+                if not self._dirent.is_symlink():
+                    if self._dirent.is_dir(follow_symlinks=False):
+                        return "d"
+                    if self._dirent.is_file(follow_symlinks=False):
+                        return "f"
+                elif not self.follow:
+                    return "l"
+            except OSError:
+                pass
+
+        return _FILE_TYPES.get(stat.S_IFMT(self.info().st_mode), "?")
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        try:
+            if self._dirent is not None:
+                return self._dirent.is_dir(follow_symlinks=follow_symlinks)
+
+            return stat.S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self) -> bool:
+        try:
+            if self._dirent is not None:
+                return self._dirent.is_symlink()
+
+            return stat.S_ISLNK(self.lstat().st_mode)
+        except OSError:
+            return False
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __str__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"Entry({self.path!r})"
+
+
+def _directory_key(entry: Entry) -> Optional[Tuple[int, int]]:
+    try:
+        st = entry.stat()
+    except OSError:
+        return None
+
+    return (st.st_dev, st.st_ino)
+
+
+def walk(roots: Iterable[Union[str, os.PathLike]], follow_symlinks: bool = False, max_depth: Optional[int] = None,
+         follow_roots: Optional[bool] = None, scandir: Optional[Callable] = None) -> Iterator[Entry]:
+    """
+    Walks each root depth-first with os.scandir, yielding an Entry for every file and directory (roots included)
+    before the contents of that directory. Roots are at depth 0.
+
+    A directory is not descended into if its entry was pruned by the consumer, or if it is at `max_depth`. Symbolic
+    links are followed for roots if follow_roots is True (it defaults to follow_symlinks) and for everything else if
+    follow_symlinks is True. When links are followed, directories that are already being walked are skipped so that
+    link cycles terminate.
+
+    Apart from the roots, which are stat'ed once each, no stat system calls are made unless an entry's `stat` or
+    `lstat` is used, links are followed, or the filesystem does not report file types in its directory entries.
+
+    Directories are listed with `scandir`, which defaults to os.scandir. Pass FSIndex.scandir to serve unchanged
+    directories from an index.
+    """
+    if follow_roots is None:
+        follow_roots = follow_symlinks
+    if scandir is None:
+        scandir = os.scandir
+
+    stack: List[Tuple[Iterator[os.DirEntry], int, Optional[Tuple[int, int]]]] = []
+    active = set()
+
+    def enter(entry: Entry, depth: int):
+        key = None
+        if entry.follow:
+            key = _directory_key(entry)
+            if key in active:
+                return
+            active.add(key)
+
+        stack.append((scandir(entry.path), depth, key))
+
+    try:
+        for root in roots:
+            root = os.fspath(root)
+            entry = Entry(root, os.path.basename(os.path.normpath(root)), 0, follow=follow_roots)
+            yield entry
+
+            if not entry.prune and (max_depth is None or max_depth > 0) and entry.is_dir(follow_roots):
+                enter(entry, 1)
+
+            while stack:
+                it, depth, key = stack[-1]
+                dirent = next(it, None)
+                if dirent is None:
+                    it.close()
+                    stack.pop()
+                    active.discard(key)
+                    continue
+
+                entry = Entry(dirent.path, dirent.name, depth, dirent, follow_symlinks)
+                yield entry
+
+                if not entry.prune and (max_depth is None or depth < max_depth) and entry.is_dir(follow_symlinks):
+                    enter(entry, depth + 1)
+    finally:
+        for it, _, _ in stack:
+            it.close()
+
+
+class ParallelWalker(object):
+    """
+    Walks directories on a pool of threads. Each worker lists directories from its own deque, newest first, and
+    steals the oldest directory from another worker's deque when its own is empty.
+
+    Non-directory entries are tested with `predicate` on the worker that finds them. Matches are either streamed
+    through a queue as soon as they are found, or, when `ordered` is set, collected per directory so that the
+    consumer can emit them in lexicographical depth-first order.
+
+    If `visit_directories` is set, directories are passed to the predicate too, so that it can prune them; the
+    result is ignored. If `yield_directories` is set, directories are passed to the predicate and yielded when they
+    match, before their contents. Directories at `max_depth` are not listed. Symbolic links are followed as in `walk`; when they
+    are, each directory is listed at most once. Directories are listed with `scandir`, as in `walk`.
+    """
+
+    _DONE = object()
+
+    def __init__(self, predicate: Callable[[Entry], bool], jobs: int, follow_symlinks: bool = False, ordered: bool = False,
+                 visit_directories: bool = False, max_depth: Optional[int] = None, follow_roots: Optional[bool] = None,
+                 scandir: Optional[Callable] = None, yield_directories: bool = False):
+        if jobs < 1:
+            raise ValueError(f"Expected a positive number of jobs, got {jobs}")
+
+        self.predicate = predicate
+        self.jobs = jobs
+        self.follow_symlinks = follow_symlinks
+        self.follow_roots = follow_symlinks if follow_roots is None else follow_roots
+        self.ordered = ordered
+        self.visit_directories = visit_directories
+        self.yield_directories = yield_directories
+        self.max_depth = max_depth
+        self.scandir = scandir
+
+        self._cond = threading.Condition()
+        self._deques = [deque() for _ in range(jobs)]
+        self._outstanding = 0
+        self._stopped = False
+        self._results = Queue()
+        # Each listing holds (name, entry, listed, matched) in name order
+        self._listings: Dict[str, Union[List[Tuple[str, Entry, bool, bool]], BaseException]] = {}
+        self._seen = set()
+
+    def _submit(self, entry: Entry, worker: int):
+        with self._cond:
+            self._outstanding += 1
+            self._deques[worker].append(entry)
+            self._cond.notify()
+
+    def _take(self, worker: int) -> Optional[Entry]:
+        with self._cond:
+            while not self._stopped:
+                own = self._deques[worker]
+                if own:
+                    return own.pop()
+
+                for i in range(1, self.jobs):
+                    victim = self._deques[(worker + i) % self.jobs]
+                    if victim:
+                        return victim.popleft()
+
+                if self._outstanding == 0:
+                    break
+
+                self._cond.wait()
+
+            return None
+
+    def _list(self, directory: Entry, worker: int):
+        children = []
+        with (self.scandir or os.scandir)(directory.path) as it:
+            for dirent in it:
+                child = Entry(dirent.path, dirent.name, directory.depth + 1, dirent, self.follow_symlinks)
+                if child.is_dir(self.follow_symlinks):
+                    listed, matched = self._should_list(child)
+                    if listed:
+                        self._submit(child, worker)
+                    if self.ordered:
+                        if listed or matched:
+                            children.append((child.name, child, listed, matched))
+                    elif matched:
+                        self._results.put(child)
+                elif self.predicate(child):
+                    if self.ordered:
+                        children.append((child.name, child, False, True))
+                    else:
+                        self._results.put(child)
+
+        if self.ordered:
+            children.sort(key=lambda c: c[0])
+            with self._cond:
+                self._listings[directory.path] = children
+                self._cond.notify_all()
+
+    def _should_list(self, directory: Entry) -> Tuple[bool, bool]:
+        """
+        Returns whether a directory should be listed, and whether it should be yielded.
+        """
+        matched = False
+        if self.yield_directories:
+            matched = bool(self.predicate(directory))
+        elif self.visit_directories:
+            self.predicate(directory)
+
+        if directory.prune or (self.max_depth is not None and directory.depth >= self.max_depth):
+            return (False, matched)
+
+        if directory.follow:
+            key = _directory_key(directory)
+            with self._cond:
+                if key in self._seen:
+                    return (False, matched)
+                self._seen.add(key)
+
+        return (True, matched)
+
+    def _run(self, worker: int):
+        while True:
+            directory = self._take(worker)
+            if directory is None:
+                return
+
+            try:
+                self._list(directory, worker)
+            except BaseException as e:
+                if self.ordered:
+                    with self._cond:
+                        self._listings[directory.path] = e
+                else:
+                    self._results.put(e)
+            finally:
+                with self._cond:
+                    self._outstanding -= 1
+                    if self._outstanding == 0:
+                        self._cond.notify_all()
+                        self._results.put(self._DONE)
+
+    def _wait_for_listing(self, directory: Entry) -> List[Tuple[str, Entry, bool, bool]]:
+        with self._cond:
+            while directory.path not in self._listings:
+                self._cond.wait()
+
+            listing = self._listings.pop(directory.path)
+
+        if isinstance(listing, BaseException):
+            raise listing
+
+        return listing
+
+    def walk(self, roots: Iterable[Union[str, os.PathLike]]) -> Iterator[Entry]:
+        """
+        Yields every non-directory entry under the roots (or root itself) that matches the predicate, and the matching
+        directories if `yield_directories` is set.
+
+        If listing a directory fails, the exception is re-raised here.
+        """
+        root_entries = []
+        for root in roots:
+            root = os.fspath(root)
+            entry = Entry(root, os.path.basename(os.path.normpath(root)), 0, follow=self.follow_roots)
+            is_dir = entry.is_dir(self.follow_roots)
+            if not is_dir:
+                # Tested by the consumer
+                root_entries.append((entry.name, entry, False, None))
+            else:
+                listed, matched = self._should_list(entry)
+                if listed or matched:
+                    root_entries.append((entry.name, entry, listed, matched))
+                if listed:
+                    self._submit(entry, 0)
+
+        has_directories = self._outstanding > 0
+        threads = [threading.Thread(target=self._run, args=(i,), name=f"walk-{i}", daemon=True) for i in range(self.jobs)]
+        for t in threads:
+            t.start()
+
+        try:
+            if self.ordered:
+                yield from self._walk_ordered(root_entries)
+            else:
+                for _, entry, _, matched in root_entries:
+                    if matched or (matched is None and self.predicate(entry)):
+                        yield entry
+
+                while has_directories:
+                    item = self._results.get()
+                    if item is self._DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+        finally:
+            with self._cond:
+                self._stopped = True
+                self._cond.notify_all()
+            for t in threads:
+                t.join()
+
+    def _walk_ordered(self, root_entries: List[Tuple[str, Entry, bool, Optional[bool]]]) -> Iterator[Entry]:
+        # Roots that are not directories are predicate-tested here; all other entries have already been tested
+        stack = [iter(root_entries)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+
+            _, entry, listed, matched = item
+            if matched or (matched is None and self.predicate(entry)):
+                yield entry
+            if listed:
+                stack.append(iter(self._wait_for_listing(entry)))
+
+
+def parallel_walk(roots: Iterable[Union[str, os.PathLike]], predicate: Callable[[Entry], bool], jobs: int,
+                  follow_symlinks: bool = False, ordered: bool = False, visit_directories: bool = False,
+                  max_depth: Optional[int] = None, follow_roots: Optional[bool] = None,
+                  scandir: Optional[Callable] = None, yield_directories: bool = False) -> Iterator[Entry]:
+    """
+    Walks the roots on `jobs` threads, yielding every non-directory entry that matches the predicate (and every
+    matching directory if `yield_directories` is set). See ParallelWalker.
+    """
+    return ParallelWalker(predicate, jobs, follow_symlinks, ordered, visit_directories, max_depth, follow_roots,
+                          scandir, yield_directories).walk(roots)
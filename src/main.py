@@ -0,0 +1,67 @@
+"""
+Command line entry point.
+
+    python main.py make [OPTIONS] [GOALS]
+    python main.py COMMAND [ARGS]        (a built-in command such as echo, find or grep)
+
+If this file is linked or copied under the name of a command (for example `find` or `make`), it runs that command.
+
+Only the modules of the command being run are imported, since recipes can launch many short-lived invocations.
+"""
+from commands.command import is_command, resolve_command, CommandError
+from typing import List, Dict
+from getopt import GetoptError
+import os
+import sys
+
+
+def usage(f_err) -> int:
+    print("usage: main.py make [OPTIONS] [GOALS] | main.py COMMAND [ARGS]", file=f_err)
+    return 2
+
+
+def main(argv: List[str], env: Dict[str, str], f_in=sys.stdin, f_out=sys.stdout, f_err=sys.stderr) -> int:
+    """
+    Runs the command named by the program name in argv[0], or else by argv[1]. Returns the exit status.
+    """
+    name = os.path.splitext(os.path.basename(argv[0]))[0]
+    args = argv[1:]
+    if name != "make" and not is_command(name):
+        if not args:
+            return usage(f_err)
+
+        name, args = args[0], args[1:]
+
+    if name == "make":
+        from make.client import SERVER_VARIABLE, run_remote
+
+        # With PYMAKE_SERVER set, the build runs on a warm build server (see make.server) if one is listening
+        if env.get(SERVER_VARIABLE):
+            try:
+                return run_remote(env[SERVER_VARIABLE], args, env, None, f_out, f_err)
+            except OSError:
+                pass
+            except EOFError:
+                print("make: lost the connection to the build server", file=f_err)
+                return 2
+
+        from make.cli import make
+        return make(args, env, f_out, f_err)
+
+    if not is_command(name):
+        print(f"{name}: command not found", file=f_err)
+        return 127
+
+    try:
+        return resolve_command(name)(args, env, f_in, f_out) or 0
+    except CommandError as e:
+        print(e, file=f_err)
+        return 1
+    except GetoptError as e:
+        # Commands that parse their options with getopt report unknown options this way
+        print(f"{name}: {e}", file=f_err)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv, dict(os.environ)))
@@ -0,0 +1,115 @@
+"""
+The asyncio build backend, selected with `make --scheduler asyncio`. Recipes run as asyncio subprocesses whose output
+is read as it arrives, and up to -j of them run as tasks on one event loop.
+
+This module is only imported when the backend is selected, since asyncio takes longer to import than the rest of make.
+"""
+from .executor import split_builtin, run_builtin, parse_recipe_prefix
+from .graph import BuildGraph
+from .scheduler import BuildReport, JobStats, BuildState, over_max_load
+from . import trace
+from typing import List, Dict, Callable, Awaitable, Optional
+from io import IOBase
+import asyncio
+import codecs
+import contextvars
+import time
+
+
+# How much of a subprocess' output is read at a time
+CHUNK_SIZE = 1 << 16
+
+
+async def _copy_stream(stream: asyncio.StreamReader, f_out: IOBase):
+    # A chunk may end in the middle of a multi-byte character
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        f_out.write(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            break
+
+
+async def run_command_async(line: str, env: Dict[str, str], f_out: IOBase) -> int:
+    """
+    Like run_command, but runs the shell as an asyncio subprocess whose stdout and stderr are read as they arrive,
+    and runs built-in commands on the event loop's default executor.
+    Returns the exit status of the command.
+    """
+    loop = asyncio.get_running_loop()
+    pipeline = split_builtin(line)
+    if pipeline is not None:
+        # Run in a copy of this task's context, which holds the build's tracer and counter
+        return await loop.run_in_executor(None, contextvars.copy_context().run, run_builtin, pipeline, env, f_out)
+
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_shell(line, env=env, stdin=asyncio.subprocess.DEVNULL,
+                                                 stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    await asyncio.gather(_copy_stream(proc.stdout, f_out), _copy_stream(proc.stderr, f_out))
+    status = await proc.wait()
+
+    # The event loop's child watcher reaps the process, so only the wall time is known here
+    tracer = trace.current()
+    if tracer is not None:
+        tracer.complete("sh", "command", start, time.perf_counter(), {"command": line, "status": status})
+
+    return status
+
+
+async def run_recipe_async(recipe: List[str], env: Dict[str, str], f_out: IOBase) -> int:
+    """
+    Like run_recipe, but runs each line with run_command_async.
+    Returns the exit status of the recipe.
+    """
+    for line in recipe:
+        silent, ignore_errors, line = parse_recipe_prefix(line)
+        if not line:
+            continue
+
+        if not silent:
+            print(line, file=f_out)
+
+        status = await run_command_async(line, env, f_out)
+        if status and not ignore_errors:
+            return status
+
+    return 0
+
+
+async def schedule_async(graph: BuildGraph, targets: List[str], run_target: Callable[[str], Awaitable[int]],
+                         jobs: int = 1, max_load: Optional[float] = None, keep_going: bool = False,
+                         poll_interval: float = 0.1) -> BuildReport:
+    """
+    Like schedule, but `run_target` is a coroutine function and up to `jobs` of them run concurrently as tasks on the
+    running event loop instead of on a thread pool.
+    """
+    if jobs < 1:
+        raise ValueError(f"Expected a positive number of jobs, got {jobs}")
+
+    state = BuildState(graph, targets, jobs, keep_going)
+
+    async def job(target: str, worker: int) -> JobStats:
+        start = time.perf_counter()
+        status = await run_target(target)
+        return JobStats(target, worker, start, time.perf_counter(), status)
+
+    running = set()
+    while running or state.can_start():
+        throttled = False
+        while state.can_start():
+            if over_max_load(max_load, running):
+                throttled = True
+                break
+
+            target, worker = state.start()
+            running.add(asyncio.ensure_future(job(target, worker)))
+
+        if not running:
+            break
+
+        done, running = await asyncio.wait(running, timeout=poll_interval if throttled else None,
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            state.finish(task.result())
+
+    return state.report()
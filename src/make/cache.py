@@ -0,0 +1,205 @@
+from .parser import Rule
+from typing import List, Dict, Optional, Iterable, Set
+import threading
+import hashlib
+import sqlite3
+import shutil
+import json
+import stat
+import os
+import re
+
+
+# Files are hashed in chunks of this many bytes, so memory use does not depend on file size
+CHUNK_SIZE = 1 << 20
+
+MACRO_REFERENCE = re.compile(r"\$[({]([^)}\s:]+)[)}]")
+
+
+def referenced_macros(text: Iterable[str], macros: Dict[str, str]) -> Set[str]:
+    """
+    Returns the names of the macros that the text refers to as $(NAME) or ${NAME}, directly or through the values of
+    other macros.
+    """
+    names = set()
+    work = list(text)
+    while work:
+        for name in MACRO_REFERENCE.findall(work.pop()):
+            if name not in names:
+                names.add(name)
+                if name in macros:
+                    work.append(macros[name])
+
+    return names
+
+
+class FileHasher(object):
+    """
+    Computes SHA-256 digests of files. Digests are memoized in an SQLite database by (inode, mtime, size), so a file
+    is only read again once it has changed. The hasher is safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS hashes "
+                         "(path TEXT PRIMARY KEY, inode INTEGER, mtime_ns INTEGER, size INTEGER, digest TEXT)")
+
+    def hash(self, path: str) -> Optional[str]:
+        """
+        Returns the hex digest of a file's contents, or None if it is not a regular file.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._db.execute("SELECT inode, mtime_ns, size, digest FROM hashes WHERE path = ?", (path,)).fetchone()
+        if row is not None and tuple(row[:3]) == (st.st_ino, st.st_mtime_ns, st.st_size):
+            return row[3]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        rv = digest.hexdigest()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", (path, st.st_ino, st.st_mtime_ns, st.st_size, rv))
+
+        return rv
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+class BuildCache(object):
+    """
+    A local content-addressed cache of build outputs.
+
+    A rule's cache key is a hash of its targets, its recipe, the contents of its prerequisites and the values of the
+    macros its recipe refers to. After a recipe succeeds, its targets are stored under the key; on a later build with
+    the same key, they are restored instead of running the recipe.
+
+    Layout of the cache directory:
+        objects/ab/abcdef...  -- file contents, named by their digest
+        actions/12/123456...  -- JSON manifests mapping each target to the digest of its contents
+        hashes.sqlite3        -- memoized file digests (see FileHasher)
+
+    Outputs are restored by copying them, or by hard linking them if `hardlink` is set. Hard links are faster, but a
+    recipe that later modifies a restored target in place would also modify the cached copy.
+    """
+
+    def __init__(self, directory: str, hardlink: bool = False):
+        self.directory = directory
+        self.hardlink = hardlink
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "actions"), exist_ok=True)
+        self.hasher = FileHasher(os.path.join(directory, "hashes.sqlite3"))
+
+    def _path(self, kind: str, digest: str) -> str:
+        return os.path.join(self.directory, kind, digest[:2], digest)
+
+    def key(self, rule: Rule, macros: Dict[str, str], targets: Optional[List[str]] = None) -> str:
+        """
+        Returns the cache key for building `targets` (by default, all of the rule's targets) with a rule.
+        Prerequisites that are not regular files (such as phony targets) contribute only their names.
+        """
+        digest = hashlib.sha256()
+
+        def add(*parts: str):
+            for part in parts:
+                digest.update(part.encode())
+                digest.update(b"\0")
+
+        add("targets", *(rule.targets if targets is None else targets))
+        add("recipe", *rule.recipe)
+        for component in rule.components:
+            add("component", component, self.hasher.hash(component) or "-")
+        for name in sorted(referenced_macros(rule.recipe, macros)):
+            add("macro", name, macros.get(name, ""))
+
+        return digest.hexdigest()
+
+    def _install(self, source: str, destination: str):
+        """
+        Atomically replaces destination with a copy (or hard link) of source.
+        """
+        directory = os.path.dirname(destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary = f"{destination}.cache-tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            if self.hardlink:
+                try:
+                    os.link(source, temporary)
+                except OSError:
+                    shutil.copy2(source, temporary)
+            else:
+                shutil.copy2(source, temporary)
+
+            os.replace(temporary, destination)
+        finally:
+            if os.path.lexists(temporary):
+                os.unlink(temporary)
+
+    def restore(self, key: str, targets: List[str]) -> bool:
+        """
+        Restores the targets stored under the key. Returns False, leaving the targets untouched, if the key is not in
+        the cache or any of its objects is missing.
+        """
+        try:
+            with open(self._path("actions", key)) as fp:
+                manifest: Dict[str, str] = json.load(fp)
+        except (OSError, ValueError):
+            return False
+
+        if sorted(manifest) != sorted(targets):
+            return False
+
+        objects = {target: self._path("objects", digest) for target, digest in manifest.items()}
+        if not all(os.path.isfile(o) for o in objects.values()):
+            return False
+
+        for target, obj in objects.items():
+            self._install(obj, target)
+            # Restored outputs must look newer than their prerequisites
+            os.utime(target)
+
+        return True
+
+    def store(self, key: str, targets: List[str]) -> bool:
+        """
+        Stores the targets under the key. Returns False if any target is not a regular file, in which case nothing
+        is stored.
+        """
+        manifest = {}
+        for target in targets:
+            digest = self.hasher.hash(target)
+            if digest is None:
+                return False
+            manifest[target] = digest
+
+        for target, digest in manifest.items():
+            obj = self._path("objects", digest)
+            if not os.path.exists(obj):
+                self._install(target, obj)
+
+        path = self._path("actions", key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(temporary, "w") as fp:
+            json.dump(manifest, fp)
+        os.replace(temporary, path)
+
+        return True
+
+    def close(self):
+        self.hasher.close()
@@ -0,0 +1,278 @@
+from .compact import parse_path_compact
+from .parse_cache import parse_path_cached
+from .graph import BuildGraph
+from .depfile import DepfileLoader
+from .executor import Executor, LocalExecutor, Job, BuiltinCounter, current_counter
+from .scheduler import schedule, BuildReport
+from .cache import BuildCache
+from . import trace
+from commands.fsindex import FSIndex
+from typing import List, Dict, Tuple, Callable, Optional
+from getopt import getopt, GetoptError
+from io import StringIO
+import contextlib
+import threading
+import time
+import sys
+import os
+
+
+# threads runs each job's recipe on a thread pool; asyncio runs them as subprocesses on one event loop
+SCHEDULERS = ("threads", "asyncio")
+
+
+def parse_args(args: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Parses make's command line. Returns a dictionary of options and the list of goals.
+    """
+    opt, goals = getopt(args, "f:j:l:k", ["report", "index=", "trust-index", "cache=", "parse-cache=", "scheduler=", "trace=",
+                                          "watch", "depfile-cache=", "workers=", "retry-locally",
+                                          "cache-hardlink"])
+
+    return (dict(opt), goals)
+
+
+def make(args: List[str], env: Dict[str, str], f_out=sys.stdout, f_err=sys.stderr,
+         parse: Optional[Callable[[str], list]] = None, job_slots: Optional[threading.Semaphore] = None,
+         depfiles: Optional[DepfileLoader] = None, index: Optional[FSIndex] = None) -> int:
+    """
+    Runs make with the given command line. Returns the exit status.
+
+    A long-running caller such as the build server can pass `parse`, which replaces parse_path_compact to parse the makefile
+    (unless --parse-cache is given), `job_slots`, a semaphore that every job must acquire, to share one limit on
+    concurrent jobs between builds, `depfiles`, which keeps included files parsed between builds (unless
+    --depfile-cache is given), and `index`, an FSIndex that keeps directory listings between builds (unless --index
+    is given).
+    """
+    try:
+        options, goals = parse_args(args)
+        jobs = int(options.get("-j", 1))
+        max_load = float(options["-l"]) if "-l" in options else None
+        scheduler = options.get("--scheduler", "threads")
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown scheduler '{scheduler}', expected one of {', '.join(SCHEDULERS)}")
+        if "--workers" in options and scheduler != "threads":
+            raise ValueError("--workers requires the threads scheduler")
+    except (GetoptError, ValueError) as e:
+        print(f"make: {e}", file=f_err)
+        return 2
+
+    # Every build counts its built-in commands separately, even when several run at once on the build server
+    counter = current_counter.set(BuiltinCounter())
+    try:
+        if "--trace" not in options:
+            return _build(options, goals, env, jobs, max_load, scheduler, f_out, f_err, parse, job_slots, depfiles, index)
+
+        # --trace FILE writes a Chrome trace of the build, even if it fails
+        tracer = trace.enable()
+        try:
+            return _build(options, goals, env, jobs, max_load, scheduler, f_out, f_err, parse, job_slots, depfiles, index)
+        finally:
+            trace.disable()
+            try:
+                tracer.save(options["--trace"])
+            except OSError as e:
+                print(f"make: {e}", file=f_err)
+    finally:
+        current_counter.reset(counter)
+
+
+def _build(options: Dict[str, str], goals: List[str], env: Dict[str, str], jobs: int, max_load: Optional[float],
+           scheduler: str, f_out, f_err, parse: Optional[Callable[[str], list]],
+           job_slots: Optional[threading.Semaphore], depfiles: Optional[DepfileLoader], index: Optional[FSIndex]) -> int:
+    makefile = options.get("-f", "Makefile")
+
+    def build(graph: BuildGraph, targets: List[str]) -> int:
+        return _run_targets(graph, targets, options, env, jobs, max_load, scheduler, f_out, f_err, job_slots)
+
+    # --watch keeps the graph and file metadata in memory and rebuilds on changes until interrupted
+    if "--watch" in options:
+        # Only imported when selected, like make.aio
+        from .watch import Watcher
+
+        try:
+            with Watcher(makefile, goals, env, build, f_err=f_err) as watcher:
+                return watcher.run()
+        except OSError as e:
+            print(f"make: {e}", file=f_err)
+            return 2
+
+    try:
+        # --parse-cache mtime|hash reuses the previous parse of an unchanged makefile
+        with trace.span("parse", "make", makefile=makefile):
+            if "--parse-cache" in options:
+                entries = parse_path_cached(makefile, options["--parse-cache"])
+            else:
+                entries = (parse or parse_path_compact)(makefile)
+
+        # --depfile-cache FILE keeps included files parsed between runs. Large batches of them are parsed by up
+        # to -j processes.
+        if depfiles is None or "--depfile-cache" in options:
+            depfiles = DepfileLoader(options.get("--depfile-cache"), processes=jobs)
+
+        with trace.span("build graph", "make"):
+            graph = BuildGraph(entries, env, depfiles)
+        depfiles.save()
+
+        # --index FILE keeps directory listings between runs, so a target missing from an unchanged directory is not
+        # statted. With --trust-index, file modification times are also served from it, which misses files that were
+        # modified without changing their directory.
+        with trace.span("out of date", "make"):
+            if "--index" in options:
+                with FSIndex(options["--index"], trust_files="--trust-index" in options) as own_index:
+                    targets = graph.out_of_date(goals or None, index=own_index)
+            elif index is not None:
+                index.revalidate()
+                targets = graph.out_of_date(goals or None, index=index)
+                index.save()
+            else:
+                targets = graph.out_of_date(goals or None)
+    except (OSError, ValueError) as e:
+        print(f"make: {e}", file=f_err)
+        return 2
+
+    if not targets:
+        for goal in goals or [graph.default_goal]:
+            print(f"make: '{goal}' is up to date.", file=f_out)
+        return 0
+
+    return build(graph, targets)
+
+
+def _run_targets(graph: BuildGraph, targets: List[str], options: Dict[str, str], env: Dict[str, str], jobs: int,
+                 max_load: Optional[float], scheduler: str, f_out, f_err,
+                 job_slots: Optional[threading.Semaphore] = None) -> int:
+    """
+    Runs the recipes of the targets, which must be in build order. Returns make's exit status.
+    """
+    output_lock = threading.Lock()
+    # --cache-hardlink restores cached outputs as hard links instead of copies (see BuildCache)
+    cache = BuildCache(options["--cache"], "--cache-hardlink" in options) if "--cache" in options else None
+    executor: Executor = LocalExecutor()
+
+    # --workers ADDRESS,... runs the recipes on build workers (see make.remote), by default as many at once as they have slots.
+    # --retry-locally runs the jobs that fail on a worker again here, for recipes that read undeclared inputs
+    if "--workers" in options:
+        # Only imported when selected, like make.aio
+        from .remote import RemoteExecutor
+
+        try:
+            executor = RemoteExecutor(options["--workers"].split(","), cache.hasher if cache is not None else None,
+                                      "--retry-locally" in options)
+            # Without -j, keep every worker slot busy
+            if "-j" not in options:
+                jobs = executor.slots
+        except (OSError, ValueError) as e:
+            print(f"make: {e}; running recipes locally", file=f_err)
+
+    def outputs_of(target: str) -> List[str]:
+        """
+        Returns the files that the recipe of a target writes: the target and the other non-phony targets of its rule,
+        which are side outputs of the recipe, like the a.d of `a.o a.d: a.c`. They are in the order of the rule, so
+        every target of the rule shares one cache key.
+        """
+        if target in graph.phony:
+            return []
+        return [t for t in graph.rules[target].targets if t == target or t not in graph.phony]
+
+    def prepare(target: str, buffer: StringIO) -> Tuple[Optional[int], List[str], Optional[str]]:
+        """
+        Expands the recipe of a target and tries to restore its outputs from the cache. Returns a tuple of (status,
+        recipe, cache key), where status is None if the recipe still has to run, in which case the key is where to
+        store its outputs.
+        """
+        rule = graph.rules[target]
+        outputs = outputs_of(target)
+
+        try:
+            recipe = graph.macro_table.expand_recipe(rule, target)
+        except ValueError as e:
+            with output_lock:
+                print(f"make: {e}", file=f_err)
+            return (2, [], None)
+
+        # The expanded recipe already contains every macro value it uses
+        key = cache.key(rule._replace(recipe=recipe), {}, outputs) if cache is not None and outputs and recipe else None
+        if key is not None and cache.restore(key, outputs):
+            print(f"make: '{target}' restored from cache", file=buffer)
+            return (0, recipe, None)
+
+        return (None, recipe, key)
+
+    def finish(target: str, buffer: StringIO, status: int, key: Optional[str]) -> int:
+        if key is not None and not status:
+            cache.store(key, outputs_of(target))
+
+        # Buffer each target's output so that parallel jobs do not interleave
+        with output_lock:
+            f_out.write(buffer.getvalue())
+            if status:
+                print(f"make: *** [{target}] Error {status}", file=f_err)
+        return status
+
+    def run_target(target: str) -> int:
+        with job_slots if job_slots is not None else contextlib.nullcontext():
+            buffer = StringIO()
+            status, recipe, key = prepare(target, buffer)
+            if status is None:
+                with trace.span(target, "recipe") as span:
+                    job = Job(target, recipe, graph.rules[target].components, outputs_of(target))
+                    status = executor.run(job, env, buffer)
+                    span.args["status"] = status
+
+            return finish(target, buffer, status, key)
+
+    keep_going = "-k" in options
+    try:
+        if scheduler == "asyncio":
+            report = _run_asyncio(graph, targets, prepare, finish, env, jobs, max_load, keep_going, job_slots)
+        else:
+            report = schedule(graph, targets, run_target, jobs, max_load, keep_going)
+    finally:
+        executor.close()
+        if cache is not None:
+            cache.close()
+
+    if "--report" in options:
+        print(report.format(), file=f_err)
+        print(current_counter.get().format(), file=f_err)
+
+    return 2 if report.failed else 0
+
+
+def _run_asyncio(graph: BuildGraph, targets: List[str], prepare, finish, env: Dict[str, str], jobs: int,
+                 max_load: Optional[float], keep_going: bool, job_slots: Optional[threading.Semaphore]) -> BuildReport:
+    # Only imported when selected, see make.aio
+    import asyncio
+    from .aio import run_recipe_async, schedule_async
+
+    async def run_target(target: str) -> int:
+        loop = asyncio.get_running_loop()
+        if job_slots is None:
+            return await run_target_in_slot(loop, target)
+
+        await loop.run_in_executor(None, job_slots.acquire)
+        try:
+            return await run_target_in_slot(loop, target)
+        finally:
+            job_slots.release()
+
+    async def run_target_in_slot(loop, target: str) -> int:
+        # Hashing inputs and copying cached outputs block, so they run on the default executor
+        buffer = StringIO()
+        status, recipe, key = await loop.run_in_executor(None, prepare, target, buffer)
+        if status is None:
+            # Other tasks run on this thread while the recipe waits, so only its wall time is recorded
+            start = time.perf_counter()
+            status = await run_recipe_async(recipe, env, buffer)
+            tracer = trace.current()
+            if tracer is not None:
+                tracer.complete(target, "recipe", start, time.perf_counter(), {"status": status})
+
+        return await loop.run_in_executor(None, finish, target, buffer, status, key)
+
+    return asyncio.run(schedule_async(graph, targets, run_target, jobs, max_load, keep_going))
+
+
+if __name__ == "__main__":
+    quit(make(sys.argv[1:], dict(os.environ)))
@@ -0,0 +1,100 @@
+"""
+The client side of the build server (see make.server), and the wire protocol both sides use.
+
+Every message is a JSON object preceded by its length as a 4-byte big-endian integer. The client sends one request,
+{"args": [...], "env": {...}, "cwd": "..."}, and the server answers with any number of {"out": text} and
+{"err": text} messages followed by {"status": exit_status}.
+
+This module only imports what the client needs, so that forwarding a build costs little more than starting Python.
+"""
+from typing import List, Dict, Optional
+import json
+import os
+import socket
+import struct
+import sys
+
+_LENGTH = struct.Struct(">I")
+
+# The build server's socket, if one should be used
+SERVER_VARIABLE = "PYMAKE_SERVER"
+# Set by the build server in the environment of the recipes it runs, so that it can tell when a recipe runs make
+NESTED_VARIABLE = "PYMAKE_SERVER_NESTED"
+
+
+def send_message(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode()
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> dict:
+    """
+    Reads one message.
+
+    If the connection is closed first, an EOFError is thrown.
+    """
+    length, = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return json.loads(_recv_exactly(sock, length))
+
+
+class MessageWriter(object):
+    """
+    A text stream that sends everything written to it over a socket as {stream: text} messages. `lock` serializes
+    the messages of every writer on the socket. Writes after the peer has gone away are dropped, so that the build
+    still finishes.
+    """
+
+    def __init__(self, sock, stream: str, lock):
+        self.sock = sock
+        self.stream = stream
+        self.lock = lock
+
+    def write(self, text: str) -> int:
+        if text:
+            with self.lock:
+                try:
+                    send_message(self.sock, {self.stream: text})
+                except OSError:
+                    pass
+
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def run_remote(path: str, args: List[str], env: Dict[str, str], cwd: Optional[str] = None, f_out=sys.stdout,
+               f_err=sys.stderr) -> int:
+    """
+    Runs make with the given command line on the build server listening on `path`, copying its output to f_out and
+    f_err as it arrives. Returns the exit status.
+
+    If the server cannot be reached, an OSError is thrown before anything was built. If the connection is lost during
+    the build, an EOFError is thrown.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        send_message(sock, {"args": args, "env": env, "cwd": cwd or os.getcwd()})
+
+        while True:
+            message = recv_message(sock)
+            if "out" in message:
+                f_out.write(message["out"])
+                f_out.flush()
+            elif "err" in message:
+                f_err.write(message["err"])
+                f_err.flush()
+            else:
+                return message["status"]
@@ -0,0 +1,236 @@
+from .parser import Rule, Macro, Include, iter_parse, iter_lines
+from typing import List, Dict, Iterable, Iterator, Union, Tuple, Optional
+from array import array
+import sys
+
+
+class NameTable(object):
+    """
+    Interns names (targets, prerequisites) and maps them to dense integer IDs.
+    """
+    __slots__ = ("names", "_ids")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        """
+        Returns the ID of a name, assigning a new one if the name has not been seen.
+        """
+        # Most names have been seen before, and a hit is cheapest without a None check
+        try:
+            return self._ids[name]
+        except KeyError:
+            i = self._ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+            return i
+
+    def id(self, name: str) -> int:
+        """
+        Returns the ID of a name. If the name has not been interned, a KeyError is thrown.
+        """
+        return self._ids[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getstate__(self):
+        return self.names
+
+    def __setstate__(self, names):
+        self.names = names
+        self._ids = {n: i for i, n in enumerate(names)}
+
+
+class RuleView(object):
+    """
+    A read-only view of one rule in a CompactRules store, with the same interface as Rule. Its targets and components
+    are built from the store the first time they are accessed and kept, so a graph that traverses the view often only
+    pays for them once.
+    """
+    __slots__ = ("_store", "_index", "_targets", "_components")
+
+    _fields = Rule._fields
+
+    def __init__(self, store: "CompactRules", index: int):
+        self._store = store
+        self._index = index
+
+    # The cached lists are left unset until they are built, which keeps creating a view as cheap as before
+
+    @property
+    def targets(self) -> List[str]:
+        try:
+            return self._targets
+        except AttributeError:
+            store = self._store
+            offsets = store._target_offsets
+            i = self._index
+            targets = self._targets = list(map(store.names.names.__getitem__, store._targets[offsets[i]:offsets[i + 1]]))
+            return targets
+
+    @property
+    def components(self) -> List[str]:
+        try:
+            return self._components
+        except AttributeError:
+            store = self._store
+            offsets = store._component_offsets
+            i = self._index
+            components = self._components = list(map(store.names.names.__getitem__,
+                                                      store._components[offsets[i]:offsets[i + 1]]))
+            return components
+
+    @property
+    def recipe(self) -> List[str]:
+        return list(self._store._recipes[self._index])
+
+    @property
+    def has_references(self) -> bool:
+        """
+        True if a target or prerequisite refers to a macro, in which case the rule has to be expanded.
+        """
+        return bool(self._store._references[self._index])
+
+    def to_rule(self) -> Rule:
+        return Rule(self.targets, self.components, self.recipe)
+
+    def _replace(self, **kwargs) -> Rule:
+        return self.to_rule()._replace(**kwargs)
+
+    def __iter__(self):
+        return iter((self.targets, self.components, self.recipe))
+
+    def __len__(self) -> int:
+        return 3
+
+    def __getitem__(self, i):
+        return tuple(self)[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (tuple, RuleView)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        raise TypeError("unhashable type: 'RuleView'")
+
+    def __repr__(self) -> str:
+        return repr(self.to_rule())
+
+
+class CompactRules(object):
+    """
+    Stores the rules and macros of a makefile compactly.
+
+    Target and prerequisite names are interned in a NameTable and stored as integer IDs in flat arrays, indexed by
+    per-rule offsets, so a name shared by thousands of rules is stored once and each reference costs four bytes.
+    Recipes are stored as tuples of interned lines.
+
+    Iterating over the store, or indexing it, yields RuleView objects and Macros in their original order, so it can
+    be used wherever a list of parsed entries is expected.
+    """
+
+    def __init__(self, entries: Iterable[Union[Rule, Macro]] = ()):
+        self.names = NameTable()
+        self._target_offsets = array("I", [0])
+        self._targets = array("I")
+        self._component_offsets = array("I", [0])
+        self._components = array("I")
+        self._recipes: List[Tuple[str, ...]] = []
+        # 1 for each rule whose targets or prerequisites contain a '$'
+        self._references = bytearray()
+        self._macros: List[Macro] = []
+        # For each entry in order: the index of the rule (>= 0) or ~index of the macro (< 0)
+        self._order = array("i")
+
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: Union[Rule, Macro, Include]):
+        # Includes are kept in order with the macros
+        if isinstance(entry, (Macro, Include)):
+            self._order.append(~len(self._macros))
+            self._macros.append(entry)
+            return
+
+        targets, components, recipe = entry
+        intern = self.names.intern
+
+        self._order.append(len(self._recipes))
+        # map() is noticeably faster than a generator here, which runs once per name of a large makefile
+        self._targets.extend(map(intern, targets))
+        self._target_offsets.append(len(self._targets))
+        self._components.extend(map(intern, components))
+        self._component_offsets.append(len(self._components))
+        self._recipes.append(tuple(map(sys.intern, recipe)))
+        self._references.append("$" in " ".join(targets) or "$" in " ".join(components))
+
+    @property
+    def rule_count(self) -> int:
+        return len(self._recipes)
+
+    def target_ids(self, index: int) -> array:
+        """
+        Returns the IDs of the targets of the rule at `index`.
+        """
+        return self._targets[self._target_offsets[index]:self._target_offsets[index + 1]]
+
+    def component_ids(self, index: int) -> array:
+        """
+        Returns the IDs of the prerequisites of the rule at `index`.
+        """
+        return self._components[self._component_offsets[index]:self._component_offsets[index + 1]]
+
+    def rule(self, index: int) -> RuleView:
+        return RuleView(self, index)
+
+    def rules(self) -> Iterator[RuleView]:
+        for i in range(self.rule_count):
+            yield RuleView(self, i)
+
+    def macros(self) -> List[Macro]:
+        return [m for m in self._macros if isinstance(m, Macro)]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, i: int) -> Union[RuleView, Macro]:
+        k = self._order[i]
+        return RuleView(self, k) if k >= 0 else self._macros[~k]
+
+    def iter_with_targets(self) -> Iterator[Tuple[Union[RuleView, Macro, Include], Optional[List[str]], bool]]:
+        """
+        Yields each entry in order with the targets of the rule and whether it has macro references, or None and False
+        for macros and includes. Faster than reading each view's fields, for indexing a whole store.
+        """
+        getname = self.names.names.__getitem__
+        offsets = self._target_offsets
+        ids = self._targets
+        references = self._references
+        for k in self._order:
+            if k >= 0:
+                start = offsets[k]
+                end = offsets[k + 1]
+                # Most rules have one target, which is cheaper to look up than a slice
+                targets = [getname(ids[start])] if end - start == 1 else list(map(getname, ids[start:end]))
+                yield RuleView(self, k), targets, references[k] != 0
+            else:
+                yield self._macros[~k], None, False
+
+    def __iter__(self) -> Iterator[Union[RuleView, Macro]]:
+        for k in self._order:
+            yield RuleView(self, k) if k >= 0 else self._macros[~k]
+
+
+def parse_path_compact(path: str, encoding: str = "utf-8") -> CompactRules:
+    """
+    Parses the makefile at the given path straight into a CompactRules store, without building the full list of
+    Rule tuples first.
+    """
+    with open(path, "rb") as fp:
+        return CompactRules(iter_parse(iter_lines(fp, encoding)))
@@ -0,0 +1,235 @@
+"""
+Reads included makefiles in bulk. Most included files in C and C++ builds are dependency files written by the
+compiler (`cc -MD`), thousands of small files that each hold one rule listing a source file and every header it
+includes, and optionally an empty rule per header (`-MP`):
+
+    obj/a.o: src/a.c include/a.h \\
+      include/my\\ header.h
+    include/a.h:
+
+Such files are read by a dedicated parser that handles continuation lines and the escapes compilers write (`\\ `,
+`\\#`, `\\:` and `$$`). Any other included file is parsed as a makefile. Parsed files are cached by modification time
+and size, misses are parsed in a process pool when there are many, and every name is interned so that a header
+listed by thousands of files is stored once.
+"""
+from .parser import Rule, Macro, Include, find_separator, iter_parse, join_continuations
+from .compact import NameTable
+from typing import List, Dict, Tuple, Iterable, Iterator, NamedTuple, Optional, Union
+import threading
+import pickle
+import os
+
+# Fewer misses than this are parsed in this process, since starting workers costs more than parsing them
+POOL_THRESHOLD = 256
+POOL_CHUNK_SIZE = 64
+
+
+class Depfile(NamedTuple):
+    """
+    An included file. `rules` holds the rules of a dependency file, with their names unescaped and interned. If the
+    file is not a dependency file, `rules` is empty and `entries` holds its parsed entries, which the graph expands
+    like those of the makefile.
+    """
+    path: str
+    rules: List[Rule]
+    entries: Optional[List[Union[Rule, Macro, Include]]] = None
+
+
+def _unescape_names(text: str) -> List[str]:
+    """
+    Splits a list of names on unescaped whitespace and removes the escapes from each name.
+    """
+    if "\\" not in text and "$" not in text:
+        return text.split()
+
+    names = []
+    name = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\" and i + 1 < n and text[i + 1] in " \t#:":
+            name.append(text[i + 1])
+            i += 2
+            continue
+
+        if c == "$" and i + 1 < n and text[i + 1] == "$":
+            name.append("$")
+            i += 2
+            continue
+
+        if c.isspace():
+            if name:
+                names.append("".join(name))
+                name = []
+        else:
+            name.append(c)
+        i += 1
+
+    if name:
+        names.append("".join(name))
+
+    return names
+
+
+def parse_depfile(text: str) -> Optional[List[Rule]]:
+    """
+    Parses the text of a dependency file into rules without recipes. Returns None if the text holds anything other
+    than dependency lines and comments (a recipe, a macro or a directive), in which case it should be parsed as a
+    makefile.
+    """
+    rules = []
+    for line in join_continuations(text.splitlines()):
+        if line.startswith("\t"):
+            return None
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+
+        separator = find_separator(line)
+        # Macro references, `=` and a second separator (`a: b: c`, static patterns) need the makefile parser
+        if separator < 0 or "=" in line or "$" in line.replace("$$", ""):
+            return None
+
+        components = line[separator + 1:]
+        if components.startswith(":") or find_separator(components) >= 0:
+            return None
+
+        targets = _unescape_names(line[:separator])
+        if not targets:
+            return None
+
+        rules.append(Rule(targets, _unescape_names(components), []))
+
+    return rules
+
+
+def read_depfile(path: str) -> Depfile:
+    """
+    Reads and parses an included file.
+    """
+    with open(path, encoding="utf-8", errors="surrogateescape") as f:
+        text = f.read()
+
+    rules = parse_depfile(text)
+    if rules is None:
+        return Depfile(path, [], list(iter_parse(join_continuations(text.splitlines()))))
+
+    return Depfile(path, rules)
+
+
+def _read_depfiles(paths: List[str], processes: int) -> Iterator[Depfile]:
+    if processes > 1 and len(paths) >= POOL_THRESHOLD:
+        # Only imported when used, since it is slow to import
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        # The build server loads depfiles from many threads, and forking a process with running threads can copy
+        # locks that are held by other threads. Workers are started from a clean process instead.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(min(processes, os.cpu_count() or 1), multiprocessing.get_context(method)) as pool:
+            yield from pool.map(read_depfile, paths, chunksize=POOL_CHUNK_SIZE)
+    else:
+        yield from map(read_depfile, paths)
+
+
+class DepfileLoader(object):
+    """
+    Loads included files in batches, parsing only the files that are not cached with their current modification time
+    and size. Up to `processes` worker processes parse the misses of a large batch.
+
+    If `cache_file` is given, the cache is read from it and written back by `save`, so later runs only parse the
+    files that changed. Loaders are thread-safe, so one can be shared by concurrent builds.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, processes: int = 1):
+        self.cache_file = cache_file
+        self.processes = processes
+        self.names = NameTable()
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Tuple[int, int], Depfile]] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        if cache_file is not None:
+            try:
+                # The names are stored with the cache, so the strings they share stay shared
+                with open(cache_file, "rb") as fp:
+                    self.names, self._cache = pickle.load(fp)
+            except Exception:
+                # A missing or unreadable cache is rebuilt
+                pass
+
+    def _intern(self, depfile: Depfile) -> Depfile:
+        names = self.names.names
+        intern = self.names.intern
+
+        rules = [Rule([names[intern(t)] for t in targets], [names[intern(c)] for c in components], recipe)
+                 for targets, components, recipe in depfile.rules]
+
+        return depfile._replace(rules=rules)
+
+    def load(self, paths: Iterable[str], optional: bool = False) -> List[Depfile]:
+        """
+        Returns the parsed files in the given order. If `optional` is True, missing files are left out.
+
+        If a file is missing and not optional, or cannot be read, an OSError is thrown.
+        """
+        found: List[Tuple[str, Tuple[int, int]]] = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if optional:
+                    continue
+                raise
+
+            found.append((path, (st.st_mtime_ns, st.st_size)))
+
+        with self._lock:
+            cached = {path: self._cache.get(os.path.abspath(path)) for path, _ in found}
+
+        misses = [path for path, fingerprint in found if cached[path] is None or cached[path][0] != fingerprint]
+        parsed = dict(zip(misses, _read_depfiles(misses, self.processes)))
+
+        rv = []
+        with self._lock:
+            for path, fingerprint in found:
+                depfile = parsed.get(path)
+                if depfile is None:
+                    depfile = cached[path][1]
+                    self.hits += 1
+                else:
+                    depfile = self._intern(depfile)
+                    self._cache[os.path.abspath(path)] = (fingerprint, depfile)
+                    self._dirty = True
+                    self.misses += 1
+
+                rv.append(depfile)
+
+        return rv
+
+    def save(self) -> bool:
+        """
+        Writes the cache to `cache_file` if anything was parsed since it was read. Returns False if it could not be
+        written.
+        """
+        if self.cache_file is None or not self._dirty:
+            return True
+
+        temporary = f"{self.cache_file}.{os.getpid()}.tmp"
+        with self._lock:
+            try:
+                with open(temporary, "wb") as fp:
+                    pickle.dump((self.names, self._cache), fp, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, self.cache_file)
+            except OSError:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                return False
+
+            self._dirty = False
+
+        return True
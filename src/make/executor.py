@@ -0,0 +1,281 @@
+from .parser import Rule
+from .macros import MacroTable
+from commands.command import is_command, resolve_command, supports_arguments, CommandError
+from typing import List, Dict, Tuple, Optional, NamedTuple
+from getopt import GetoptError
+from contextvars import ContextVar
+from io import IOBase, StringIO
+from abc import ABC, abstractmethod
+from commands.pipeline import run_pipeline
+from . import trace
+import os
+import subprocess
+import threading
+import shlex
+import time
+
+
+# Characters that make a line need a real shell when they appear outside of quotes
+SHELL_METACHARACTERS = set("&;<>()$`\\*?[]{}~#=\n")
+
+
+class BuiltinStats(NamedTuple):
+    calls: int
+    seconds: float
+
+
+class BuiltinCounter(object):
+    """
+    Counts how many times each built-in command ran in-process, and for how long. Every call is a fork/exec that
+    did not happen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, BuiltinStats] = {}
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            calls, total = self._stats.get(name, (0, 0.0))
+            self._stats[name] = BuiltinStats(calls + 1, total + seconds)
+
+    def snapshot(self) -> Dict[str, BuiltinStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    @property
+    def forks_saved(self) -> int:
+        return sum(s.calls for s in self.snapshot().values())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def format(self) -> str:
+        lines = [f"Built-in commands saved {self.forks_saved} forks"]
+        for name, s in sorted(self.snapshot().items()):
+            lines.append(f"  {name}: {s.calls} calls, {s.seconds:.3f}s")
+
+        return "\n".join(lines)
+
+
+builtin_counter = BuiltinCounter()
+
+# The counter that run_builtin records in. make installs a new one for each build, so that concurrent builds on the
+# build server count separately; outside of a build, it is builtin_counter.
+current_counter: ContextVar[BuiltinCounter] = ContextVar("current_counter", default=builtin_counter)
+
+
+def split_builtin(line: str) -> Optional[List[List[str]]]:
+    """
+    Splits a recipe line into a pipeline of commands if it only invokes built-in commands, meaning that the first
+    word of each command is a built-in command (see commands.command.is_command) that supports the rest of its words
+    (see commands.command.supports_arguments), and, apart from '|', the line uses no shell features (redirection,
+    expansion, globbing, ...) outside of quotes.
+    Returns a list of commands, each split into words, or None if the line has to go through the shell.
+    """
+    quote = None
+    segments = []
+    start = 0
+    for i, c in enumerate(line):
+        if quote == "'":
+            if c == "'":
+                quote = None
+        elif quote == '"':
+            if c == '"':
+                quote = None
+            elif c in "$`\\":
+                return None
+        elif c in "'\"":
+            quote = c
+        elif c == "|":
+            segments.append(line[start:i])
+            start = i + 1
+        elif c in SHELL_METACHARACTERS:
+            return None
+    segments.append(line[start:])
+
+    rv = []
+    for segment in segments:
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return None
+
+        # Empty segments come from '||' or a leading or trailing '|'
+        if not words or not is_command(words[0]):
+            return None
+
+        rv.append(words)
+
+    # Checked once the whole line is known to be built-in, since it imports the commands
+    if not all(supports_arguments(words[0], words[1:]) for words in rv):
+        return None
+
+    return rv
+
+
+def run_builtin(pipeline: List[List[str]], env: Dict[str, str], f_out: IOBase) -> int:
+    """
+    Runs a built-in command, or a pipeline of them, in-process, writing the output to f_out.
+    Returns the exit status of the last command.
+    """
+    start = time.perf_counter()
+    try:
+        if len(pipeline) == 1:
+            words = pipeline[0]
+            status = resolve_command(words[0])(words[1:], env, StringIO(), f_out)
+        else:
+            status = run_pipeline(pipeline, env, StringIO(), f_out)
+    except CommandError as e:
+        print(e, file=f_out)
+        status = 1
+    except (GetoptError, ValueError, OSError) as e:
+        # Fail like a forked command would, rather than taking the whole build down
+        print(f"{pipeline[0][0]}: {e}", file=f_out)
+        status = 1
+    finally:
+        # Pipeline stages run concurrently, so each one is credited with the pipeline's wall time
+        end = time.perf_counter()
+        counter = current_counter.get()
+        for words in pipeline:
+            counter.record(words[0], end - start)
+
+        tracer = trace.current()
+        if tracer is not None:
+            tracer.complete(" | ".join(w[0] for w in pipeline), "builtin", start, end,
+                            {"argv": [" ".join(w) for w in pipeline]})
+
+    return status or 0
+
+
+def parse_recipe_prefix(line: str) -> Tuple[bool, bool, str]:
+    """
+    Strips the '@' (silent) and '-' (ignore errors) prefixes from a recipe line.
+    Returns a tuple of (silent, ignore_errors, command).
+    """
+    silent = ignore_errors = False
+
+    while line[:1] in ("@", "-", "+"):
+        if line[0] == "@":
+            silent = True
+        elif line[0] == "-":
+            ignore_errors = True
+
+        line = line[1:].lstrip()
+
+    return (silent, ignore_errors, line)
+
+
+def run_command(line: str, env: Dict[str, str], f_out: IOBase) -> int:
+    """
+    Runs a single command, writing its combined stdout and stderr to f_out. Simple invocations of built-in commands
+    run in-process; everything else goes through the shell.
+    Returns the exit status of the command.
+    """
+    pipeline = split_builtin(line)
+    if pipeline is not None:
+        return run_builtin(pipeline, env, f_out)
+
+    tracer = trace.current()
+    if tracer is not None:
+        return _run_shell_traced(line, env, f_out, tracer)
+
+    proc = subprocess.run(line, shell=True, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    f_out.write(proc.stdout.decode(errors="replace"))
+
+    return proc.returncode
+
+
+def _run_shell_traced(line: str, env: Dict[str, str], f_out: IOBase, tracer: trace.Tracer) -> int:
+    # Reaping the shell with wait4 gives the CPU time of this command alone, where RUSAGE_CHILDREN would also count
+    # commands that finished on other threads
+    start = time.perf_counter()
+    proc = subprocess.Popen(line, shell=True, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    with proc.stdout:
+        f_out.write(proc.stdout.read().decode(errors="replace"))
+
+    _, wait_status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    tracer.complete("sh", "command", start, time.perf_counter(), {
+        "command": line, "status": proc.returncode,
+        "user_cpu_ms": usage.ru_utime * 1000, "system_cpu_ms": usage.ru_stime * 1000,
+    })
+    return proc.returncode
+
+
+def run_recipe(recipe: List[str], env: Dict[str, str], f_out: IOBase) -> int:
+    """
+    Runs each line of a recipe in order, echoing the lines that are not silent. Stops at the first line that fails,
+    unless that line is prefixed with '-'.
+    Returns the exit status of the recipe.
+    """
+    for line in recipe:
+        silent, ignore_errors, line = parse_recipe_prefix(line)
+        if not line:
+            continue
+
+        if not silent:
+            print(line, file=f_out)
+
+        status = run_command(line, env, f_out)
+        if status and not ignore_errors:
+            return status
+
+    return 0
+
+
+def run_rule(rule: Rule, env: Dict[str, str], f_out: IOBase, macros: Optional[MacroTable] = None, target: Optional[str] = None) -> int:
+    """
+    Runs the recipe of a rule, expanding it with `macros` for `target` (by default, the rule's first target) if
+    given. Returns the exit status of the recipe.
+    """
+    recipe = rule.recipe
+    if macros is not None:
+        recipe = macros.expand_recipe(rule, target or rule.targets[0])
+
+    return run_recipe(recipe, env, f_out)
+
+
+class Job(NamedTuple):
+    """
+    The work of one target: its expanded recipe, the prerequisites it reads and the files it produces, which are the
+    targets of its rule.
+    """
+    target: str
+    recipe: List[str]
+    inputs: List[str]
+    outputs: List[str]
+
+
+class Executor(ABC):
+    """
+    Runs the recipes of jobs. The make runner hands every job to an executor, so recipes can run somewhere other than
+    this process (see make.remote). Executors must be safe to call from several threads at once.
+    """
+
+    @abstractmethod
+    def run(self, job: Job, env: Dict[str, str], f_out: IOBase) -> int:
+        """
+        Runs the recipe of a job, writing its output to f_out. When it returns, the outputs of the job are in place.
+        Returns the exit status of the recipe.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalExecutor(Executor):
+    """
+    Runs recipes in this process, with run_recipe.
+    """
+
+    def run(self, job: Job, env: Dict[str, str], f_out: IOBase) -> int:
+        return run_recipe(job.recipe, env, f_out)
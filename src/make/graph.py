@@ -0,0 +1,323 @@
+from .parser import Rule, Macro, Include
+from .depfile import DepfileLoader
+from .compact import CompactRules, RuleView
+from .macros import MacroTable
+from . import trace
+from commands.fsindex import FSIndex
+from typing import List, Dict, Iterable, Optional, Union, Set
+import glob
+import os
+import time
+
+
+class CycleError(ValueError):
+    """
+    Raised when the dependency graph contains a cycle.
+
+    Attributes:
+        cycle -- The targets that form the cycle, in dependency order
+    """
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+
+    def __str__(self):
+        return f"Circular dependency: {' -> '.join(self.cycle + self.cycle[:1])}"
+
+
+class BuildGraph(object):
+    """
+    Indexes the rules of a makefile by target and answers questions about the dependencies between them.
+
+    Every target maps directly to the rule that builds it, so lookups are O(1). All traversals are iterative, so
+    graph depth is not limited by the recursion limit. Macros are collected in `macro_table`, which falls back to
+    `env` for undefined names. Included files are read by `depfiles`, a DepfileLoader.
+    """
+
+    def __init__(self, entries: Iterable[Union[Rule, Macro, Include]], env: Optional[Dict[str, str]] = None,
+                 depfiles: Optional[DepfileLoader] = None):
+        self.rules: Dict[str, Rule] = {}
+        self.macros: Dict[str, Macro] = {}
+        self.macro_table = MacroTable(env=env)
+        self.phony: Set[str] = set()
+        self.default_goal: Optional[str] = None
+        self.depfiles = depfiles if depfiles is not None else DepfileLoader()
+        # The paths of the included files, including the optional ones that do not exist
+        self.includes: List[str] = []
+
+        self.add_entries(entries)
+
+    def add_entries(self, entries: Iterable[Union[Rule, Macro, Include]]):
+        """
+        Adds the parsed entries of a makefile to the graph in order. Like make, targets and prerequisites are expanded
+        with the macros defined above them.
+        """
+        expand_rule = self.macro_table.expand_rule
+        add_rule = self.add_rule
+        if isinstance(entries, CompactRules):
+            # Views are kept as they are, so the graph shares the store's interned names and ID arrays
+            for entry, targets, references in entries.iter_with_targets():
+                if targets is None:
+                    self.add_entries((entry,))
+                elif references:
+                    add_rule(expand_rule(entry.to_rule()))
+                else:
+                    add_rule(entry, targets)
+            return
+
+        for entry in entries:
+            # Rules are by far the most common entries
+            if type(entry) is Rule:
+                add_rule(expand_rule(entry))
+            elif type(entry) is RuleView:
+                # Views from a CompactRules store are kept as they are, unless they have to be expanded
+                add_rule(expand_rule(entry.to_rule()) if entry.has_references else entry)
+            elif isinstance(entry, Macro):
+                self.macros[entry.name] = entry
+                self.macro_table.define(entry)
+            elif isinstance(entry, Include):
+                self.include(entry)
+            else:
+                add_rule(expand_rule(entry))
+
+    def include(self, entry: Include):
+        """
+        Adds the entries of the included files. Paths are expanded and globbed, and all the files of one include
+        line are loaded as one batch. The rules of dependency files are added as they are, since their names are
+        already unescaped.
+
+        If an included file is missing and the include is not optional, an OSError is thrown.
+        """
+        paths = []
+        for word in self.macro_table.expand(" ".join(entry.paths)).split():
+            if glob.has_magic(word):
+                paths.extend(sorted(glob.glob(word)))
+            else:
+                paths.append(word)
+
+        self.includes.extend(paths)
+        for depfile in self.depfiles.load(paths, entry.optional):
+            if depfile.entries is not None:
+                self.add_entries(depfile.entries)
+            else:
+                for rule in depfile.rules:
+                    self.add_rule(rule)
+
+    def add_rule(self, rule: Rule, targets: Optional[List[str]] = None):
+        """
+        Adds a rule to the graph. A later rule for the same target adds its components to the earlier one's, and
+        replaces its recipe if it has one. Rules are stored as given and only copied when they are merged. `targets`
+        can be passed if the caller already has the rule's targets.
+        """
+        rules = self.rules
+        for target in rule.targets if targets is None else targets:
+            if target == ".PHONY":
+                self.phony.update(rule.components)
+                continue
+
+            if self.default_goal is None and not target.startswith("."):
+                self.default_goal = target
+
+            existing = rules.get(target)
+            if existing is None:
+                rules[target] = rule
+            else:
+                existing_components = existing.components
+                components = existing_components + [c for c in rule.components if c not in existing_components]
+                rules[target] = Rule(existing.targets, components, rule.recipe or existing.recipe)
+
+    def __contains__(self, target: str) -> bool:
+        return target in self.rules
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def prerequisites(self, target: str) -> List[str]:
+        """
+        Returns the prerequisites of a target. Targets without a rule have no prerequisites.
+        """
+        rule = self.rules.get(target)
+        return rule.components if rule is not None else []
+
+    def find_cycles(self) -> List[List[str]]:
+        """
+        Returns every cycle in the graph as a list of targets. Uses Tarjan's strongly connected components algorithm.
+        """
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        cycles = []
+
+        for root in self.rules:
+            if root in index:
+                continue
+
+            work = [(root, iter(self.prerequisites(root)))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.prerequisites(child))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+
+                        if len(component) > 1 or node in self.prerequisites(node):
+                            cycles.append(component[::-1])
+
+        return cycles
+
+    def topological_order(self, goals: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Returns the targets needed to build the given goals (or every target, if goals is None) ordered so that each
+        target comes after all of its prerequisites.
+
+        If the graph contains a cycle, a CycleError is thrown.
+        """
+        if goals is None:
+            goals = self.rules.keys()
+
+        order = []
+        done: Set[str] = set()
+        visiting: Set[str] = set()
+
+        for goal in goals:
+            if goal in done:
+                continue
+
+            work = [(goal, iter(self.prerequisites(goal)))]
+            visiting.add(goal)
+
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child in done:
+                        continue
+                    if child in visiting:
+                        path = [n for n, _ in work]
+                        raise CycleError(path[path.index(child):])
+
+                    visiting.add(child)
+                    work.append((child, iter(self.prerequisites(child))))
+                    break
+                else:
+                    work.pop()
+                    visiting.discard(node)
+                    done.add(node)
+                    order.append(node)
+
+        return order
+
+    def stat(self, targets: Iterable[str], index: Optional[FSIndex] = None) -> Dict[str, Optional[float]]:
+        """
+        Stats every target in a single pass. Returns a dictionary mapping each target to its modification time, or
+        None if it does not exist. If an index is given, the stat results come from it.
+        """
+        tracer = trace.current()
+        if tracer is not None:
+            return self._stat_traced(targets, index, tracer)
+
+        rv = {}
+        if index is not None:
+            for target in targets:
+                st = index.stat(target)
+                rv[target] = st.st_mtime if st is not None else None
+
+            return rv
+
+        for target in targets:
+            try:
+                rv[target] = os.stat(target).st_mtime
+            except OSError:
+                rv[target] = None
+
+        return rv
+
+    def _stat_traced(self, targets: Iterable[str], index: Optional[FSIndex],
+                     tracer: trace.Tracer) -> Dict[str, Optional[float]]:
+        rv = {}
+        for target in targets:
+            start = time.perf_counter()
+            if index is not None:
+                st = index.stat(target)
+                rv[target] = st.st_mtime if st is not None else None
+            else:
+                try:
+                    rv[target] = os.stat(target).st_mtime
+                except OSError:
+                    rv[target] = None
+            tracer.complete(target, "stat", start, time.perf_counter(), {"exists": rv[target] is not None})
+
+        return rv
+
+    def out_of_date(self, goals: Optional[Iterable[str]] = None, mtimes: Optional[Dict[str, Optional[float]]] = None,
+                    index: Optional[FSIndex] = None) -> List[str]:
+        """
+        Returns the minimal list of targets whose recipes must run to bring the goals up to date, in build order.
+
+        A target is out of date if it is phony, does not exist, is older than one of its prerequisites, or has a
+        prerequisite that is itself out of date. Modification times are taken from `mtimes` if given, otherwise every
+        node is stat'ed in one batch, through `index` if one is given.
+
+        If a missing prerequisite has no rule to build it, a ValueError is thrown.
+        """
+        if goals is None:
+            goals = [self.default_goal] if self.default_goal is not None else []
+
+        order = self.topological_order(goals)
+        if mtimes is None:
+            mtimes = self.stat((t for t in order if t not in self.phony), index)
+
+        rebuild = []
+        stale: Set[str] = set()
+
+        for target in order:
+            mtime = mtimes.get(target)
+            rule = self.rules.get(target)
+
+            if rule is None:
+                if mtime is None and target not in self.phony:
+                    raise ValueError(f"No rule to make target '{target}'")
+                continue
+
+            if target in self.phony or mtime is None:
+                dirty = True
+            else:
+                dirty = False
+                for component in rule.components:
+                    if component in stale:
+                        dirty = True
+                        break
+
+                    component_mtime = mtimes.get(component)
+                    if component_mtime is not None and component_mtime > mtime:
+                        dirty = True
+                        break
+
+            if dirty:
+                stale.add(target)
+                rebuild.append(target)
+
+        return rebuild
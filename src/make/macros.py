@@ -0,0 +1,258 @@
+from .parser import Rule, Macro
+from typing import List, Dict, Set, Tuple, Optional, Iterable
+import threading
+
+
+# Automatic variables are set per target, so values that refer to them are never memoized
+AUTOMATIC_VARIABLES = frozenset("@<^?*+%|")
+
+SIMPLE_OPS = (":=", "::=")
+
+
+class MacroError(ValueError):
+    """
+    Raised when a macro cannot be expanded.
+    """
+    pass
+
+
+class MacroCycleError(MacroError):
+    """
+    Raised when a recursively expanded macro refers to itself.
+
+    Attributes:
+        cycle -- The macros that form the cycle, starting and ending with the same name
+    """
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+
+    def __str__(self):
+        return f"Recursive variable '{self.cycle[0]}' references itself (eventually): {' -> '.join(self.cycle)}"
+
+
+class MacroTable(object):
+    """
+    Holds the macros of a makefile and expands references to them ($(NAME), ${NAME}, $N and $$).
+
+    Macros defined with '=' are recursive: their value is expanded each time it is used. Macros defined with ':=' or
+    '::=' are simple: their value is expanded once, when they are defined. '+=' appends to a macro, keeping its kind,
+    and '?=' only defines a macro that is not defined yet. Undefined macros fall back to the environment, then to the
+    empty string.
+
+    The expanded values of recursive macros are memoized, together with every macro the expansion used, and are
+    discarded as soon as one of those macros is redefined. Values that refer to automatic variables such as $@ are
+    never memoized. Substitution references ($(SRCS:.c=.o)) are supported; function calls ($(patsubst ...)) are left
+    unexpanded.
+
+    The table is safe to use from several threads.
+    """
+
+    def __init__(self, macros: Iterable[Macro] = (), env: Optional[Dict[str, str]] = None):
+        self._lock = threading.RLock()
+        self._env = env or {}
+        # name -> (raw or expanded value, is simple)
+        self._macros: Dict[str, Tuple[str, bool]] = {}
+        # name -> (expanded value, names of every macro the expansion used)
+        self._cache: Dict[str, Tuple[str, Set[str]]] = {}
+        # name -> names of the memoized macros whose expansion used it
+        self._dependents: Dict[str, Set[str]] = {}
+
+        for macro in macros:
+            self.define(macro)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._macros
+
+    def raw(self, name: str) -> Optional[str]:
+        """
+        Returns the unexpanded value of a macro, or None if it is not defined.
+        """
+        definition = self._macros.get(name)
+        return definition[0] if definition is not None else None
+
+    def define(self, macro: Macro):
+        """
+        Defines (or redefines) a macro, invalidating every memoized value that depended on it.
+
+        If the operator is not one of '=', ':=', '::=', '+=' or '?=', a MacroError is thrown.
+        """
+        with self._lock:
+            name, op, value = macro
+            existing = self._macros.get(name)
+
+            if op == "=":
+                definition = (value, False)
+            elif op in SIMPLE_OPS:
+                definition = (self.expand(value), True)
+            elif op == "?=":
+                if existing is not None:
+                    return
+                definition = (value, False)
+            elif op == "+=":
+                if existing is None:
+                    definition = (value, False)
+                else:
+                    raw, simple = existing
+                    addition = self.expand(value) if simple else value
+                    definition = (f"{raw} {addition}" if raw else addition, simple)
+            else:
+                raise MacroError(f"Unknown macro operator '{op}' in definition of '{name}'")
+
+            self._macros[name] = definition
+            self._invalidate(name)
+
+    def _invalidate(self, name: str):
+        self._cache.pop(name, None)
+        for dependent in self._dependents.pop(name, ()):
+            self._cache.pop(dependent, None)
+
+    def value(self, name: str, local: Optional[Dict[str, str]] = None) -> str:
+        """
+        Returns the expanded value of a macro.
+        """
+        with self._lock:
+            return self._lookup(name, local, [], set())
+
+    def expand(self, text: str, local: Optional[Dict[str, str]] = None) -> str:
+        """
+        Expands every macro reference in the text. `local` holds per-target values, such as automatic variables,
+        that take precedence over the table.
+
+        If a macro refers to itself, a MacroCycleError is thrown. If a reference is not terminated, a MacroError is
+        thrown.
+        """
+        if "$" not in text:
+            return text
+
+        with self._lock:
+            return self._expand(text, local, [], set())
+
+    def expand_rule(self, rule: Rule) -> Rule:
+        """
+        Returns the rule with its targets and components expanded, as make does when it reads a rule. The recipe is
+        expanded later, when it runs (see `expand_recipe`). A rule without macro references is returned as it is.
+        """
+        targets = " ".join(rule.targets)
+        components = " ".join(rule.components)
+        if "$" not in targets and "$" not in components:
+            return rule
+
+        targets = self.expand(targets).split()
+        components = self.expand(components).split()
+
+        return rule._replace(targets=targets, components=components)
+
+    def expand_recipe(self, rule: Rule, target: str) -> List[str]:
+        """
+        Returns the recipe of a rule expanded for one of its targets, with the automatic variables $@, $<, $^ and $+
+        set.
+        """
+        unique = list(dict.fromkeys(rule.components))
+        local = {
+            "@": target,
+            "<": rule.components[0] if rule.components else "",
+            "^": " ".join(unique),
+            "+": " ".join(rule.components),
+        }
+
+        return [self.expand(line, local) for line in rule.recipe]
+
+    def _lookup(self, name: str, local: Optional[Dict[str, str]], stack: List[str], deps: Set[str]) -> str:
+        deps.add(name)
+
+        if local and name in local:
+            return local[name]
+
+        cached = self._cache.get(name)
+        if cached is not None:
+            deps.update(cached[1])
+            return cached[0]
+
+        definition = self._macros.get(name)
+        if definition is None:
+            return "" if name in AUTOMATIC_VARIABLES else self._env.get(name, "")
+
+        value, simple = definition
+        if simple:
+            return value
+
+        if name in stack:
+            raise MacroCycleError(stack[stack.index(name):] + [name])
+
+        own_deps: Set[str] = set()
+        stack.append(name)
+        try:
+            value = self._expand(value, local, stack, own_deps)
+        finally:
+            stack.pop()
+
+        if not own_deps & AUTOMATIC_VARIABLES and not (local and own_deps & local.keys()):
+            self._cache[name] = (value, own_deps)
+            for dep in own_deps:
+                self._dependents.setdefault(dep, set()).add(name)
+
+        deps.update(own_deps)
+        return value
+
+    def _expand(self, text: str, local: Optional[Dict[str, str]], stack: List[str], deps: Set[str]) -> str:
+        if "$" not in text:
+            return text
+
+        out = []
+        i = 0
+        n = len(text)
+
+        while i < n:
+            j = text.find("$", i)
+            if j < 0:
+                out.append(text[i:])
+                break
+
+            out.append(text[i:j])
+            if j + 1 == n:
+                out.append("$")
+                break
+
+            c = text[j + 1]
+            if c == "$":
+                out.append("$")
+                i = j + 2
+                continue
+
+            if c not in "({":
+                out.append(self._lookup(c, local, stack, deps))
+                i = j + 2
+                continue
+
+            close = ")" if c == "(" else "}"
+            depth = 1
+            k = j + 2
+            while k < n and depth:
+                if text[k] == c:
+                    depth += 1
+                elif text[k] == close:
+                    depth -= 1
+                k += 1
+
+            if depth:
+                raise MacroError(f"Unterminated variable reference in '{text}'")
+
+            inner = text[j + 2:k - 1]
+            i = k
+
+            # Function calls are not supported
+            if " " in inner or "\t" in inner:
+                out.append(text[j:k])
+                continue
+
+            name = self._expand(inner, local, stack, deps)
+            variable, colon, substitution = name.partition(":")
+            if colon and "=" in substitution:
+                old, _, new = substitution.partition("=")
+                words = self._lookup(variable, local, stack, deps).split()
+                out.append(" ".join(w[:-len(old)] + new if old and w.endswith(old) else w for w in words))
+            else:
+                out.append(self._lookup(name, local, stack, deps))
+
+        return "".join(out)
@@ -0,0 +1,106 @@
+from .parser import parse_path
+from typing import Optional, Tuple
+import hashlib
+import pickle
+import struct
+import os
+
+
+MAGIC = b"PYMKPC1\0"
+
+# mtime_ns, size, sha256 digest (zeroes when the cache is validated by mtime and size)
+HEADER = struct.Struct("<qq32s")
+
+VALIDATE_MTIME = "mtime"
+VALIDATE_HASH = "hash"
+
+
+def cache_path(path: str) -> str:
+    """
+    Returns the path of the parse cache for a makefile, a hidden file next to it.
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.pymake-cache")
+
+
+def _fingerprint(path: str, validate: str) -> Tuple[int, int, bytes]:
+    st = os.stat(path)
+    digest = bytes(32)
+    if validate == VALIDATE_HASH:
+        with open(path, "rb") as fp:
+            digest = hashlib.sha256(fp.read()).digest()
+    elif validate != VALIDATE_MTIME:
+        raise ValueError(f"Unknown validation mode '{validate}'")
+
+    return (st.st_mtime_ns, st.st_size, digest)
+
+
+def load(path: str, validate: str = VALIDATE_MTIME, fingerprint: Optional[Tuple[int, int, bytes]] = None) -> Optional[list]:
+    """
+    Returns the cached parse of a makefile, or None if there is no cache or it is stale. The cache is read with a
+    single read.
+
+    With VALIDATE_MTIME, the cache is used if the makefile's modification time and size have not changed. With
+    VALIDATE_HASH, it is used if the makefile's contents have not changed. The makefile's current fingerprint can be
+    passed as `fingerprint`.
+    """
+    try:
+        with open(cache_path(path), "rb") as fp:
+            data = fp.read()
+    except OSError:
+        return None
+
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + HEADER.size:
+        return None
+
+    mtime_ns, size, digest = HEADER.unpack_from(data, len(MAGIC))
+    expected = fingerprint if fingerprint is not None else _fingerprint(path, validate)
+    if validate == VALIDATE_HASH:
+        if (size, digest) != expected[1:]:
+            return None
+    elif (mtime_ns, size) != expected[:2]:
+        return None
+
+    try:
+        return pickle.loads(memoryview(data)[len(MAGIC) + HEADER.size:])
+    except Exception:
+        return None
+
+
+def store(path: str, entries: list, validate: str = VALIDATE_MTIME,
+          fingerprint: Optional[Tuple[int, int, bytes]] = None) -> bool:
+    """
+    Writes the parse of a makefile to its cache. Returns False if the cache could not be written.
+
+    `fingerprint` should be taken before the makefile was parsed, so that a makefile edited during the parse does not
+    match the cache. By default, the makefile's current fingerprint is used.
+    """
+    header = HEADER.pack(*(fingerprint if fingerprint is not None else _fingerprint(path, validate)))
+    payload = pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+
+    destination = cache_path(path)
+    temporary = f"{destination}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as fp:
+            fp.write(MAGIC + header + payload)
+        os.replace(temporary, destination)
+    except OSError:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        return False
+
+    return True
+
+
+def parse_path_cached(path: str, validate: str = VALIDATE_MTIME) -> list:
+    """
+    Parses the makefile at the given path, using and refreshing its parse cache.
+    """
+    # Taken before parsing, so that an edit during the parse makes the next run parse again
+    fingerprint = _fingerprint(path, validate)
+    entries = load(path, validate, fingerprint)
+    if entries is None:
+        entries = parse_path(path)
+        store(path, entries, validate, fingerprint)
+
+    return entries
@@ -1,13 +1,144 @@
-from typing import List, Tuple, NamedTuple
+from typing import List, Tuple, NamedTuple, Iterable, Iterator, Union, Optional
+from io import IOBase, StringIO
+import sys
+
+# What follows the ':' of a drive letter. `C:/src` is only a drive path on Windows; elsewhere `x:/usr/lib` is a rule.
+DRIVE_SEPARATORS = "/\\" if sys.platform == "win32" else "\\"
+
+
+def find_separator(line: str) -> int:
+    """
+    Returns the index of the ':' that separates the targets of a dependency line from its prerequisites, or -1 if
+    there is none. A ':' escaped with a backslash, or one that follows a drive letter (as in `C:\\src\\a.c`, or
+    `C:/src/a.c` on Windows), does not separate, so later colons are left in the prerequisites.
+    """
+    i = line.find(":")
+    while i >= 0:
+        escaped = i > 0 and line[i - 1] == "\\"
+        drive = (i + 1 < len(line) and line[i + 1] in DRIVE_SEPARATORS and i > 0 and line[i - 1].isalpha()
+                 and (i == 1 or line[i - 2].isspace()))
+        if not escaped and not drive:
+            return i
+
+        i = line.find(":", i + 1)
+
+    return -1
 
 
 def parse_dependency_line(line: str) -> Tuple[List[str], List[str]]:
-    if ":" not in line:
+    """
+    Splits a dependency line into its targets and prerequisites.
+
+    If the line has no separator, or is a double-colon rule (`a:: b`), which is not supported, a ValueError is thrown.
+    """
+    separator = find_separator(line)
+    if separator < 0:
         raise ValueError(f"Expected a ':' after '{line}'")
+    if line.startswith(":", separator + 1):
+        raise ValueError(f"Double-colon rules are not supported: '{line}'")
+
+    return (line[:separator].strip().split(), line[separator + 1:].strip().split())
+
+
+def join_continuations(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Joins every line that ends with a backslash to the line after it, replacing the backslash with a space.
+    """
+    pending = []
+    for line in lines:
+        if line.endswith("\\"):
+            pending.append(line[:-1])
+            continue
+
+        if pending:
+            pending.append(line)
+            line = " ".join(pending)
+            pending = []
+
+        yield line
+
+    if pending:
+        yield " ".join(pending)
+
+
+def iter_lines(source: Union[str, bytes, IOBase, Iterable[str]], encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yields the lines of a makefile one at a time, without their line endings.
+
+    The source may be the contents of a makefile as a string, a text or binary file object, an mmap (or any other
+    object with a `readline` method that returns bytes) or any iterable of lines. Nothing is read ahead of the line
+    being yielded, so large files are never loaded into memory all at once.
+    """
+    if isinstance(source, str):
+        source = StringIO(source)
+    elif isinstance(source, (bytes, bytearray)):
+        source = StringIO(source.decode(encoding))
+
+    readline = getattr(source, "readline", None)
+    if readline is not None:
+        source = iter(readline, source.read(0) if hasattr(source, "read") else "")
+
+    for line in source:
+        if isinstance(line, (bytes, bytearray)):
+            line = line.decode(encoding)
+
+        yield line.rstrip("\r\n")
+
+
+class LineCursor(object):
+    """
+    A forward-only cursor over the lines of a makefile with a single line of lookahead.
+
+    Consuming a line is O(1), unlike `list.pop(0)`, so parsing a file through a cursor takes time linear in its length.
+    """
+
+    _EMPTY = object()
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._head = self._EMPTY
+        self.consumed = 0
+
+    def peek(self) -> Optional[str]:
+        """
+        Returns the next line without consuming it, or None if there are no lines left.
+        """
+        if self._head is self._EMPTY:
+            self._head = next(self._lines, None)
+
+        return self._head
+
+    def pop(self) -> str:
+        """
+        Consumes and returns the next line.
+
+        If there are no lines left, an IndexError is thrown.
+        """
+        line = self.peek()
+        if line is None:
+            raise IndexError("pop from an exhausted cursor")
+
+        self._head = self._EMPTY
+        self.consumed += 1
+        return line
+
+    def __bool__(self) -> bool:
+        return self.peek() is not None
+
 
-    target_str, component_str = line.split(":")
+def _with_cursor(lines: Union[List[str], LineCursor], parse):
+    """
+    Runs `parse` on a cursor over the given lines. If a list was given, the lines consumed by `parse` are removed from
+    the front of it, so callers that pass lists keep their old behaviour.
+    """
+    if isinstance(lines, LineCursor):
+        return parse(lines)
+
+    cursor = LineCursor(lines)
+    rv = parse(cursor)
+    del lines[:cursor.consumed]
 
-    return (target_str.strip().split(), component_str.strip().split())
+    return rv
 
 
 class Rule(NamedTuple):
@@ -17,21 +148,65 @@ class Rule(NamedTuple):
     recipe: List[str]
 
     @classmethod
-    def parse_rule(cls, lines: List[str], recipe_prefix="\t") -> "Rule":
+    def parse_rule(cls, lines: Union[List[str], LineCursor], recipe_prefix="\t") -> "Rule":
         """
-        Parses a Rule from a list of lines. Assumes the first line is a dependency line.
+        Parses a Rule from a list of lines (or a LineCursor). Assumes the first line is a dependency line.
         Returns a Rule.
         """
-        recipe = []
-        l = lines.pop(0)
-        targets, components = parse_dependency_line(l)
-        if not targets:
-            raise ValueError(f"Expected a target before '{l}'")
+        def parse(cursor: LineCursor) -> "Rule":
+            recipe = []
+            l = cursor.pop()
+            targets, components = parse_dependency_line(l)
+            if not targets:
+                raise ValueError(f"Expected a target before '{l}'")
+
+            while cursor and cursor.peek().startswith(recipe_prefix):
+                recipe.append(cursor.pop().strip())
+
+            return cls(targets, components, recipe)
+
+        return _with_cursor(lines, parse)
+
+
+# Prefixes that modify the macro assignment operator. '::' must be checked before ':'.
+MACRO_OP_PREFIXES = ("::", ":", "+", "?")
+
+
+# Directives that include other makefiles. The included files of -include and sinclude may be missing.
+INCLUDE_DIRECTIVES = {"include": False, "-include": True, "sinclude": True}
+
+
+class Include(NamedTuple):
+    """
+    Represents an include line. The paths are expanded and globbed when the graph is built (see BuildGraph.include).
+    """
+    paths: List[str]
+    optional: bool
+
+    @classmethod
+    def parse_include(cls, lines: Union[List[str], LineCursor]) -> "Include":
+        """
+        Parses an include line, such as `-include $(DEPS)`.
+        Returns an Include object
+        """
+        def parse(cursor: LineCursor) -> "Include":
+            directive, *paths = cursor.pop().split()
+            return cls(paths, INCLUDE_DIRECTIVES[directive])
+
+        return _with_cursor(lines, parse)
+
+
+def is_include(line: str) -> bool:
+    """
+    Returns True if the line is an include line, rather than a rule or macro whose name is `include` (`include: x`,
+    `include = x`). The paths can contain ':' and '=', as in `-include $(SRCS:.c=.d)`.
+    """
+    words = line.split(None, 1)
+    if not words or words[0] not in INCLUDE_DIRECTIVES:
+        return False
 
-        while lines and lines[0].startswith(recipe_prefix):
-            recipe.append(lines.pop(0).strip())
-        
-        return cls(targets, components, recipe)
+    rest = words[1] if len(words) > 1 else ""
+    return not (rest[:1] in (":", "=") or rest[:2] in ("+=", "?=", "!="))
 
 
 # Represents a makefile macro (or variable)
@@ -44,28 +219,84 @@ class Macro(NamedTuple):
     value: str
 
     @classmethod
-    def parse_macro(cls, lines: List[str], macro_op="=") -> "Macro":
+    def parse_macro(cls, lines: Union[List[str], LineCursor], macro_op="=") -> "Macro":
         """
-        Parses a macro from a single line.
+        Parses a macro from a single line. The operator is `macro_op`, optionally prefixed with '::', ':', '+' or '?'
+        (as in `CC := gcc`).
         Returns a Macro object
         """
-        line = lines.pop(0)
-        return cls(*map(str.strip, line.partition(macro_op)))
+        def parse(cursor: LineCursor) -> "Macro":
+            name, op, value = cursor.pop().partition(macro_op)
+            for prefix in MACRO_OP_PREFIXES:
+                if name.endswith(prefix):
+                    name, op = name[:-len(prefix)], prefix + op
+                    break
 
+            return cls(name.strip(), op, value.strip())
 
-def parse_file(f: str) -> list:
-    lines = f.splitlines()
-    rv = []
+        return _with_cursor(lines, parse)
+
+
+def iter_parse(lines: Iterable[str]) -> Iterator[Union[Rule, Macro, Include]]:
+    """
+    Parses makefile lines in a single pass, yielding each Rule, Macro and Include as soon as it is complete.
+    """
+    cursor = lines if isinstance(lines, LineCursor) else LineCursor(lines)
+
+    while cursor:
+        line = cursor.peek()
 
-    while lines:
         # Ignore blank lines and comments
-        if lines[0].startswith("#") or not lines[0].strip():
-            lines.pop(0)
+        if line.startswith("#") or not line.strip():
+            cursor.pop()
             continue
-        
-        if "=" in lines[0]:
-            rv.append(Macro.parse_macro(lines))
+
+        if is_include(line):
+            yield Include.parse_include(cursor)
+        elif "=" in line:
+            yield Macro.parse_macro(cursor)
         else:
-            rv.append(Rule.parse_rule(lines))
-    
-    return rv
\ No newline at end of file
+            yield Rule.parse_rule(cursor)
+
+
+def iter_sections(lines: Iterable[str], recipe_prefix: str = "\t") -> Iterator[List[str]]:
+    """
+    Splits makefile lines into sections: every line that is not a recipe line starts a new section, which also holds
+    the recipe lines that follow it. Sections are parsed independently of each other, so parsing each section with
+    iter_parse yields the same entries as parsing the whole file.
+    """
+    section = []
+    for line in lines:
+        if section and not line.startswith(recipe_prefix):
+            yield section
+            section = []
+
+        section.append(line)
+
+    if section:
+        yield section
+
+
+def parse_file(f: Union[str, bytes, IOBase, Iterable[str]]) -> list:
+    """
+    Parses a makefile. `f` may be the contents of the makefile or anything else accepted by `iter_lines`, such as an
+    open file or an mmap.
+    """
+    return list(iter_parse(iter_lines(f)))
+
+
+def parse_path(path: str, encoding: str = "utf-8") -> list:
+    """
+    Parses the makefile at the given path. The file is mmap'd and read one line at a time.
+    """
+    import mmap
+
+    with open(path, "rb") as fp:
+        try:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return []
+
+        with mm:
+            return parse_file(iter_lines(mm, encoding))
@@ -0,0 +1,316 @@
+"""
+Remote execution (`make --workers ADDRESS,...`): runs recipes on build workers (see make.worker) instead of in this
+process. A worker address is the path of a Unix domain socket, or HOST:PORT.
+
+Messages are framed as in make.client, a 4-byte length followed by a JSON object. The contents of a file follow a
+{"file": path, ...} message as `size` raw bytes. On connecting, the worker sends {"slots": n}, the number of jobs it
+runs at once. Then, for each job:
+
+    client: {"target": ..., "recipe": [...], "env": {...}, "inputs": {path: digest}, "outputs": [path]}
+    worker: {"need": [path]}, the inputs missing from its content store
+    client: {"file": path, "digest": ..., "size": n, "mode": m} and the contents, for every needed input
+    worker: any number of {"out": text}
+    worker: {"file": path, "size": n, "mode": m} and the contents, for every output the recipe produced
+    worker: {"status": exit_status}
+
+If the worker cannot run the job, for example because an input changed while it was sent, it answers with
+{"error": message} after the inputs instead, and the job runs locally.
+
+Connections stay open between jobs and are reused. Only prerequisites with relative paths are sent; absolute paths,
+such as system headers, must exist on the workers. The outputs of a job are the targets of its rule, so a recipe that
+writes another file has to list it as a target (`a.o a.d: a.c` for `cc -MD`); the worker reports the files it did
+not send back. A recipe that reads a file that is not a prerequisite fails on the worker; with `make
+--retry-locally`, every job that fails on a worker runs again locally, and only the local run counts.
+"""
+from .client import send_message, recv_message
+from .executor import Executor, LocalExecutor, Job
+from .cache import FileHasher
+from typing import List, Dict, Set, Optional, Tuple, Union
+from io import IOBase
+import threading
+import hashlib
+import socket
+import os
+
+CHUNK_SIZE = 1 << 16
+
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """
+    Returns the socket family and address of a worker address.
+
+    If a HOST:PORT address has no valid port, a ValueError is thrown.
+    """
+    host, colon, port = address.rpartition(":")
+    if os.sep in address or not colon:
+        return (socket.AF_UNIX, address)
+
+    if not port.isdigit():
+        raise ValueError(f"Expected a socket path or HOST:PORT, got '{address}'")
+
+    return (socket.AF_INET, (host or "localhost", int(port)))
+
+
+def is_relative(path: str) -> bool:
+    """
+    Returns True if the path stays below the directory it is relative to.
+    """
+    return not os.path.isabs(path) and ".." not in path.split(os.sep) and bool(path)
+
+
+def send_file(sock: socket.socket, path: str, header: dict) -> int:
+    """
+    Sends a file as a {"file": ...} message carrying the header, followed by its contents. Returns its size.
+    """
+    with open(path, "rb") as fp:
+        st = os.fstat(fp.fileno())
+        send_message(sock, dict(header, size=st.st_size, mode=st.st_mode & 0o777))
+        if st.st_size:
+            sock.sendfile(fp)
+
+    return st.st_size
+
+
+def recv_file(sock: socket.socket, message: dict, destination: str) -> str:
+    """
+    Receives the contents that follow a {"file": ...} message and atomically writes them to destination, creating its
+    directory. Returns the hex SHA-256 digest of the contents.
+
+    If the connection is closed first, an EOFError is thrown.
+    """
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    remaining = message["size"]
+    temporary = f"{destination}.remote-tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(temporary, "wb") as fp:
+            while remaining:
+                chunk = sock.recv(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise EOFError("connection closed")
+                fp.write(chunk)
+                digest.update(chunk)
+                remaining -= len(chunk)
+
+        os.chmod(temporary, message["mode"])
+        os.replace(temporary, destination)
+    finally:
+        if os.path.lexists(temporary):
+            os.unlink(temporary)
+
+    return digest.hexdigest()
+
+
+class JobError(Exception):
+    """
+    Raised when a worker reports that it could not run a job. The worker and the connection are still usable.
+    """
+    pass
+
+
+class WorkerState(object):
+    """
+    What the client knows about one worker: its idle connections, how many of its slots are in use, and the digests
+    of the inputs it already holds.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self.slots = 0
+        self.running = 0
+        self.idle: List[socket.socket] = []
+        self.holds: Set[str] = set()
+        self.down = False
+        self.jobs = 0
+        self.files_sent = 0
+        self.bytes_sent = 0
+
+    def connect(self) -> socket.socket:
+        """
+        Opens a connection to the worker and reads its greeting.
+
+        If the worker cannot be reached, an OSError is thrown.
+        """
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+            self.slots = recv_message(sock)["slots"]
+        except (OSError, EOFError, KeyError, ValueError) as e:
+            sock.close()
+            raise OSError(f"worker {self.address}: {e}") from e
+
+        return sock
+
+    def close(self):
+        for sock in self.idle:
+            sock.close()
+        self.idle = []
+
+
+class RemoteExecutor(Executor):
+    """
+    Runs recipes on a set of workers. A job goes to a worker with a free slot, preferring the worker that already
+    holds the most of its inputs, then the least loaded one; if every slot is busy, it waits for one.
+
+    A job that the worker cannot run, or whose connection breaks, runs locally. A job that fails on a worker is
+    reported like a local failure, unless `retry_failed` is set, in which case it runs again locally. A worker that
+    cannot be reached is not used again, and its job is retried elsewhere; once no worker is left, jobs run locally.
+
+    Inputs are identified by their SHA-256 digests, computed with `hasher` (by default, one kept in memory).
+
+    If no worker can be reached, an OSError is thrown.
+    """
+
+    def __init__(self, addresses: List[str], hasher: Optional[FileHasher] = None, retry_failed: bool = False):
+        self.hasher = hasher if hasher is not None else FileHasher(":memory:")
+        self.retry_failed = retry_failed
+        self._own_hasher = hasher is None
+        self._condition = threading.Condition()
+        self.local = LocalExecutor()
+        self.workers = [WorkerState(address) for address in addresses]
+
+        errors = []
+        for worker in self.workers:
+            try:
+                worker.idle.append(worker.connect())
+            except OSError as e:
+                worker.down = True
+                errors.append(str(e))
+
+        if all(w.down for w in self.workers):
+            raise OSError(f"No build worker is reachable ({'; '.join(errors) or 'none given'})")
+
+    @property
+    def slots(self) -> int:
+        """
+        The number of jobs that the reachable workers can run at once.
+        """
+        return sum(w.slots for w in self.workers if not w.down)
+
+    def _acquire(self, digests: Set[str]) -> Optional[WorkerState]:
+        """
+        Reserves a slot on the best worker for a job with the given inputs, waiting for one to become free. Returns
+        None if no worker is left.
+        """
+        with self._condition:
+            while True:
+                free = [w for w in self.workers if not w.down and w.running < w.slots]
+                if free:
+                    worker = max(free, key=lambda w: (len(digests & w.holds), -w.running / w.slots))
+                    worker.running += 1
+                    return worker
+
+                if all(w.down for w in self.workers):
+                    return None
+
+                self._condition.wait()
+
+    def _release(self, worker: WorkerState, sock: Optional[socket.socket]):
+        with self._condition:
+            worker.running -= 1
+            if sock is None:
+                worker.down = True
+                worker.close()
+            else:
+                worker.idle.append(sock)
+
+            self._condition.notify_all()
+
+    def _run_on(self, sock: socket.socket, worker: WorkerState, job: Job, env: Dict[str, str],
+                inputs: Dict[str, str], f_out: IOBase) -> int:
+        """
+        Runs a job over a connection to the worker. Returns the exit status of the recipe.
+
+        If the worker cannot run the job, a JobError is thrown. If the connection fails, an OSError, EOFError,
+        ValueError or KeyError is thrown.
+        """
+        send_message(sock, {"target": job.target, "recipe": job.recipe, "env": env, "inputs": inputs,
+                            "outputs": job.outputs})
+
+        for path in recv_message(sock)["need"]:
+            size = send_file(sock, path, {"file": path, "digest": inputs[path]})
+            with self._condition:
+                worker.files_sent += 1
+                worker.bytes_sent += size
+
+        with self._condition:
+            worker.holds.update(inputs.values())
+            worker.jobs += 1
+
+        while True:
+            message = recv_message(sock)
+            if "out" in message:
+                f_out.write(message["out"])
+            elif "file" in message:
+                if message["file"] not in job.outputs:
+                    raise ValueError(f"worker {worker.address} sent '{message['file']}', which is not an output")
+                recv_file(sock, message, message["file"])
+            elif "error" in message:
+                raise JobError(message["error"])
+            else:
+                return message["status"]
+
+    def run(self, job: Job, env: Dict[str, str], f_out: IOBase) -> int:
+        # A job that writes outside the working directory cannot be sandboxed on a worker
+        if not all(is_relative(path) for path in job.outputs):
+            return self.local.run(job, env, f_out)
+
+        inputs = {}
+        for path in job.inputs:
+            if is_relative(path):
+                digest = self.hasher.hash(path)
+                if digest is not None:
+                    inputs[path] = digest
+
+        while True:
+            worker = self._acquire(set(inputs.values()))
+            if worker is None:
+                return self.local.run(job, env, f_out)
+
+            sock = None
+            try:
+                with self._condition:
+                    sock = worker.idle.pop() if worker.idle else None
+                if sock is None:
+                    sock = worker.connect()
+
+                status = self._run_on(sock, worker, job, env, inputs, f_out)
+            except JobError as e:
+                self._release(worker, sock)
+                print(f"make: worker {worker.address} could not run '{job.target}': {e}; running it locally", file=f_out)
+                return self.local.run(job, env, f_out)
+            except (OSError, EOFError, ValueError, KeyError) as e:
+                if sock is not None:
+                    sock.close()
+
+                # Only a worker that cannot be reached again is down; otherwise the job broke the connection
+                try:
+                    sock = worker.connect()
+                except OSError:
+                    print(f"make: worker {worker.address} failed: {e}", file=f_out)
+                    self._release(worker, None)
+                    continue
+
+                self._release(worker, sock)
+                print(f"make: worker {worker.address} could not run '{job.target}': {e}; running it locally", file=f_out)
+                return self.local.run(job, env, f_out)
+
+            self._release(worker, sock)
+            if status and self.retry_failed:
+                # The recipe may have read a file that was not sent, so the failure only counts if it also fails here
+                print(f"make: '{job.target}' failed on worker {worker.address}; running it locally", file=f_out)
+                return self.local.run(job, env, f_out)
+
+            return status
+
+    def close(self):
+        with self._condition:
+            for worker in self.workers:
+                worker.close()
+
+        if self._own_hasher:
+            self.hasher.close()
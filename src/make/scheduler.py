@@ -0,0 +1,244 @@
+from .graph import BuildGraph
+from typing import List, Dict, Tuple, Callable, Optional, NamedTuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import contextvars
+import os
+import time
+
+
+class JobStats(NamedTuple):
+    """
+    Records when and where a single target's recipe ran.
+    """
+    target: str
+    worker: int
+    start: float
+    end: float
+    status: int
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class BuildReport(NamedTuple):
+    """
+    Summarizes a scheduled build.
+
+    Attributes:
+        jobs -- Maps each target that ran to its JobStats
+        failed -- Targets whose recipes failed, in completion order
+        skipped -- Targets that were not run because a prerequisite failed
+        critical_path -- The chain of targets with the longest total run time
+        wall_time -- Seconds from the first job starting to the last one ending
+        worker_busy -- Maps each worker slot to the number of seconds it spent running recipes
+    """
+    jobs: Dict[str, JobStats]
+    failed: List[str]
+    skipped: List[str]
+    critical_path: List[str]
+    wall_time: float
+    worker_busy: Dict[int, float]
+
+    @property
+    def critical_path_time(self) -> float:
+        return sum(self.jobs[t].duration for t in self.critical_path)
+
+    def utilization(self) -> Dict[int, float]:
+        """
+        Returns the fraction of the wall time that each worker spent running recipes.
+        """
+        if not self.wall_time:
+            return {w: 0.0 for w in self.worker_busy}
+
+        return {w: busy / self.wall_time for w, busy in self.worker_busy.items()}
+
+    def format(self) -> str:
+        lines = [f"Ran {len(self.jobs)} jobs in {self.wall_time:.3f}s"]
+        if self.critical_path:
+            lines.append(f"Critical path ({self.critical_path_time:.3f}s): {' -> '.join(self.critical_path)}")
+        for worker, fraction in sorted(self.utilization().items()):
+            lines.append(f"Worker {worker}: {self.worker_busy[worker]:.3f}s busy ({fraction:.0%})")
+
+        return "\n".join(lines)
+
+
+def load_average() -> Optional[float]:
+    """
+    Returns the one minute load average, or None if the platform does not provide one.
+    """
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def critical_path(graph: BuildGraph, jobs: Dict[str, JobStats], order: List[str]) -> List[str]:
+    """
+    Returns the chain of dependent targets with the longest total run time. `order` must list the targets in `jobs`
+    in build order.
+    """
+    longest: Dict[str, float] = {}
+    previous: Dict[str, Optional[str]] = {}
+
+    for target in order:
+        if target not in jobs:
+            continue
+
+        best, best_prereq = 0.0, None
+        for prereq in graph.prerequisites(target):
+            if longest.get(prereq, 0.0) > best:
+                best, best_prereq = longest[prereq], prereq
+
+        longest[target] = best + jobs[target].duration
+        previous[target] = best_prereq
+
+    if not longest:
+        return []
+
+    node = max(longest, key=longest.get)
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+
+    return path[::-1]
+
+
+def schedule(graph: BuildGraph, targets: List[str], run_target: Callable[[str], int], jobs: int = 1,
+             max_load: Optional[float] = None, keep_going: bool = False, poll_interval: float = 0.1) -> BuildReport:
+    """
+    Runs `run_target` for every target in `targets` on a pool of `jobs` workers. A target starts as soon as all of
+    its prerequisites in `targets` have finished. `targets` must be in build order, as returned by
+    BuildGraph.out_of_date.
+
+    If `max_load` is given, no new job is started while another job is running and the load average is at least
+    `max_load`. When a recipe fails, no new jobs are started unless `keep_going` is set, in which case only the
+    targets that depend on the failed one are skipped.
+    """
+    if jobs < 1:
+        raise ValueError(f"Expected a positive number of jobs, got {jobs}")
+
+    state = BuildState(graph, targets, jobs, keep_going)
+
+    def job(target: str, worker: int) -> JobStats:
+        start = time.perf_counter()
+        status = run_target(target)
+        return JobStats(target, worker, start, time.perf_counter(), status)
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while running or state.can_start():
+            throttled = False
+            while state.can_start():
+                if over_max_load(max_load, running):
+                    throttled = True
+                    break
+
+                target, worker = state.start()
+                # Each job runs in a copy of the caller's context, which holds the build's tracer and counter
+                running[pool.submit(contextvars.copy_context().run, job, target, worker)] = worker
+
+            if not running:
+                break
+
+            done, _ = wait(running, timeout=poll_interval if throttled else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                state.finish(future.result())
+
+    return state.report()
+
+
+def over_max_load(max_load: Optional[float], running) -> bool:
+    """
+    Returns True if no new job should start yet: the load average is at least `max_load` while other jobs are
+    running. With no jobs running, a job always starts, so the build cannot stall.
+    """
+    if max_load is None or not running:
+        return False
+
+    load = load_average()
+    return load is not None and load >= max_load
+
+
+class BuildState(object):
+    """
+    The bookkeeping shared by the schedulers (schedule and make.aio): which targets are ready, which workers are free,
+    and what happened to the targets that finished. It is not thread-safe; only the scheduling loop uses it.
+    """
+
+    def __init__(self, graph: BuildGraph, targets: List[str], jobs: int, keep_going: bool):
+        self.graph = graph
+        self.targets = targets
+        self.jobs = jobs
+        self.keep_going = keep_going
+
+        self.pending = set(targets)
+        self.waiting_on: Dict[str, int] = {}
+        self.dependents: Dict[str, List[str]] = {t: [] for t in targets}
+        self.ready: List[str] = []
+
+        for target in targets:
+            prereqs = {p for p in graph.prerequisites(target) if p in self.pending}
+            self.waiting_on[target] = len(prereqs)
+            for p in prereqs:
+                self.dependents[p].append(target)
+            if not prereqs:
+                self.ready.append(target)
+
+        # Start in build order
+        self.ready.reverse()
+
+        self.stats: Dict[str, JobStats] = {}
+        self.failed: List[str] = []
+        self.skipped: List[str] = []
+        self.free_workers = list(range(jobs - 1, -1, -1))
+        self.stopped = False
+
+    def can_start(self) -> bool:
+        return bool(self.ready and self.free_workers and not self.stopped)
+
+    def start(self) -> Tuple[str, int]:
+        return (self.ready.pop(), self.free_workers.pop())
+
+    def finish(self, result: JobStats):
+        self.free_workers.append(result.worker)
+        self.stats[result.target] = result
+        self.pending.discard(result.target)
+
+        if result.status:
+            self.failed.append(result.target)
+            self.skip(result.target)
+            if not self.keep_going:
+                self.stopped = True
+            return
+
+        for d in self.dependents[result.target]:
+            self.waiting_on[d] -= 1
+            if self.waiting_on[d] == 0 and d in self.pending:
+                self.ready.append(d)
+
+    def skip(self, target: str):
+        work = [target]
+        while work:
+            t = work.pop()
+            for d in self.dependents[t]:
+                if d in self.pending:
+                    self.pending.discard(d)
+                    self.skipped.append(d)
+                    work.append(d)
+
+    def report(self) -> BuildReport:
+        self.skipped.extend(t for t in self.targets if t in self.pending)
+
+        busy = {w: 0.0 for w in range(self.jobs)}
+        for s in self.stats.values():
+            busy[s.worker] += s.duration
+
+        wall_time = 0.0
+        if self.stats:
+            wall_time = max(s.end for s in self.stats.values()) - min(s.start for s in self.stats.values())
+
+        return BuildReport(self.stats, self.failed, self.skipped, critical_path(self.graph, self.stats, self.targets),
+                           wall_time, busy)
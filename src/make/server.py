@@ -0,0 +1,324 @@
+"""
+The build server: a long-running process that runs make for clients connecting over a Unix domain socket (see
+make.client), so that each build skips interpreter startup and reuses what earlier builds loaded:
+
+- every module, including all built-in commands;
+- parsed makefiles, revalidated against the file's inode, size and modification time;
+- parsed included files, such as compiler dependency files, revalidated against their size and modification time;
+- directory listings, through one FSIndex kept in memory (and in the --index file, if given);
+- one limit on concurrent jobs, shared by all builds.
+
+On Linux, every build has a working directory of its own, so builds in different directories run concurrently, and a
+recipe can run make through the server again (`cd sub && make`); the nested build runs in its recipe's job slot.
+Elsewhere, builds in different directories take turns, and make run by a recipe does not use the server.
+
+Usage: python -m make.server [-j JOBS] [--index FILE] SOCKET
+
+Point the client at it with `PYMAKE_SERVER=SOCKET python main.py make ...`.
+"""
+from .client import MessageWriter, SERVER_VARIABLE, NESTED_VARIABLE, send_message, recv_message
+from .cli import make
+from .compact import CompactRules, parse_path_compact
+from .depfile import DepfileLoader
+from commands.command import COMMAND_MODULES, resolve_command
+from commands.fsindex import FSIndex
+from typing import List, Dict, Tuple, Optional
+from getopt import getopt, GetoptError
+import socketserver
+import itertools
+import threading
+import sys
+import os
+
+
+class MakefileCache(object):
+    """
+    Keeps parsed makefiles in memory, as CompactRules stores. A makefile is parsed again when its inode, size or
+    modification time changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int, int], CompactRules]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, path: str) -> CompactRules:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        fingerprint = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == fingerprint:
+                self.hits += 1
+                return cached[1]
+
+        # BuildGraph never modifies the entries, so builds can share them
+        entries = parse_path_compact(path)
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (fingerprint, entries)
+
+        return entries
+
+
+# unshare(2) flag that gives the calling thread its own working directory
+CLONE_FS = 0x200
+
+
+def unshare_working_directory() -> bool:
+    """
+    Gives the calling thread a working directory of its own, which the threads and processes it starts afterwards
+    share. Returns False if the platform does not support it.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+
+    # Only imported when needed, since only the server uses it
+    import ctypes
+
+    try:
+        return ctypes.CDLL(None, use_errno=True).unshare(CLONE_FS) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+class DirectoryLock(object):
+    """
+    Lets builds run concurrently as long as they run in the same working directory, where builds cannot have a working
+    directory of their own (see unshare_working_directory). A build in another directory waits until the running
+    builds have finished.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._directory = None
+
+    def acquire(self, directory: str):
+        """
+        Waits until the process can be in the directory, and changes to it.
+
+        If the directory cannot be entered, an OSError is thrown.
+        """
+        with self._condition:
+            while self._active and self._directory != directory:
+                self._condition.wait()
+
+            if self._directory != directory:
+                self._directory = None
+                os.chdir(directory)
+                self._directory = directory
+            self._active += 1
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            if not self._active:
+                self._condition.notify_all()
+
+
+class BuildSlots(object):
+    """
+    The job slots of one build, taken from a JobSlots limit. Can be used as a context manager around each job, like a
+    semaphore.
+
+    A build started by a recipe of another build (the lender) first runs its jobs in the slot of that recipe, since the
+    recipe holds it while it waits.
+    """
+
+    def __init__(self, pool: "JobSlots", build_id: str, lender: Optional["BuildSlots"]):
+        self.id = build_id
+        self.lender = lender
+        # The number of this build's jobs that hold a slot, and how many of those slots are lent to nested builds
+        self.held = 0
+        self.lent = 0
+        self._pool = pool
+        self._borrowed_free = lender is not None
+
+    def acquire(self):
+        with self._pool.lock:
+            if self._borrowed_free:
+                self._borrowed_free = False
+                self.held += 1
+                return
+
+        self._pool.semaphore.acquire()
+        with self._pool.lock:
+            self.held += 1
+
+    def release(self):
+        with self._pool.lock:
+            self.held -= 1
+            # Slots are interchangeable, so the borrowed one is given back first
+            if self.lender is not None and not self._borrowed_free:
+                self._borrowed_free = True
+                return
+
+        self._pool.semaphore.release()
+
+    def __enter__(self) -> "BuildSlots":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class JobSlots(object):
+    """
+    One limit on the number of jobs running at once, shared by all builds, which take their slots through BuildSlots.
+    """
+
+    def __init__(self, jobs: int):
+        self.lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(jobs)
+        self._builds: Dict[str, BuildSlots] = {}
+        self._ids = itertools.count()
+
+    def start(self, parent: Optional[str] = None) -> BuildSlots:
+        """
+        Returns the slots of a new build. `parent` is the ID of the build whose recipe started it, if any; the new
+        build borrows the recipe's slot if that build has a slot that is not lent already.
+        """
+        with self.lock:
+            lender = self._builds.get(parent) if parent is not None else None
+            if lender is not None and lender.lent < lender.held:
+                lender.lent += 1
+            else:
+                lender = None
+
+            slots = BuildSlots(self, str(next(self._ids)), lender)
+            self._builds[slots.id] = slots
+            return slots
+
+    def finish(self, slots: BuildSlots):
+        """
+        Forgets a build once its jobs have finished, returning the slot it borrowed.
+        """
+        with self.lock:
+            del self._builds[slots.id]
+            if slots.lender is not None:
+                slots.lender.lent -= 1
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: BuildServer = self.server
+        try:
+            request = recv_message(self.request)
+        except (EOFError, ValueError):
+            return
+
+        lock = threading.Lock()
+        f_out = MessageWriter(self.request, "out", lock)
+        f_err = MessageWriter(self.request, "err", lock)
+        env = request["env"]
+
+        # Each request has a thread of its own, so the build's jobs and commands share its working directory
+        own_directory = unshare_working_directory()
+        try:
+            if own_directory:
+                os.chdir(request["cwd"])
+            else:
+                server.directories.acquire(request["cwd"])
+        except OSError as e:
+            print(f"make: {e}", file=f_err)
+            status = 2
+        else:
+            if not own_directory:
+                # make run by a recipe could not enter its directory until this build finishes, so it runs locally
+                env = {name: value for name, value in env.items() if name != SERVER_VARIABLE}
+
+            try:
+                status = self.build(request, env, f_out, f_err)
+            except Exception as e:
+                print(f"make: internal error: {e!r}", file=f_err)
+                status = 2
+            finally:
+                if not own_directory:
+                    server.directories.release()
+
+        with lock:
+            try:
+                send_message(self.request, {"status": status})
+            except OSError:
+                pass
+
+    def build(self, request: dict, env: Dict[str, str], f_out, f_err) -> int:
+        server: BuildServer = self.server
+
+        # A build started by a recipe of another build runs in the recipe's job slot, since the recipe holds it while
+        # it waits, and would otherwise wait forever for a slot on a server with few of them. Recipes find the ID of
+        # their build in the environment.
+        slots = server.job_slots.start(request["env"].get(NESTED_VARIABLE))
+        if SERVER_VARIABLE in env:
+            env = dict(env, **{NESTED_VARIABLE: slots.id})
+
+        try:
+            return make(request["args"], env, f_out, f_err, parse=server.makefiles.parse, job_slots=slots,
+                        depfiles=server.depfiles, index=server.index)
+        finally:
+            server.job_slots.finish(slots)
+
+
+class BuildServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves builds on a Unix domain socket, each on its own thread. `jobs` limits the number of jobs running at once
+    across all builds. Builds that do not pass their own --index share one FSIndex, which is kept in memory, and also
+    in the file `index` if given, so that it outlives the server.
+    """
+    daemon_threads = True
+
+    def __init__(self, path: str, jobs: int = 1, index: Optional[str] = None):
+        if jobs < 1:
+            raise ValueError(f"Expected a positive number of jobs, got {jobs}")
+
+        self.makefiles = MakefileCache()
+        self.directories = DirectoryLock()
+        self.job_slots = JobSlots(jobs)
+        self.depfiles = DepfileLoader(processes=jobs)
+        self.index = FSIndex(os.path.abspath(index) if index is not None else ":memory:")
+
+        # Keep every command warm rather than importing it during someone's build
+        for name in COMMAND_MODULES:
+            resolve_command(name)
+
+        # A socket left behind by a server that did not shut down cleanly
+        if os.path.exists(path):
+            os.unlink(path)
+
+        super().__init__(path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.index.close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def main(args: List[str], f_err=sys.stderr) -> int:
+    try:
+        opt, operands = getopt(args, "j:", ["index="])
+        options = dict(opt)
+        jobs = int(options.get("-j", 1))
+        if len(operands) != 1:
+            raise ValueError("Expected the path of the socket")
+    except (GetoptError, ValueError) as e:
+        print(f"make.server: {e}", file=f_err)
+        return 2
+
+    with BuildServer(operands[0], jobs, options.get("--index")) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    quit(main(sys.argv[1:]))
@@ -0,0 +1,155 @@
+"""
+Records a timeline of a build in the Chrome trace event format, which chrome://tracing and Perfetto can load.
+
+Tracing is off unless a Tracer is installed with `enable`. Instrumented code either calls `span`, which returns a shared
+no-op context manager while tracing is off, or checks `current()` once before a hot loop.
+
+The tracer is a context variable, so that concurrent builds on the build server each record their own. make's thread
+pools run their jobs in a copy of the context that submitted them.
+"""
+from typing import List, Dict, Optional, Any
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+
+
+class Span(object):
+    """
+    A complete ("X") trace event. Arguments can be added to `args` while the span is open.
+    """
+    __slots__ = ("tracer", "name", "category", "args", "_start", "_cpu")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self) -> "Span":
+        self._cpu = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.args["thread_cpu_ms"] = (time.thread_time() - self._cpu) * 1000
+        if exc_info[0] is not None:
+            self.args["error"] = repr(exc_info[1])
+
+        self.tracer.complete(self.name, self.category, self._start, end, self.args)
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        # A fresh dictionary on every access, so anything written to it while tracing is off is discarded
+        return {}
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Collects trace events from any thread. Timestamps are microseconds since the tracer was created.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def _timestamp(self, t: float) -> float:
+        return (t - self._origin) * 1e6
+
+    def complete(self, name: str, category: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+        """
+        Records an event that ran from `start` to `end`, both time.perf_counter() values.
+        """
+        event = {"name": name, "cat": category, "ph": "X", "ts": self._timestamp(start), "dur": (end - start) * 1e6,
+                 "pid": self._pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+
+        with self._lock:
+            self._events.append(event)
+
+    def instant(self, name: str, category: str, args: Optional[Dict[str, Any]] = None):
+        event = {"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._timestamp(time.perf_counter()),
+                 "pid": self._pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+
+        with self._lock:
+            self._events.append(event)
+
+    def span(self, name: str, category: str, **args) -> Span:
+        return Span(self, name, category, args)
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def dump(self, f_out):
+        # Name each thread after the order it first appeared in, which is easier to read than thread ids
+        events = self.events
+        threads: Dict[int, int] = {}
+        for event in events:
+            threads.setdefault(event["tid"], len(threads))
+
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": f"thread {n}"}}
+                    for tid, n in threads.items()]
+
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f_out)
+
+    def save(self, path: str):
+        with open(path, "w") as f_out:
+            self.dump(f_out)
+
+
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("tracer", default=None)
+
+
+def current() -> Optional[Tracer]:
+    """
+    Returns the installed tracer, or None if tracing is off.
+    """
+    return _tracer.get()
+
+
+def enable() -> Tracer:
+    tracer = Tracer()
+    _tracer.set(tracer)
+    return tracer
+
+
+def disable() -> Optional[Tracer]:
+    """
+    Stops tracing. Returns the tracer that was installed, if any.
+    """
+    rv = _tracer.get()
+    _tracer.set(None)
+    return rv
+
+
+def span(name: str, category: str, **args):
+    """
+    Returns a context manager that records the time spent in its body, or NULL_SPAN if tracing is off.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        return NULL_SPAN
+
+    return tracer.span(name, category, **args)
@@ -0,0 +1,297 @@
+"""
+Watch mode (`make --watch`): keeps the parsed makefile, the build graph and the modification time of every node in
+memory, and rebuilds the targets affected by each change that inotify reports. A change to the makefile or to a file
+it includes, such as a dependency file written by the compiler, reloads the graph first.
+"""
+from .parser import Rule, Macro, iter_lines, iter_parse, iter_sections
+from .graph import BuildGraph
+from .depfile import DepfileLoader
+from .inotify import Inotify, IN_Q_OVERFLOW, IN_IGNORED
+from typing import List, Dict, Set, Callable, Iterable, Optional, Union
+import selectors
+import sys
+import os
+
+
+class SectionParser(object):
+    """
+    Parses a makefile one section at a time (see parser.iter_sections) and remembers the entries of each section by
+    its text. When the makefile changes, only the sections whose text is new are parsed again.
+    """
+
+    def __init__(self):
+        self._sections: Dict[str, List[Union[Rule, Macro]]] = {}
+        # Number of sections parsed by the last call to parse
+        self.parsed = 0
+
+    def parse(self, text: str) -> List[Union[Rule, Macro]]:
+        sections: Dict[str, List[Union[Rule, Macro]]] = {}
+        entries = []
+        self.parsed = 0
+
+        for lines in iter_sections(iter_lines(text)):
+            key = "\n".join(lines)
+            parsed = sections.get(key)
+            if parsed is None:
+                parsed = self._sections.get(key)
+            if parsed is None:
+                parsed = list(iter_parse(lines))
+                self.parsed += 1
+
+            sections[key] = parsed
+            entries.extend(parsed)
+
+        # Forget the sections that were removed
+        self._sections = sections
+        return entries
+
+
+class Watcher(object):
+    """
+    Rebuilds the goals whenever one of the files they depend on changes.
+
+    `build` is called with the graph and the out-of-date targets in build order, and returns the exit status of the
+    build. Changes are collected until none has arrived for `debounce` seconds, so that saving many files at once
+    starts a single build.
+
+    If inotify is not available, an OSError is thrown.
+    """
+
+    def __init__(self, makefile: str, goals: List[str], env: Dict[str, str],
+                 build: Callable[[BuildGraph, List[str]], int], debounce: float = 0.1, f_err=sys.stderr):
+        self.makefile = os.path.abspath(makefile)
+        self.goals = goals
+        self.env = env
+        self.build = build
+        self.debounce = debounce
+        self.f_err = f_err
+
+        self.parser = SectionParser()
+        # Keeps the included files parsed between reloads, so only the changed ones are parsed again
+        self.depfiles = DepfileLoader()
+        self.graph: Optional[BuildGraph] = None
+        # The absolute paths of the makefile and the files it includes, which reload the graph when they change
+        self.sources: Set[str] = {self.makefile}
+        # Modification time of every node that is not phony, or None if it does not exist
+        self.mtimes: Dict[str, Optional[float]] = {}
+        # Maps each node to the targets that list it as a prerequisite
+        self.dependents: Dict[str, List[str]] = {}
+        # Maps absolute paths to the nodes that name them
+        self.nodes_by_path: Dict[str, List[str]] = {}
+
+        self.inotify = Inotify()
+        self.watches: Dict[int, str] = {}
+        self._watched: Dict[str, int] = {}
+        self._stop_r, self._stop_w = os.pipe()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.inotify, selectors.EVENT_READ)
+        self.selector.register(self._stop_r, selectors.EVENT_READ)
+
+    def load(self):
+        """
+        Parses the makefile (only its changed sections after the first time) and its included files (only the changed
+        ones), and rebuilds the graph and the indexes.
+
+        If the makefile cannot be read or parsed, an OSError or ValueError is thrown and the previous graph is kept.
+        """
+        with open(self.makefile) as f:
+            entries = self.parser.parse(f.read())
+
+        graph = BuildGraph(entries, self.env, self.depfiles)
+        self.graph = graph
+        self.sources = {self.makefile}.union(os.path.abspath(path) for path in graph.includes)
+
+        self.dependents = {}
+        self.nodes_by_path = {}
+        nodes = set(graph.rules)
+        for target, rule in graph.rules.items():
+            for component in rule.components:
+                self.dependents.setdefault(component, []).append(target)
+                nodes.add(component)
+
+        for node in nodes:
+            if node not in graph.phony:
+                self.nodes_by_path.setdefault(os.path.abspath(node), []).append(node)
+
+        # Metadata of the nodes that were already known stays resident
+        self.mtimes = {n: self.mtimes[n] for n in nodes if n in self.mtimes and n not in graph.phony}
+        self.mtimes.update(graph.stat(n for n in nodes if n not in self.mtimes and n not in graph.phony))
+        self.sync_watches()
+
+    def sync_watches(self):
+        """
+        Watches every existing directory that contains a node, the makefile or an included file, and stops watching the
+        others.
+        """
+        directories = {os.path.dirname(path) for path in self.nodes_by_path}
+        directories.update(os.path.dirname(path) for path in self.sources)
+
+        for directory in set(self._watched) - directories:
+            wd = self._watched.pop(directory)
+            del self.watches[wd]
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                # The directory is gone, and so is its watch
+                pass
+
+        for directory in directories - set(self._watched):
+            try:
+                wd = self.inotify.add_watch(directory)
+            except (FileNotFoundError, NotADirectoryError):
+                # Watched once a build creates it
+                continue
+
+            self._watched[directory] = wd
+            self.watches[wd] = directory
+
+    def affected(self, nodes: Iterable[str]) -> Set[str]:
+        """
+        Returns the targets that depend on any of the nodes, directly or not, including the nodes themselves.
+        """
+        rv = set()
+        work = list(nodes)
+        while work:
+            node = work.pop()
+            if node in rv:
+                continue
+
+            rv.add(node)
+            work.extend(self.dependents.get(node, ()))
+
+        return rv
+
+    def rebuild(self, changed: Optional[Iterable[str]] = None) -> Optional[int]:
+        """
+        Brings the goals up to date, using the resident modification times. If `changed` is given, only the targets
+        affected by those nodes are considered. Returns the status of the build, or None if nothing was out of date.
+        """
+        goals = self.goals or [self.graph.default_goal]
+        if changed is not None:
+            affected = self.affected(changed)
+            goals = [t for t in self.graph.topological_order(goals) if t in affected and t in self.graph.rules]
+
+        targets = self.graph.out_of_date(goals, self.mtimes)
+        if not targets:
+            return None
+
+        status = self.build(self.graph, targets)
+        self.mtimes.update(self.graph.stat(t for t in targets if t not in self.graph.phony))
+
+        # Builds can create the directories of new targets
+        self.sync_watches()
+        return status
+
+    def wait(self) -> Optional[Set[str]]:
+        """
+        Blocks until a file changes, then collects changes until there are none for `debounce` seconds.
+        Returns the absolute paths that changed, or None if `stop` was called.
+        """
+        paths = set()
+        timeout = None
+        while True:
+            ready = self.selector.select(timeout)
+            if not ready:
+                return paths
+
+            for key, _ in ready:
+                if key.fileobj == self._stop_r:
+                    return None
+
+            for event in self.inotify.read():
+                if event.mask & IN_Q_OVERFLOW:
+                    # Events were lost, so everything may have changed
+                    paths.update(self.nodes_by_path)
+                    paths.update(self.sources)
+                elif event.mask & IN_IGNORED:
+                    directory = self.watches.pop(event.wd, None)
+                    if directory is not None:
+                        del self._watched[directory]
+                elif event.wd in self.watches:
+                    paths.add(os.path.join(self.watches[event.wd], event.name))
+
+            timeout = self.debounce
+
+    def handle(self, paths: Set[str]) -> Optional[int]:
+        """
+        Updates the resident state for the changed paths and rebuilds what they affect. Returns the status of the
+        build, or None if nothing was rebuilt.
+        """
+        sources = paths & self.sources
+        if sources:
+            misses = self.depfiles.misses
+            self.load()
+            if self.makefile in sources:
+                print(f"make: reparsed {self.parser.parsed} changed section(s) of {os.path.basename(self.makefile)}",
+                      file=self.f_err)
+            if self.depfiles.misses != misses:
+                print(f"make: reparsed {self.depfiles.misses - misses} changed included file(s)", file=self.f_err)
+            return self.rebuild()
+
+        changed = []
+        for path in paths:
+            for node in self.nodes_by_path.get(path, ()):
+                mtime = self.graph.stat([node])[node]
+                # Builds report their own outputs, which are already up to date here
+                if mtime != self.mtimes.get(node):
+                    self.mtimes[node] = mtime
+                    changed.append(node)
+
+        # A new directory may hold nodes
+        self.sync_watches()
+
+        if not changed:
+            return None
+
+        return self.rebuild(changed)
+
+    def run(self) -> int:
+        """
+        Builds the goals, then rebuilds them on every change until `stop` is called or the user interrupts.
+        Returns the status of the last build.
+        """
+        status = 0
+        try:
+            try:
+                self.load()
+                status = self.rebuild() or 0
+            except (OSError, ValueError) as e:
+                print(f"make: {e}", file=self.f_err)
+                status = 2
+                self.sync_watches()
+
+            print("make: watching for changes", file=self.f_err)
+            while True:
+                paths = self.wait()
+                if paths is None:
+                    return status
+
+                try:
+                    rv = self.handle(paths)
+                except (OSError, ValueError) as e:
+                    print(f"make: {e}", file=self.f_err)
+                    rv = 2
+
+                if rv is not None:
+                    status = rv
+                    print("make: watching for changes", file=self.f_err)
+        except KeyboardInterrupt:
+            return status
+
+    def stop(self):
+        """
+        Makes `run` return. Can be called from any thread.
+        """
+        os.write(self._stop_w, b"\0")
+
+    def close(self):
+        self.selector.close()
+        self.inotify.close()
+        os.close(self._stop_r)
+        os.close(self._stop_w)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,208 @@
+"""
+The build worker: a daemon that runs recipes for make.remote. Each connection is served by a forked process, so jobs
+can change the working directory, and a connection runs its jobs one at a time.
+
+Inputs are kept in a content store named by their digests, so a file is only sent to a worker once. Every job runs
+in a fresh sandbox directory holding copies of its inputs, and only its declared outputs are sent back; the other files
+it writes are listed in its output. A job that cannot be run is answered with an error rather than a status, and the
+connection stays usable.
+
+Usage: python -m make.worker [-j SLOTS] [--dir DIRECTORY] ADDRESS
+
+ADDRESS is the path of a Unix domain socket, or HOST:PORT. Anyone who can connect can run commands as the worker's
+user, so TCP workers should only listen on trusted networks.
+"""
+from .client import MessageWriter, send_message, recv_message
+from .remote import parse_address, is_relative, send_file, recv_file
+from .executor import run_recipe
+from commands.command import COMMAND_MODULES, resolve_command
+from typing import List, Dict, Optional
+from getopt import getopt, GetoptError
+import socketserver
+import threading
+import tempfile
+import shutil
+import socket
+import sys
+import os
+
+
+class ContentStore(object):
+    """
+    Files named by the SHA-256 digest of their contents, in `directory`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def receive(self, sock: socket.socket, message: dict):
+        """
+        Receives a file sent as a {"file": ..., "digest": ...} message and stores it under its digest.
+
+        If the contents do not match the digest, a ValueError is thrown.
+        """
+        destination = self.path(message["digest"])
+        digest = recv_file(sock, message, destination)
+        if digest != message["digest"]:
+            os.unlink(destination)
+            raise ValueError(f"'{message['file']}' does not match its digest")
+
+
+def _sandbox_path(sandbox: str, path: str) -> str:
+    if not is_relative(path):
+        raise ValueError(f"'{path}' is not a relative path")
+
+    return os.path.join(sandbox, path)
+
+
+class _WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        send_message(self.request, {"slots": self.server.slots})
+        while True:
+            try:
+                job = recv_message(self.request)
+            except (EOFError, ValueError, OSError):
+                return
+
+            self.run_job(job)
+
+    def run_job(self, job: dict):
+        server: WorkerServer = self.server
+        sock = self.request
+        inputs: Dict[str, str] = job["inputs"]
+        outputs: List[str] = job["outputs"]
+
+        errors = [f"'{path}' is not a relative path" for path in list(inputs) + outputs if not is_relative(path)]
+        need = [] if errors else [path for path, digest in inputs.items() if not server.store.has(digest)]
+        send_message(sock, {"need": need})
+        for _ in need:
+            message = recv_message(sock)
+            try:
+                server.store.receive(sock, message)
+            except ValueError as e:
+                # The file changed while it was sent. It was read in full, so the connection is still in step.
+                errors.append(str(e))
+
+        if errors:
+            send_message(sock, {"error": "; ".join(errors)})
+            return
+
+        sandbox = tempfile.mkdtemp(prefix="job-", dir=server.jobs_directory)
+        try:
+            try:
+                status = self.run_in(sandbox, job)
+            except OSError as e:
+                send_message(sock, {"error": str(e)})
+                return
+
+            for path in outputs:
+                if os.path.isfile(_sandbox_path(sandbox, path)):
+                    send_file(sock, _sandbox_path(sandbox, path), {"file": path})
+
+            send_message(sock, {"status": status})
+        finally:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+    def run_in(self, sandbox: str, job: dict) -> int:
+        """
+        Runs the recipe of a job in the sandbox. Returns its exit status.
+
+        If the sandbox cannot be set up, an OSError is thrown.
+        """
+        server: WorkerServer = self.server
+        f_out = MessageWriter(self.request, "out", threading.Lock())
+
+        # Copies rather than links, so that a recipe that modifies an input cannot corrupt the store
+        for path, digest in job["inputs"].items():
+            destination = _sandbox_path(sandbox, path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(server.store.path(digest), destination)
+        for path in job["outputs"]:
+            os.makedirs(os.path.dirname(_sandbox_path(sandbox, path)), exist_ok=True)
+
+        os.chdir(sandbox)
+        try:
+            status = run_recipe(job["recipe"], job["env"], f_out)
+        finally:
+            os.chdir(server.directory)
+
+        # Files that are not outputs would be lost silently, so they are reported with the job's output
+        known = set(job["inputs"]) | set(job["outputs"])
+        for directory, _, files in os.walk(sandbox):
+            for name in files:
+                path = os.path.relpath(os.path.join(directory, name), sandbox)
+                if path not in known:
+                    print(f"worker: '{path}' is not a target of the rule, so it is not sent back", file=f_out)
+
+        return status
+
+
+class WorkerServer(socketserver.ForkingMixIn, socketserver.TCPServer):
+    """
+    Serves make.remote clients on `address`. `slots` is the number of jobs the worker offers to run at once; clients
+    keep at most that many connections busy. Inputs and sandboxes are kept in `directory`.
+    """
+    allow_reuse_address = True
+    block_on_close = False
+
+    def __init__(self, address: str, slots: int = 1, directory: Optional[str] = None):
+        if slots < 1:
+            raise ValueError(f"Expected a positive number of slots, got {slots}")
+
+        self.slots = slots
+        self.directory = os.path.abspath(directory or tempfile.mkdtemp(prefix="pymake-worker-"))
+        self.store = ContentStore(os.path.join(self.directory, "objects"))
+        self.jobs_directory = os.path.join(self.directory, "jobs")
+        os.makedirs(self.jobs_directory, exist_ok=True)
+
+        # Keep every command warm, so that each forked process starts with them
+        for name in COMMAND_MODULES:
+            resolve_command(name)
+
+        self.address_family, server_address = parse_address(address)
+        if self.address_family == socket.AF_UNIX and os.path.exists(address):
+            # A socket left behind by a worker that did not shut down cleanly
+            os.unlink(address)
+
+        super().__init__(server_address, _WorkerHandler)
+
+    def server_close(self):
+        super().server_close()
+        if self.address_family == socket.AF_UNIX:
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+
+def main(args: List[str], f_err=sys.stderr) -> int:
+    try:
+        opt, operands = getopt(args, "j:", ["dir="])
+        options = dict(opt)
+        slots = int(options.get("-j", 1))
+        if len(operands) != 1:
+            raise ValueError("Expected the address to listen on")
+
+        server = WorkerServer(operands[0], slots, options.get("--dir"))
+    except (GetoptError, ValueError, OSError) as e:
+        print(f"make.worker: {e}", file=f_err)
+        return 2
+
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    quit(main(sys.argv[1:]))
@@ -0,0 +1,47 @@
+from benchmarks.suite import BENCHMARKS, Comparison, compare, regressions, main, generate_deep_tree
+from io import StringIO
+import json
+import os
+
+
+def result(**mins):
+    return {"results": {name: {"params": {"n": 1}, "min": m} for name, m in mins.items()}}
+
+
+def test_compare_and_regressions():
+    baseline = result(a=1.0, b=2.0, c=1.0)
+    current = result(a=1.1, b=3.0, d=5.0)
+    current["results"]["c"] = {"params": {"n": 2}, "min": 9.0}
+
+    comparisons = compare(baseline, current)
+
+    # c ran with other parameters and d has no baseline, so neither is compared
+    assert comparisons == [Comparison("a", 1.0, 1.1), Comparison("b", 2.0, 3.0)]
+    assert regressions(comparisons, 0.2) == [Comparison("b", 2.0, 3.0)]
+
+
+def test_generate_deep_tree(tmp_path):
+    generate_deep_tree(str(tmp_path), 2, 2, 1)
+
+    dirs = sum(len(d) for _, d, _ in os.walk(tmp_path))
+    files = sum(len(f) for _, _, f in os.walk(tmp_path))
+    assert (dirs, files) == (6, 7)
+
+
+def test_main_against_baseline(tmp_path):
+    out, err = StringIO(), StringIO()
+    names = "find_parse,schedule"
+    assert main(["--quick", "--repeat", "1", "--only", names, "--output", str(tmp_path / "base.json")], out, err) == 0
+
+    data = json.loads((tmp_path / "base.json").read_text())
+    assert set(data["results"]) == {"find_parse", "schedule"}
+
+    # A baseline that took no time makes every benchmark a regression
+    for r in data["results"].values():
+        r["min"] = 0.0
+    (tmp_path / "base.json").write_text(json.dumps(data))
+    assert main(["--quick", "--repeat", "1", "--only", names, "--baseline", str(tmp_path / "base.json")], out, err) == 1
+    assert "REGRESSION" in err.getvalue()
+
+    assert main(["--only", "nope"], out, err) == 2
+    assert {b.name for b in BENCHMARKS} >= {"parse_file", "find_parse", "descend_wide", "descend_deep"}
@@ -0,0 +1,135 @@
+from commands.command import command_map, supports_arguments, CommandParseError
+from commands.pipeline import Pipe, run_pipeline
+from commands.grep import grep
+from io import StringIO
+import threading
+import pytest
+
+
+class TestPipe(object):
+    def test_readline_and_eof(self):
+        pipe = Pipe()
+        pipe.write("a\nb")
+        pipe.write("c\n")
+        pipe.close()
+
+        assert list(pipe) == ["a\n", "bc\n"]
+        assert pipe.readline() == ""
+
+    def test_read(self):
+        pipe = Pipe()
+        pipe.write("hello")
+        pipe.close()
+
+        assert pipe.read(2) == "he"
+        assert pipe.read() == "llo"
+
+    def test_abandoned_pipe_throws_BrokenPipeError(self):
+        pipe = Pipe(maxsize=1)
+        pipe.write("x")
+        pipe.abandon()
+
+        with pytest.raises(BrokenPipeError):
+            pipe.write("y")
+
+
+def test_grep():
+    out = StringIO()
+    assert grep(["-v", "b"], {}, StringIO("a\nb\nc\n"), out) == 0
+    assert out.getvalue() == "a\nc\n"
+
+    assert grep(["-F", "."], {}, StringIO("abc\n"), StringIO()) == 1
+
+    with pytest.raises(CommandParseError):
+        grep([], {}, StringIO(), StringIO())
+
+
+def test_grep_files_and_options(tmp_path):
+    (tmp_path / "a").write_text("one\nTwo\nthree\n")
+    (tmp_path / "b").write_text("four\n")
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+
+    out = StringIO()
+    assert grep(["-n", "t", a], {}, StringIO(), out) == 0
+    assert out.getvalue() == "3:three\n"
+
+    out = StringIO()
+    assert grep(["-i", "-e", "two", "-e", "four", a, b], {}, StringIO(), out) == 0
+    assert out.getvalue() == f"{a}:Two\n{b}:four\n"
+
+    out = StringIO()
+    assert grep(["-c", "o", a, b], {}, StringIO(), out) == 0
+    assert out.getvalue() == f"{a}:2\n{b}:1\n"
+
+    out = StringIO()
+    assert grep(["-l", "f", a, b], {}, StringIO(), out) == 0
+    assert out.getvalue() == f"{b}\n"
+
+    out = StringIO()
+    assert grep(["-q", "three", a], {}, StringIO(), out) == 0
+    assert grep(["-q", "five", a], {}, StringIO(), out) == 1
+    assert out.getvalue() == ""
+
+    out = StringIO()
+    assert grep(["x", str(tmp_path / "missing")], {}, StringIO(), out) == 2
+    assert "No such file" in out.getvalue()
+
+
+@pytest.mark.parametrize(("args", "expected"), [
+    (["-v", "b"], True),
+    (["-q", "-i", "x", "file"], True),
+    (["a+b"], False),
+    (["-E", "a+b"], True),
+    (["-F", "a+b"], True),
+    (["-r", "x", "."], False),
+    ([], False),
+])
+def test_grep_supports(args, expected):
+    assert supports_arguments("grep", args) is expected
+
+
+def test_pipeline_streams_between_stages():
+    consumed_first = threading.Event()
+
+    def producer(args, env, f_in, f_out):
+        print("first", file=f_out)
+        # Only finishes once the consumer has seen the first line, so the stages must run concurrently
+        assert consumed_first.wait(5)
+        print("second", file=f_out)
+
+    def consumer(args, env, f_in, f_out):
+        for line in f_in:
+            consumed_first.set()
+            f_out.write(line.upper())
+
+    command_map["test-producer"] = producer
+    command_map["test-consumer"] = consumer
+    try:
+        out = StringIO()
+        assert run_pipeline([["test-producer"], ["test-consumer"]], {}, StringIO(), out) == 0
+        assert out.getvalue() == "FIRST\nSECOND\n"
+    finally:
+        del command_map["test-producer"], command_map["test-consumer"]
+
+
+def test_pipeline_early_exit_stops_producer():
+    def endless(args, env, f_in, f_out):
+        while True:
+            print("y", file=f_out)
+
+    def first_line(args, env, f_in, f_out):
+        f_out.write(f_in.readline())
+
+    command_map["test-endless"] = endless
+    command_map["test-first"] = first_line
+    try:
+        out = StringIO()
+        assert run_pipeline([["test-endless"], ["test-first"]], {}, StringIO(), out, maxsize=2) == 0
+        assert out.getvalue() == "y\n"
+    finally:
+        del command_map["test-endless"], command_map["test-first"]
+
+
+def test_pipeline_reraises_errors():
+    with pytest.raises(CommandParseError):
+        run_pipeline([["echo", "a"], ["grep"]], {}, StringIO(), StringIO())
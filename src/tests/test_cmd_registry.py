@@ -0,0 +1,59 @@
+from commands.command import COMMAND_MODULES, command_map, is_command, resolve_command
+from main import main
+from io import StringIO
+import subprocess
+import sys
+import pytest
+
+
+@pytest.mark.parametrize("name", sorted(COMMAND_MODULES))
+def test_modules_register_their_commands(name):
+    assert is_command(name)
+    assert resolve_command(name) is command_map[name]
+
+
+def test_unknown_command_throws_KeyError():
+    assert not is_command("nonexistent")
+
+    with pytest.raises(KeyError):
+        resolve_command("nonexistent")
+
+
+def test_commands_are_imported_lazily():
+    code = ("import main, sys; main.main(['main.py', 'echo', 'hi'], {}); "
+            "print(sorted(m for m in sys.modules if m.startswith(('commands', 'make'))))")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert proc.stdout == "hi\n['commands', 'commands.command', 'commands.echo']\n"
+
+
+@pytest.mark.parametrize(("argv", "expected"), [
+    (["main.py", "echo", "a", "b"], "a b\n"),
+    (["/usr/local/bin/echo", "a"], "a\n"),
+])
+def test_main_dispatch(argv, expected):
+    out = StringIO()
+
+    assert main(argv, {}, StringIO(), out, StringIO()) == 0
+    assert out.getvalue() == expected
+
+
+def test_main_errors():
+    err = StringIO()
+
+    assert main(["main.py"], {}, StringIO(), StringIO(), err) == 2
+    assert main(["main.py", "nonexistent"], {}, StringIO(), StringIO(), err) == 127
+    assert main(["main.py", "find", ".", "-name"], {}, StringIO(), StringIO(), err) == 1
+    assert main(["main.py", "find", "-Q"], {}, StringIO(), StringIO(), err) == 1
+    assert err.getvalue().splitlines()[1:] == ["nonexistent: command not found",
+                                               "find: parse error on -name: Expected 1 value(s)",
+                                               "find: option -Q not recognized"]
+
+
+def test_main_runs_make(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all:\n\t@echo made\n")
+    out = StringIO()
+
+    assert main(["main.py", "make"], {}, StringIO(), out, StringIO()) == 0
+    assert out.getvalue() == "made\n"
@@ -93,4 +93,112 @@ def test_big():
         ])
     ])
 
-    assert find.ASTBinOr.from_tokens(find.tokenize_operands(tinput.split())) == expected
\ No newline at end of file
+    assert find.ASTBinOr.from_tokens(find.tokenize_operands(tinput.split())) == expected
+
+class FakeEntry(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def parse(expression):
+    return find.ASTBinOr.from_tokens(find.tokenize_operands(expression.split()))
+
+
+class TestCompile(object):
+    @pytest.mark.parametrize("expression", [
+        "-name *.py",
+        "-name *.py -name a* -name *b.py",
+        "-name *.c -o -name *.h -o -name *.py",
+        "! -name *.py",
+        "( -name a* -o -name b* ) -a ! -name *.txt",
+    ])
+    @pytest.mark.parametrize("name", ["a.py", "ab.py", "b.txt", "c.h", "x.c", "b.py"])
+    def test_matches_evaluate(self, expression, name):
+        tree = parse(expression)
+        entry = FakeEntry(name)
+
+        assert tree.compile()(entry) == tree.evaluate(entry)
+
+    def test_and_with_three_children(self):
+        tree = parse("-name a* -name *.py -name *z*")
+
+        assert not tree.evaluate(FakeEntry("a.py"))
+        assert not tree.compile()(FakeEntry("a.py"))
+        assert tree.compile()(FakeEntry("az.py"))
+
+    def test_size(self):
+        assert parse("-name a -name b -o ! -name c").size() == 7
+
+    def test_short_circuits_and_orders_by_cost(self, monkeypatch):
+        calls = []
+
+        monkeypatch.setitem(find.PATH_OPERAND_EVALUATORS, "expensive", lambda path: calls.append(path.name) or True)
+        monkeypatch.setitem(find.PATH_OPERAND_COSTS, "expensive", find.COST_STAT)
+        monkeypatch.setitem(find.PATH_OPERAND_ARITY, "expensive", 0)
+
+        predicate = parse("-expensive -name *.py").compile()
+
+        assert not predicate(FakeEntry("a.txt"))
+        assert predicate(FakeEntry("a.py"))
+        assert calls == ["a.py"]
+
+    def test_unknown_operand_throws_CommandParseError(self):
+        with pytest.raises(CommandParseError):
+            parse("-nonexistent").compile()
+
+    @pytest.mark.parametrize("expression", [
+        "-name a.py -o -name b.py -o -name c.h",
+        "-name a.py -o -name *.h -o -name x.[ch] -o ! -name b*",
+        "-name *.c -o -name a.py -o -name b.txt -o -name zz",
+    ])
+    @pytest.mark.parametrize("name", ["a.py", "ab.py", "b.txt", "c.h", "x.c", "b.py", "zz"])
+    def test_name_set_matches_evaluate(self, expression, name):
+        tree = parse(expression)
+        entry = FakeEntry(name)
+
+        assert tree.compile()(entry) == tree.evaluate(entry)
+
+    def test_name_set_replaces_name_tests(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(find, "compile_name_set", lambda patterns: calls.append(patterns) or (lambda path: False))
+
+        parse("-name a -o -name b* -o -type f -o -name c").compile()
+        parse("-name a -o -name b").compile()
+
+        assert calls == [["a", "b*", "c"]]
+
+
+class TestExpressionParser(object):
+    def test_linear_on_large_or(self):
+        n = 20000
+        args = ["-name", "f0"]
+        for i in range(1, n):
+            args += ["-o", "-name", f"f{i}"]
+
+        tree = find.ExpressionParser(find.tokenize_operands(args)).parse()
+
+        assert len(tree.children) == n
+        assert tree.compile()(FakeEntry(f"f{n - 1}"))
+        assert not tree.compile()(FakeEntry("g"))
+
+    def test_does_not_consume_input(self):
+        args = "-name a -o -name b".split()
+        find.tokenize_operands(args)
+
+        assert args == "-name a -o -name b".split()
+
+    @pytest.mark.parametrize(("expression", "position", "token"), [
+        ("-name a )", 2, ")"),
+        ("-name a -o", 3, "end of expression"),
+        ("-name a -a -o -name b", 3, "-o"),
+        ("( -name a -o ( -name b )", 0, "("),
+        ("! ) -name a", 1, ")"),
+        ("a -name b", 0, "a"),
+    ])
+    def test_error_positions(self, expression, position, token):
+        with pytest.raises(CommandParseError) as e:
+            find.ExpressionParser(find.tokenize_operands(expression.split())).parse()
+
+        assert e.value.position == position
+        assert e.value.expression == token
+        assert f"at argument {position}" in str(e.value)
@@ -0,0 +1,198 @@
+from commands.find import descend, parallel_descend, find, expr_from_tokens, tokenize_operands, ASTBinOr
+from commands.walk import Entry, walk, parallel_walk
+from commands.command import CommandParseError
+from io import StringIO
+from pathlib import Path
+import pytest
+import os
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for p in ["a.py", "b.txt", "sub/c.py", "sub/deeper/d.py", "other/e.txt"]:
+        f = tmp_path / p
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text("")
+
+    return tmp_path
+
+
+def names(paths):
+    return sorted(p.name for p in paths)
+
+
+def test_descend_matches(tree):
+    expr = expr_from_tokens(tokenize_operands(["-name", "*.py"]))
+
+    assert names(descend(tree, expr)) == ["a.py", "c.py", "d.py"]
+
+
+def test_descend_without_tree_yields_all_files(tree):
+    assert names(descend([tree / "sub", tree / "other"], None)) == ["c.py", "d.py", "e.txt"]
+
+
+def test_descend_is_lazy(tree):
+    walk = descend(tree, None)
+
+    assert isinstance(next(walk), Entry)
+
+
+def test_walk_preorder(tree):
+    entries = [(e.name, e.depth) for e in walk([tree / "sub"])]
+
+    assert entries[0] == ("sub", 0)
+    assert sorted(entries) == [("c.py", 1), ("d.py", 2), ("deeper", 1), ("sub", 0)]
+    assert entries.index(("deeper", 1)) + 1 == entries.index(("d.py", 2))
+
+
+def test_walk_does_not_follow_symlinks(tree):
+    (tree / "link").symlink_to(tree / "sub")
+
+    assert "link" in [e.name for e in walk([tree])]
+    assert names(e for e in walk([tree]) if e.name == "c.py") == ["c.py"]
+    assert names(e for e in walk([tree], follow_symlinks=True) if e.name == "c.py") == ["c.py", "c.py"]
+
+
+def test_entry_caches_stat(tree, monkeypatch):
+    entry = next(e for e in walk([tree]) if e.name == "a.py")
+    calls = []
+    fetch = Entry._fetch
+
+    def counting_fetch(self, follow_symlinks):
+        calls.append(follow_symlinks)
+        return fetch(self, follow_symlinks)
+
+    monkeypatch.setattr(Entry, "_fetch", counting_fetch)
+
+    assert entry.lstat().st_size == 0
+    assert entry.stat() is entry.lstat()
+    assert not entry.is_dir() and not entry.is_symlink()
+    assert calls == [False]
+
+
+def test_name_only_walk_makes_no_stat_calls(tree, monkeypatch):
+    def no_fetch(self, follow_symlinks):
+        raise AssertionError("stat called")
+
+    expr = expr_from_tokens(tokenize_operands(["-name", "*.py"]))
+    monkeypatch.setattr(Entry, "_fetch", lambda self, f: no_fetch(self, f) if self.depth else os.stat(self.path))
+
+    assert names(descend(tree, expr)) == ["a.py", "c.py", "d.py"]
+
+
+def test_find(tree):
+    out = StringIO()
+
+    assert find([str(tree / "sub"), "-name", "*.py"], {}, StringIO(), out) == 0
+    assert sorted(out.getvalue().splitlines()) == [str(tree / "sub" / "c.py"), str(tree / "sub" / "deeper" / "d.py")]
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 8])
+def test_parallel_descend(tree, jobs):
+    expr = expr_from_tokens(tokenize_operands(["-name", "*.py"]))
+
+    assert names(parallel_descend(tree, expr, jobs)) == ["a.py", "c.py", "d.py"]
+
+
+def test_parallel_descend_ordered(tree):
+    paths = [e.path for e in parallel_descend([tree, tree / "b.txt"], None, 4, ordered=True)]
+
+    assert paths == [str(tree / p) for p in ["a.py", "b.txt", "other/e.txt", "sub/c.py", "sub/deeper/d.py", "b.txt"]]
+
+
+def test_parallel_walk_evaluates_on_workers(tree):
+    import threading
+    threads = set()
+
+    def predicate(entry):
+        threads.add(threading.current_thread().name)
+        return True
+
+    assert len(list(parallel_walk([tree], predicate, 2))) == 5
+    assert all(name.startswith("walk-") for name in threads)
+
+
+def test_parallel_walk_reraises_errors(tree):
+    def predicate(entry):
+        raise RuntimeError("boom")
+
+    for ordered in (False, True):
+        with pytest.raises(RuntimeError):
+            list(parallel_walk([tree], predicate, 2, ordered=ordered))
+
+
+def test_parallel_walk_can_stop_early(tree):
+    walk = parallel_walk([tree], lambda e: True, 4)
+    next(walk)
+    walk.close()
+
+
+def test_find_parallel(tree):
+    out = StringIO()
+
+    assert find(["-s", "-J", "3", str(tree / "sub"), "-name", "*.py"], {}, StringIO(), out) == 0
+    assert out.getvalue().splitlines() == [str(tree / "sub" / "c.py"), str(tree / "sub" / "deeper" / "d.py")]
+
+    with pytest.raises(CommandParseError):
+        find(["-J", "x", str(tree), "-name", "*"], {}, StringIO(), StringIO())
+
+
+@pytest.fixture
+def repo(tmp_path):
+    for p in ["main.py", ".git/objects/x.py", "node_modules/pkg/index.py", "src/lib.py", "src/deep/er/mod.py"]:
+        f = tmp_path / p
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text("")
+
+    return tmp_path
+
+
+def search(root, expression, jobs):
+    tree = ASTBinOr.from_tokens(tokenize_operands(expression.split()))
+    if jobs == 1:
+        return names(descend(root, tree))
+
+    return names(parallel_descend(root, tree, jobs))
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+@pytest.mark.parametrize(("expression", "expected"), [
+    ("( -name .git -o -name node_modules ) -prune -o -name *.py", ["lib.py", "main.py", "mod.py"]),
+    ("-name src -prune -o -name *.py", ["index.py", "main.py", "x.py"]),
+    ("-maxdepth 2 -name *.py", ["lib.py", "main.py"]),
+    ("-maxdepth 0 -name *.py", []),
+    ("-mindepth 3 -name *.py", ["index.py", "mod.py", "x.py"]),
+    ("-mindepth 2 -maxdepth 2", ["lib.py"]),
+])
+def test_pruning(repo, jobs, expression, expected):
+    assert search(repo, expression, jobs) == expected
+
+
+def test_pruned_directories_are_not_listed(repo, monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        listed.append(os.path.basename(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    search(repo, "-name .git -prune -o -maxdepth 2 -name *.py", 1)
+
+    assert ".git" not in listed and "pkg" not in listed and "deep" not in listed
+
+
+@pytest.mark.parametrize("expression", ["-maxdepth", "-maxdepth x", "-mindepth -1", "-maxdepth 1 2"])
+def test_invalid_depth_throws_CommandParseError(repo, expression):
+    with pytest.raises(CommandParseError):
+        search(repo, expression, 1)
+
+
+def test_find_full_expression(tree):
+    out = StringIO()
+
+    assert find([str(tree), "-name", "*.txt", "-o", "-name", "c.py"], {}, StringIO(), out) == 0
+    assert names(map(Path, out.getvalue().splitlines())) == ["b.txt", "c.py", "e.txt"]
+
+    with pytest.raises(CommandParseError):
+        find([str(tree), "-name", "a", ")"], {}, StringIO(), StringIO())
@@ -0,0 +1,125 @@
+from commands.command import CommandParseError
+from commands.walk import Entry
+import commands.find as find
+from io import StringIO
+import time
+import os
+import pytest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "small").write_bytes(b"x" * 10)
+    (tmp_path / "big").write_bytes(b"x" * 5000)
+    (tmp_path / "old").write_bytes(b"")
+    (tmp_path / "link").symlink_to(tmp_path / "dir")
+    (tmp_path / "dangling").symlink_to(tmp_path / "missing")
+
+    old = time.time() - 10 * find.SECONDS_PER_DAY
+    os.utime(tmp_path / "old", (old, old))
+
+    return tmp_path
+
+
+def run_find(*args):
+    out = StringIO()
+    assert find.find(list(map(str, args)), {}, StringIO(), out) == 0
+
+    return sorted(os.path.basename(line) for line in out.getvalue().splitlines())
+
+
+@pytest.mark.parametrize(("expression", "expected"), [
+    ("-type f", ["big", "old", "small"]),
+    ("-type l", ["dangling", "link"]),
+    ("-size +1", ["big"]),
+    ("-size -2", ["dangling", "link", "old", "small"]),
+    ("-size 10c", ["small"]),
+    ("-size +4k", ["big"]),
+    ("-mtime +7", ["old"]),
+    ("-mtime -1 -type f", ["big", "small"]),
+    ("! -mtime 0", ["old"]),
+])
+def test_primaries(tree, expression, expected):
+    assert run_find(tree, *expression.split()) == expected
+
+
+@pytest.mark.parametrize("options", [[], ["-L"], ["-J", "2"], ["-s"], ["-L", "-J", "2"]])
+def test_type_d(tree, options):
+    (tree / "dir" / "sub").mkdir()
+    # With -L, link is a directory too. Only the sequential walk lists it again, since the parallel walk lists each
+    # directory once.
+    follow = "-L" in options
+    again = follow and "-J" not in options
+
+    assert run_find(*options, tree, "-mindepth", "1", "-type", "d") == (["dir"] + ["link"] * follow
+                                                                        + ["sub"] * (1 + again))
+    assert run_find(*options, tree, "-type", "d", "-name", "sub") == ["sub"] * (1 + again)
+    assert run_find(*options, tree / "dir", "-type", "d") == ["dir", "sub"]
+
+
+def test_type_d_yields_directories_before_their_contents(tree):
+    out = StringIO()
+    assert find.find(["-s", str(tree / "dir"), "-type", "d", "-o", "-type", "f"], {}, StringIO(), out) == 0
+
+    assert out.getvalue().splitlines() == [str(tree / "dir"), str(tree / "dir" / "small")]
+
+
+def test_newer(tree):
+    assert run_find(tree, "-type", "f", "-newer", tree / "old") == ["big", "small"]
+
+    with pytest.raises(CommandParseError):
+        run_find(tree, "-newer", tree / "nonexistent")
+
+
+@pytest.mark.parametrize(("expression"), ["-type x", "-size abc", "-mtime +", "-type"])
+def test_invalid_values_throw_CommandParseError(tree, expression):
+    with pytest.raises(CommandParseError):
+        run_find(tree, *expression.split())
+
+
+@pytest.mark.parametrize(("option", "expected"), [
+    ("-P", ["big", "dangling", "link", "old", "small"]),
+    ("-L", ["big", "dangling", "old", "small", "small"]),
+])
+def test_symlink_behavior(tree, option, expected):
+    assert run_find(option, tree) == expected
+
+
+def test_follow_command_line_links_only(tree):
+    assert run_find("-H", tree / "link") == ["small"]
+    assert run_find("-P", tree / "link") == ["link"]
+
+
+def test_follow_symlink_loops_terminate(tree):
+    (tree / "dir" / "loop").symlink_to(tree)
+
+    assert run_find("-L", tree, "-name", "big") == ["big"]
+
+
+def test_determine_behavior():
+    assert find.determine_behavior(["v", "H", "L"]) is find.SymlinkBehavior.ALWAYS_FOLLOW
+    assert find.determine_behavior([]) is find.SymlinkBehavior.NEVER_FOLLOW
+
+
+def test_negative_values_parse_as_values():
+    tokens = find.tokenize_operands("-mtime -7 -size -2".split())
+
+    assert find.ASTBinOr.from_tokens(tokens) == find.ASTBinOr([find.ASTBinAnd([
+        find.ASTPrimary("mtime", ["-7"]), find.ASTPrimary("size", ["-2"])
+    ])])
+
+
+def test_primaries_share_one_stat(tree, monkeypatch):
+    fetched = []
+    fetch = Entry._fetch
+
+    def counting_fetch(self, follow_symlinks):
+        fetched.append(self.name)
+        return fetch(self, follow_symlinks)
+
+    monkeypatch.setattr(Entry, "_fetch", counting_fetch)
+    assert run_find(tree, "-size", "+0", "-mtime", "-1", "-newer", tree / "old") == ["big", "dangling", "link", "small"]
+
+    # Each non-directory entry below the root is stat'ed exactly once
+    assert sorted(n for n in fetched if n != tree.name) == ["big", "dangling", "link", "old", "small"]
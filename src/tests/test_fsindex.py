@@ -0,0 +1,127 @@
+from commands.fsindex import FSIndex, FileRecord
+from commands.find import descend, ASTBinOr, tokenize_operands
+from make.graph import BuildGraph
+from make.parser import Rule
+import time
+import os
+import pytest
+
+
+def age(path, seconds=60):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.c").write_text("a")
+    (tmp_path / "src" / "b.h").write_text("bb")
+    age(tmp_path / "src")
+    age(tmp_path)
+
+    return tmp_path
+
+
+def test_listing_is_reused_until_directory_changes(tree):
+    db = str(tree / "index.db")
+    with FSIndex(db) as index:
+        assert sorted(index.listing(str(tree / "src"))) == ["a.c", "b.h"]
+        assert (index.hits, index.misses) == (0, 1)
+
+    with FSIndex(db) as index:
+        assert sorted(index.listing(str(tree / "src"))) == ["a.c", "b.h"]
+        assert (index.hits, index.misses) == (1, 0)
+
+    (tree / "src" / "c.c").write_text("")
+    age(tree / "src", 30)
+
+    with FSIndex(db) as index:
+        assert sorted(index.listing(str(tree / "src"))) == ["a.c", "b.h", "c.c"]
+        assert index.misses == 1
+
+
+def test_recently_modified_directories_are_not_reused(tree):
+    db = str(tree / "index.db")
+    (tree / "src" / "new.c").write_text("")
+
+    with FSIndex(db) as index:
+        index.listing(str(tree / "src"))
+
+    with FSIndex(db) as index:
+        index.listing(str(tree / "src"))
+        assert index.misses == 1
+
+
+def test_record_round_trip(tree):
+    st = os.lstat(tree / "src" / "b.h")
+    record = FileRecord.from_stat(st)
+
+    assert record.to_stat().st_size == 2
+    assert record.to_stat().st_mtime_ns == st.st_mtime_ns
+
+
+def test_find_with_index_skips_unchanged_directories(tree, monkeypatch):
+    db = str(tree / "index.db")
+    expr = ASTBinOr.from_tokens(tokenize_operands(["-name", "*.c"]))
+
+    with FSIndex(db) as index:
+        assert [e.name for e in descend(tree / "src", expr, index=index)] == ["a.c"]
+
+    def no_scandir(path):
+        raise AssertionError(f"listed {path}")
+
+    monkeypatch.setattr(os, "scandir", no_scandir)
+    with FSIndex(db) as index:
+        assert [e.name for e in descend(tree / "src", expr, index=index)] == ["a.c"]
+
+
+def test_stat(tree):
+    with FSIndex(str(tree / "index.db"), trust_files=True) as index:
+        assert index.stat(str(tree / "src" / "b.h")).st_size == 2
+        assert index.stat(str(tree / "src" / "missing")) is None
+        assert index.stat(str(tree / "nowhere" / "missing")) is None
+
+
+def test_out_of_date_with_index(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    graph = BuildGraph([Rule(["src/a.o"], ["src/a.c"], ["cc"])])
+
+    with FSIndex(str(tree / "index.db"), trust_files=True) as index:
+        assert graph.out_of_date(index=index) == ["src/a.o"]
+
+
+def test_missing_files_are_answered_from_the_listing(tree, monkeypatch):
+    with FSIndex(str(tree / "index.db")) as index:
+        index.listing(str(tree / "src"))
+
+        def no_stat(path, *args, **kwargs):
+            raise AssertionError(f"statted {path}")
+
+        monkeypatch.setattr(os, "stat", no_stat)
+        assert index.stat(str(tree / "src" / "missing")) is None
+
+        monkeypatch.undo()
+        # Existing files are still statted, since their metadata can change without touching the directory
+        (tree / "src" / "b.h").write_text("bbb")
+        assert index.stat(str(tree / "src" / "b.h")).st_size == 3
+
+
+def test_listing_only_stats_entries_of_unknown_type(tree):
+    (tree / "src" / "sub").mkdir()
+    os.symlink("a.c", tree / "src" / "link")
+    age(tree / "src")
+
+    db = str(tree / "index.db")
+    with FSIndex(db) as index:
+        listing = index.listing(str(tree / "src"))
+
+        # The types come from the directory entries, so no record has the metadata of a stat
+        assert [listing[n].complete for n in sorted(listing)] == [False] * 4
+        entry = next(e for e in index.scandir(str(tree / "src")) if e.name == "b.h")
+        assert entry.is_file() and entry.stat().st_size == 2
+
+    # A listing without file metadata is read again in full when the files are trusted
+    with FSIndex(db, trust_files=True) as index:
+        assert index.stat(str(tree / "src" / "b.h")).st_size == 2
+        assert index.misses == 1
@@ -0,0 +1,105 @@
+from make.cache import BuildCache, FileHasher, referenced_macros
+from make.parser import Rule
+from io import StringIO
+import hashlib
+import os
+import pytest
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = BuildCache(str(tmp_path / "cache"))
+    yield c
+    c.close()
+
+
+def test_referenced_macros():
+    macros = {"CFLAGS": "$(OPT) -Wall", "OPT": "-O2", "UNUSED": "x"}
+
+    assert referenced_macros(["cc $(CFLAGS) ${LIBS} -c $<"], macros) == {"CFLAGS", "OPT", "LIBS"}
+
+
+def test_file_hasher_memoizes(tmp_path, monkeypatch):
+    f = tmp_path / "input"
+    f.write_bytes(b"x" * 3_000_000)
+    hasher = FileHasher(str(tmp_path / "hashes.sqlite3"))
+
+    assert hasher.hash(str(f)) == hashlib.sha256(b"x" * 3_000_000).hexdigest()
+
+    monkeypatch.setattr("builtins.open", lambda *a, **k: pytest.fail("file was read again"))
+    assert hasher.hash(str(f)) == hashlib.sha256(b"x" * 3_000_000).hexdigest()
+    assert hasher.hash(str(tmp_path)) is None
+    assert hasher.hash(str(tmp_path / "missing")) is None
+
+
+def test_key_depends_on_inputs(cache, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.c").write_text("int a;")
+    rule = Rule(["a.o"], ["a.c"], ["cc $(CFLAGS) -c a.c"])
+    key = cache.key(rule, {"CFLAGS": "-O2", "OTHER": "1"})
+
+    assert cache.key(rule, {"CFLAGS": "-O2", "OTHER": "2"}) == key
+    assert cache.key(rule, {"CFLAGS": "-O0"}) != key
+    assert cache.key(rule._replace(recipe=["cc -c a.c"]), {"CFLAGS": "-O2"}) != key
+    assert cache.key(rule, {"CFLAGS": "-O2"}, ["b.o"]) != key
+
+    # Touching a file does not change the key, editing it does
+    os.utime("a.c", (1, 1))
+    assert cache.key(rule, {"CFLAGS": "-O2"}) == key
+    (tmp_path / "a.c").write_text("int b;")
+    assert cache.key(rule, {"CFLAGS": "-O2"}) != key
+
+
+@pytest.mark.parametrize("hardlink", [False, True])
+def test_store_and_restore(tmp_path, monkeypatch, hardlink):
+    monkeypatch.chdir(tmp_path)
+    cache = BuildCache(str(tmp_path / "cache"), hardlink=hardlink)
+
+    assert not cache.restore("k", ["out/a.o"])
+
+    os.mkdir("out")
+    (tmp_path / "out" / "a.o").write_text("object")
+    assert cache.store("k", ["out/a.o"])
+    assert not cache.store("k2", ["missing"])
+
+    os.unlink("out/a.o")
+    assert cache.restore("k", ["out/a.o"])
+    assert (tmp_path / "out" / "a.o").read_text() == "object"
+    assert not cache.restore("k", ["other"])
+    cache.close()
+
+
+def test_make_restores_from_cache(tmp_path, monkeypatch):
+    from make.cli import make
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("MSG = hello\nout: in\n\techo $(MSG) > $@\n")
+    (tmp_path / "in").write_text("")
+    env = {"PATH": "/bin:/usr/bin"}
+
+    assert make(["--cache", "cache"], env, StringIO(), StringIO()) == 0
+    os.unlink("out")
+
+    out = StringIO()
+    assert make(["--cache", "cache"], env, out, StringIO()) == 0
+    assert "restored from cache" in out.getvalue()
+    assert (tmp_path / "out").read_text() == "hello\n"
+
+
+def test_make_restores_every_target_of_a_rule(tmp_path, monkeypatch):
+    from make.cli import make
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("a.o a.d: a.c\n\techo object > a.o; echo 'a.o: a.c' > a.d\n")
+    (tmp_path / "a.c").write_text("")
+    env = {"PATH": "/bin:/usr/bin"}
+
+    assert make(["--cache", "cache", "a.o"], env, StringIO(), StringIO()) == 0
+    os.unlink("a.o")
+    os.unlink("a.d")
+
+    out = StringIO()
+    assert make(["--cache", "cache", "--cache-hardlink", "a.o"], env, out, StringIO()) == 0
+    assert "restored from cache" in out.getvalue()
+    assert (tmp_path / "a.d").read_text() == "a.o: a.c\n"
+    assert os.stat("a.o").st_nlink == 2
@@ -0,0 +1,86 @@
+from make.compact import CompactRules, NameTable, RuleView, parse_path_compact
+from make.parser import Rule, Macro
+from make.graph import BuildGraph
+import pickle
+import pytest
+
+ENTRIES = [
+    Macro("CC", "=", "cc"),
+    Rule(["a.o"], ["a.c", "common.h"], ["$(CC) -c a.c"]),
+    Rule(["b.o", "b.d"], ["b.c", "common.h"], []),
+    Macro("X", ":=", "1"),
+    Rule(["all"], [], ["echo done"]),
+]
+
+
+def test_name_table():
+    names = NameTable()
+
+    assert names.intern("a") == 0
+    assert names.intern("b") == 1
+    assert names.intern("a") == 0
+    assert names.id("b") == 1 and "b" in names and len(names) == 2
+
+    with pytest.raises(KeyError):
+        names.id("c")
+
+
+def test_round_trip():
+    store = CompactRules(ENTRIES)
+
+    assert len(store) == 5
+    assert list(store) == ENTRIES
+    assert store[2] == Rule(["b.o", "b.d"], ["b.c", "common.h"], [])
+    assert store[3] == Macro("X", ":=", "1")
+    assert [r.to_rule() for r in store.rules()] == [e for e in ENTRIES if isinstance(e, Rule)]
+    assert store.macros() == [ENTRIES[0], ENTRIES[3]]
+
+
+def test_names_are_shared():
+    store = CompactRules(ENTRIES)
+    common = store.names.id("common.h")
+
+    assert list(store.component_ids(0))[1] == common == list(store.component_ids(1))[1]
+    assert len(store.names) == 7
+
+
+def test_rule_view_api():
+    view = CompactRules(ENTRIES).rule(0)
+    targets, components, recipe = view
+
+    assert isinstance(view, RuleView)
+    assert targets == view.targets == view[0] == ["a.o"]
+    assert view._replace(recipe=[]) == Rule(["a.o"], ["a.c", "common.h"], [])
+
+
+def test_rule_view_builds_its_lists_once():
+    view = CompactRules(ENTRIES).rule(1)
+
+    assert view.components is view.components == ["b.c", "common.h"]
+    assert view.targets is view.targets == ["b.o", "b.d"]
+
+
+def test_pickle():
+    store = CompactRules(ENTRIES)
+
+    assert list(pickle.loads(pickle.dumps(store))) == ENTRIES
+
+
+def test_graph_from_compact_store(tmp_path):
+    path = tmp_path / "Makefile"
+    path.write_text("OBJ = a.o\nall: $(OBJ)\n\tlink\na.o: a.c\n\tcc\n")
+
+    graph = BuildGraph(parse_path_compact(str(path)))
+
+    assert graph.prerequisites("all") == ["a.o"]
+    assert graph.rules["a.o"].recipe == ["cc"]
+
+
+def test_graph_keeps_views_of_unexpanded_rules(tmp_path):
+    path = tmp_path / "Makefile"
+    path.write_text("OBJ = a.o\nall: $(OBJ)\n\tlink\na.o: a.c\n\tcc\n")
+
+    graph = BuildGraph(parse_path_compact(str(path)))
+
+    assert type(graph.rules["a.o"]) is RuleView
+    assert type(graph.rules["all"]) is Rule
@@ -0,0 +1,191 @@
+from make.parser import Rule, Macro, Include, parse_file, parse_dependency_line, join_continuations
+from make import parser
+from make.depfile import DepfileLoader, Depfile, parse_depfile, read_depfile
+from make.graph import BuildGraph
+from make.cli import make
+from io import StringIO
+from make import depfile
+import os
+import pytest
+
+DEPFILE = "obj/a.o: src/a.c include/a.h \\\n  include/my\\ header.h \\\n  include/b\\#2.h lib/$$x.h\n\ninclude/a.h:\n"
+
+
+def test_parse_dependency_line_keeps_later_colons():
+    assert parse_dependency_line("a.o: C:/src/a.c b:c") == (["a.o"], ["C:/src/a.c", "b:c"])
+    assert parse_dependency_line("C:\\obj\\a.o: a.c") == (["C:\\obj\\a.o"], ["a.c"])
+    assert parse_dependency_line("a\\:b: c") == (["a\\:b"], ["c"])
+
+
+def test_drive_letters_with_slashes_are_only_paths_on_windows(monkeypatch):
+    monkeypatch.setattr(parser, "DRIVE_SEPARATORS", "\\")
+    assert parse_dependency_line("x:/usr/lib/foo") == (["x"], ["/usr/lib/foo"])
+
+    monkeypatch.setattr(parser, "DRIVE_SEPARATORS", "/\\")
+    assert parse_dependency_line("C:/obj/a.o: a.c") == (["C:/obj/a.o"], ["a.c"])
+
+
+def test_double_colon_rules_are_rejected():
+    with pytest.raises(ValueError, match="Double-colon"):
+        parse_dependency_line("a:: b")
+
+    with pytest.raises(ValueError, match="Double-colon"):
+        parse_file("a:: b\n\techo a\n")
+
+
+def test_join_continuations():
+    assert list(join_continuations(["a \\", "b \\", "c", "d"])) == ["a  b  c", "d"]
+    assert list(join_continuations(["a \\"])) == ["a "]
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("include a.d b.d", Include(["a.d", "b.d"], False)),
+    ("-include $(DEPS)", Include(["$(DEPS)"], True)),
+    ("sinclude *.d", Include(["*.d"], True)),
+    ("include = x", Macro("include", "=", "x")),
+    ("include: x", Rule(["include"], ["x"], [])),
+    ("include += x", Macro("include", "+=", "x")),
+    ("-include $(SRCS:.c=.d)", Include(["$(SRCS:.c=.d)"], True)),
+])
+def test_parse_include(line, expected):
+    assert parse_file(line) == [expected]
+
+
+def test_parse_depfile():
+    assert parse_depfile(DEPFILE) == [
+        Rule(["obj/a.o"], ["src/a.c", "include/a.h", "include/my header.h", "include/b#2.h", "lib/$x.h"], []),
+        Rule(["include/a.h"], [], []),
+    ]
+
+
+def test_parse_depfile_escaped_colon_and_drive_letters(monkeypatch):
+    monkeypatch.setattr(parser, "DRIVE_SEPARATORS", "/\\")
+    assert parse_depfile("C:/obj/a\\:b.o: C:\\src\\a.c\n") == [Rule(["C:/obj/a:b.o"], ["C:\\src\\a.c"], [])]
+
+
+@pytest.mark.parametrize("text", ["a: b\n\techo a\n", "CC = cc\n", "a: $(B)\n", "a: b: c\n", "a:: b\n", "a b\n"])
+def test_parse_depfile_rejects_makefiles(text):
+    assert parse_depfile(text) is None
+
+
+def test_read_depfile_falls_back_to_makefile(tmp_path):
+    path = tmp_path / "extra.mk"
+    path.write_text("X = 1\nb: \\\n  c\n\techo b\n")
+
+    assert read_depfile(str(path)) == Depfile(str(path), [], [Macro("X", "=", "1"), Rule(["b"], ["c"], ["echo b"])])
+
+
+def write_depfiles(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"f{i}.d"
+        path.write_text(f"f{i}.o: f{i}.c common.h \\\n  other.h\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_loader_caches_by_mtime_and_size(tmp_path):
+    paths = write_depfiles(tmp_path, 3)
+    loader = DepfileLoader()
+
+    first = loader.load(paths)
+    assert (loader.hits, loader.misses) == (0, 3)
+
+    assert loader.load(paths) == first
+    assert (loader.hits, loader.misses) == (3, 3)
+
+    with open(paths[1], "a") as f:
+        f.write("f1.o: extra.h\n")
+    assert loader.load(paths)[1].rules[1] == Rule(["f1.o"], ["extra.h"], [])
+    assert (loader.hits, loader.misses) == (5, 4)
+
+
+def test_loader_interns_names(tmp_path):
+    loader = DepfileLoader()
+    a, b = loader.load(write_depfiles(tmp_path, 2))
+
+    assert a.rules[0].components[1] is b.rules[0].components[1]
+    assert len(loader.names) == 6
+
+
+def test_loader_missing_files(tmp_path):
+    loader = DepfileLoader()
+
+    assert loader.load([str(tmp_path / "missing.d")], optional=True) == []
+    with pytest.raises(FileNotFoundError):
+        loader.load([str(tmp_path / "missing.d")])
+
+
+def test_loader_cache_file(tmp_path):
+    paths = write_depfiles(tmp_path, 3)
+    cache_file = str(tmp_path / "depfiles.cache")
+
+    loader = DepfileLoader(cache_file)
+    expected = loader.load(paths)
+    assert loader.save()
+
+    reloaded = DepfileLoader(cache_file)
+    assert reloaded.load(paths) == expected
+    assert (reloaded.hits, reloaded.misses) == (3, 0)
+    assert reloaded.load(paths)[0].rules[0].components[1] is reloaded.load(paths)[2].rules[0].components[1]
+
+
+def test_loader_process_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(depfile, "POOL_THRESHOLD", 2)
+    paths = write_depfiles(tmp_path, 4)
+
+    pooled = DepfileLoader(processes=2).load(paths)
+
+    assert pooled == DepfileLoader().load(paths)
+    assert pooled[0].rules[0].components[1] is pooled[3].rules[0].components[1]
+
+
+def test_graph_includes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_depfiles(tmp_path, 2)
+    (tmp_path / "extra.mk").write_text("Y = $(X)\nf0.o: $(Y).h\n")
+    entries = parse_file("X = gen\nall: f0.o f1.o\nf0.o:\n\tcc -c f0.c\n-include *.d missing.d\ninclude extra.mk\n")
+
+    graph = BuildGraph(entries, {})
+
+    assert graph.default_goal == "all"
+    assert graph.rules["f0.o"].components == ["f0.c", "common.h", "other.h", "gen.h"]
+    assert graph.rules["f0.o"].recipe == ["cc -c f0.c"]
+    assert graph.rules["f1.o"].components == ["f1.c", "common.h", "other.h"]
+
+
+def test_graph_include_substitution_reference(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.d").write_text("a.o: a.c a.h\n")
+
+    graph = BuildGraph(parse_file("SRCS = a.c b.c\n-include $(SRCS:.c=.d)\n"), {})
+
+    assert graph.rules["a.o"].components == ["a.c", "a.h"]
+    assert graph.includes == ["a.d", "b.d"]
+
+
+def test_graph_include_missing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(FileNotFoundError):
+        BuildGraph(parse_file("include missing.d\n"), {})
+
+
+def test_make_rebuilds_on_header_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("a.o: a.c\n\t@echo compiled > a.o\n-include a.d\n")
+    (tmp_path / "a.d").write_text("a.o: a.c \\\n  a.h\n")
+    for name in ("a.c", "a.h", "a.o"):
+        (tmp_path / name).write_text("")
+    os.utime("a.c", (1, 1))
+    os.utime("a.o", (2, 2))
+    os.utime("a.h", (3, 3))
+    args = ["--depfile-cache", "deps.cache"]
+
+    assert make(args, {}, StringIO(), StringIO()) == 0
+    assert (tmp_path / "a.o").read_text() == "compiled\n"
+    assert (tmp_path / "deps.cache").exists()
+
+    f_out = StringIO()
+    assert make(args, {}, f_out, StringIO()) == 0
+    assert "up to date" in f_out.getvalue()
@@ -0,0 +1,129 @@
+from make.executor import parse_recipe_prefix, split_builtin, run_builtin, run_recipe, builtin_counter
+from make.aio import run_recipe_async
+from make.cli import make
+from io import StringIO
+import asyncio
+import pytest
+
+
+@pytest.mark.parametrize(("line", "expected"), [
+    ("cc -c a.c", (False, False, "cc -c a.c")),
+    ("@echo hi", (True, False, "echo hi")),
+    ("-rm x", (False, True, "rm x")),
+    ("@- rm x", (True, True, "rm x")),
+])
+def test_parse_recipe_prefix(line, expected):
+    assert parse_recipe_prefix(line) == expected
+
+
+@pytest.mark.parametrize(("line", "expected"), [
+    ("echo hello world", [["echo", "hello", "world"]]),
+    ("echo 'a | b' \"c d\"", [["echo", "a | b", "c d"]]),
+    ("find . -name '*.py'", [["find", ".", "-name", "*.py"]]),
+    ("find . -name '*.py' | grep -v test", [["find", ".", "-name", "*.py"], ["grep", "-v", "test"]]),
+    ("echo a | cat", None),
+    ("echo a || echo b", None),
+    ("echo a |", None),
+    ("echo a > out", None),
+    ("echo $HOME", None),
+    ("echo \"$HOME\"", None),
+    ("echo *.c", None),
+    ("echo a; rm b", None),
+    ("cc -c a.c", None),
+    ("echo 'unterminated", None),
+    # Arguments that the built-in does not handle like the program
+    ("echo -n hi", None),
+    ("echo 'a\\tb'", None),
+    ("find . -name x -print", None),
+    ("find . -delete", None),
+    ("find -Q x", None),
+    ("find -name x", None),
+    ("echo a | find . -exec rm {} +", None),
+])
+def test_split_builtin(line, expected):
+    assert split_builtin(line) == expected
+
+
+def test_builtins_run_in_process(monkeypatch):
+    def no_shell(*args, **kwargs):
+        raise AssertionError("spawned a process")
+
+    monkeypatch.setattr("subprocess.run", no_shell)
+    builtin_counter.reset()
+
+    out = StringIO()
+    assert run_recipe(["@echo one", "echo two"], {}, out) == 0
+
+    assert out.getvalue() == "one\necho two\ntwo\n"
+    assert builtin_counter.snapshot()["echo"].calls == 2
+    assert builtin_counter.forks_saved == 2
+
+
+def test_shell_fallback():
+    out = StringIO()
+    assert run_recipe(["@echo a | tr a b", "@exit 3", "@echo unreachable"], {"PATH": "/bin:/usr/bin"}, out) == 3
+
+    assert out.getvalue() == "b\n"
+
+
+def test_ignore_errors():
+    out = StringIO()
+    assert run_recipe(["@-exit 1", "@echo after"], {"PATH": "/bin:/usr/bin"}, out) == 0
+
+    assert out.getvalue() == "after\n"
+
+
+def test_builtin_pipeline():
+    out = StringIO()
+    assert run_recipe(["@echo foo bar | grep -F foo", "@echo baz | grep foo"], {}, out) == 1
+
+    assert out.getvalue() == "foo bar\n"
+
+
+def test_builtin_errors_fail_the_recipe():
+    out = StringIO()
+    assert run_builtin([["find", "-Q", "x"]], {}, out) == 1
+
+    assert out.getvalue().startswith("find: ")
+
+
+def test_grep_files_in_recipes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "all").write_text("linking\n")
+    out = StringIO()
+
+    assert run_recipe(["@grep linking all", "@grep -q linking all", "@grep -c 'link(ing)' all"],
+                      {"PATH": "/bin:/usr/bin"}, out) == 1
+    assert out.getvalue() == "linking\n0\n"
+
+
+def test_unsupported_arguments_run_in_the_shell(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "x").write_text("")
+    out = StringIO()
+
+    assert run_recipe(["@echo -n hi", "@find . -name x -print", "@find . -name x -delete"], {"PATH": "/bin:/usr/bin"},
+                      out) == 0
+    assert out.getvalue() == "hi./x\n"
+    assert not (tmp_path / "x").exists()
+
+
+def test_run_recipe_async():
+    out = StringIO()
+    recipe = ["@echo a | tr a b", "@echo err >&2", "@-exit 1", "echo builtin", "@exit 3", "@echo unreachable"]
+    assert asyncio.run(run_recipe_async(recipe, {"PATH": "/bin:/usr/bin"}, out)) == 3
+
+    assert out.getvalue() == "b\nerr\necho builtin\nbuiltin\n"
+
+
+def test_builds_count_builtins_separately(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all:\n\t@echo one\n\t@echo two\n")
+    builtin_counter.reset()
+
+    for _ in range(2):
+        err = StringIO()
+        assert make(["--report"], {}, StringIO(), err) == 0
+        assert "Built-in commands saved 2 forks" in err.getvalue()
+
+    assert builtin_counter.forks_saved == 0
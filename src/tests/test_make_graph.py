@@ -0,0 +1,84 @@
+from make.graph import BuildGraph, CycleError
+from make.parser import Rule, parse_file
+import pytest
+
+
+def make_graph(*rules):
+    return BuildGraph([Rule(t.split(), c.split(), ["recipe"]) for t, c in rules])
+
+
+class TestIndex(object):
+    def test_lookup(self):
+        graph = BuildGraph(parse_file("CC = cc\na b: c\n\tx\nc:\n\ty\n"))
+
+        assert "a" in graph and "b" in graph and "c" in graph
+        assert graph.prerequisites("a") == ["c"]
+        assert graph.prerequisites("missing") == []
+        assert graph.default_goal == "a"
+
+    def test_merge_rules(self):
+        graph = BuildGraph([Rule(["a"], ["b"], []), Rule(["a"], ["c", "b"], ["cmd"])])
+
+        assert graph.rules["a"] == Rule(["a"], ["b", "c"], ["cmd"])
+        assert graph.prerequisites("a") == ["b", "c"]
+
+    def test_phony(self):
+        graph = BuildGraph(parse_file(".PHONY: all\nall: x\n"))
+
+        assert graph.phony == {"all"}
+        assert graph.default_goal == "all"
+
+
+class TestCycles(object):
+    def test_no_cycles(self):
+        assert make_graph(("a", "b c"), ("b", "c"), ("c", "")).find_cycles() == []
+
+    def test_cycles(self):
+        graph = make_graph(("a", "b"), ("b", "c"), ("c", "a"), ("d", "d"), ("e", "a"))
+        cycles = sorted(sorted(c) for c in graph.find_cycles())
+
+        assert cycles == [["a", "b", "c"], ["d"]]
+
+    def test_topological_order_throws_CycleError(self):
+        with pytest.raises(CycleError) as e:
+            make_graph(("a", "b"), ("b", "a")).topological_order(["a"])
+
+        assert e.value.cycle == ["a", "b"]
+
+
+def test_topological_order():
+    order = make_graph(("all", "a b"), ("a", "c"), ("b", "c"), ("c", ""), ("unused", "")).topological_order(["all"])
+
+    assert order == ["c", "a", "b", "all"]
+
+
+class TestOutOfDate(object):
+    def test_missing_targets_rebuild(self):
+        graph = make_graph(("all", "a"), ("a", ""))
+
+        assert graph.out_of_date(["all"], {"all": None, "a": None}) == ["a", "all"]
+
+    def test_up_to_date(self):
+        graph = make_graph(("a", "b.c"))
+
+        assert graph.out_of_date(["a"], {"a": 2.0, "b.c": 1.0}) == []
+
+    def test_minimal_rebuild(self):
+        graph = make_graph(("all", "x y"), ("x", "x.c"), ("y", "y.c"))
+        mtimes = {"all": 5.0, "x": 3.0, "x.c": 1.0, "y": 3.0, "y.c": 4.0}
+
+        assert graph.out_of_date(["all"], mtimes) == ["y", "all"]
+
+    def test_missing_source_throws_ValueError(self):
+        with pytest.raises(ValueError):
+            make_graph(("a", "b.c")).out_of_date(["a"], {"a": 1.0, "b.c": None})
+
+    def test_stats_files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src.c").write_text("")
+
+        graph = make_graph(("out", "src.c"))
+
+        assert graph.out_of_date() == ["out"]
+        (tmp_path / "out").write_text("")
+        assert graph.out_of_date() == []
@@ -0,0 +1,98 @@
+from make.macros import MacroTable, MacroError, MacroCycleError
+from make.parser import Macro, Rule, parse_file
+from make.graph import BuildGraph
+import pytest
+
+
+def table(text, env=None):
+    return MacroTable([e for e in parse_file(text)], env)
+
+
+@pytest.mark.parametrize(("text", "expected"), [
+    ("no references", "no references"),
+    ("$(CC) ${CFLAGS}", "gcc -O2 -Wall"),
+    ("$$HOME $$(pwd)", "$HOME $(pwd)"),
+    ("$(UNDEFINED)x", "x"),
+    ("$(SRCS:.c=.o)", "a.o b.o c.h"),
+    ("$($(NAME)_FLAGS)", "-g"),
+    ("$(patsubst %.c,%.o,$(SRCS))", "$(patsubst %.c,%.o,$(SRCS))"),
+    ("$(HOME)", "/home/user"),
+    ("trailing $", "trailing $"),
+])
+def test_expand(text, expected):
+    macros = table("CC = gcc\nOPT = -O2\nCFLAGS = $(OPT) -Wall\nSRCS = a.c b.c c.h\nNAME = DEBUG\nDEBUG_FLAGS = -g\n",
+                   {"HOME": "/home/user"})
+
+    assert macros.expand(text) == expected
+
+
+def test_recursive_and_simple():
+    macros = table("A = $(B)\nSIMPLE := $(B)\nB = first\n")
+    assert macros.value("A") == "first"
+    assert macros.value("SIMPLE") == ""
+
+    macros.define(Macro("B", "=", "second"))
+    assert macros.value("A") == "second"
+
+
+def test_append_and_conditional():
+    macros = table("X = $(Y)\nX += b\nS := a\nS += $(Y)\nY = y\nY ?= z\nZ ?= z\n")
+
+    assert macros.value("X") == "y b"
+    assert macros.value("S") == "a "
+    assert macros.value("Y") == "y"
+    assert macros.value("Z") == "z"
+
+
+def test_memoized_until_dependency_redefined(monkeypatch):
+    macros = table("FLAGS = $(INNER) -c\nINNER = $(DEEP)\nDEEP = -O2\nOTHER = x\n")
+    calls = []
+    expand = MacroTable._expand
+
+    def counting(self, text, *args):
+        calls.append(text)
+        return expand(self, text, *args)
+
+    monkeypatch.setattr(MacroTable, "_expand", counting)
+
+    assert macros.value("FLAGS") == "-O2 -c"
+    first = len(calls)
+    assert macros.value("FLAGS") == "-O2 -c"
+    assert len(calls) == first
+
+    macros.define(Macro("OTHER", "=", "y"))
+    assert macros.value("FLAGS") == "-O2 -c"
+    assert len(calls) == first
+
+    macros.define(Macro("DEEP", "=", "-O3"))
+    assert macros.value("FLAGS") == "-O3 -c"
+    assert len(calls) > first
+
+
+def test_automatic_variables_are_not_memoized():
+    macros = table("OUT = -o $@\n")
+    rule = Rule(["a.o"], ["a.c", "b.h", "a.c"], ["cc $(OUT) $< $^ $+"])
+
+    assert macros.expand_recipe(rule, "a.o") == ["cc -o a.o a.c a.c b.h a.c b.h a.c"]
+    assert macros.expand_recipe(rule._replace(targets=["b.o"]), "b.o")[0].startswith("cc -o b.o")
+
+
+def test_cycle_throws_MacroCycleError():
+    macros = table("A = $(B)\nB = x $(A)\n")
+
+    with pytest.raises(MacroCycleError) as e:
+        macros.value("A")
+
+    assert e.value.cycle == ["A", "B", "A"]
+
+
+def test_unterminated_reference_throws_MacroError():
+    with pytest.raises(MacroError):
+        table("").expand("$(CC")
+
+
+def test_graph_expands_targets_and_prerequisites():
+    graph = BuildGraph(parse_file("OBJS = a.o b.o\nprog: $(OBJS)\n\tcc -o $@ $^\nOBJS = c.o\n"))
+
+    assert graph.prerequisites("prog") == ["a.o", "b.o"]
+    assert graph.macro_table.expand_recipe(graph.rules["prog"], "prog") == ["cc -o prog a.o b.o"]
@@ -0,0 +1,77 @@
+from make.parse_cache import parse_path_cached, load, store, cache_path, VALIDATE_MTIME, VALIDATE_HASH
+from make.parser import parse_path, Rule, Macro
+import os
+import pytest
+
+MAKEFILE = "CC = cc\nall: a.o\n\t$(CC) -o all a.o\n"
+
+
+@pytest.fixture
+def makefile(tmp_path):
+    path = tmp_path / "Makefile"
+    path.write_text(MAKEFILE)
+    return str(path)
+
+
+@pytest.mark.parametrize("validate", [VALIDATE_MTIME, VALIDATE_HASH])
+def test_round_trip(makefile, validate):
+    assert load(makefile, validate) is None
+
+    entries = parse_path_cached(makefile, validate)
+    assert entries == [Macro("CC", "=", "cc"), Rule(["all"], ["a.o"], ["$(CC) -o all a.o"])]
+    assert os.path.exists(cache_path(makefile))
+    assert load(makefile, validate) == entries
+
+
+def test_cache_is_used(makefile, monkeypatch):
+    parse_path_cached(makefile)
+    monkeypatch.setattr("make.parse_cache.parse_path", lambda path: pytest.fail("parsed again"))
+
+    assert parse_path_cached(makefile) == parse_path(makefile)
+
+
+def test_stale_cache_is_ignored(makefile):
+    parse_path_cached(makefile)
+
+    with open(makefile, "a") as fp:
+        fp.write("CFLAGS = -O2\n")
+
+    assert load(makefile) is None
+    assert parse_path_cached(makefile)[-1] == Macro("CFLAGS", "=", "-O2")
+
+
+def test_hash_validation_ignores_touch(makefile):
+    parse_path_cached(makefile, VALIDATE_HASH)
+    os.utime(makefile, (1, 1))
+
+    assert load(makefile, VALIDATE_MTIME) is None
+    assert load(makefile, VALIDATE_HASH) is not None
+
+
+def test_corrupt_cache_is_ignored(makefile):
+    store(makefile, parse_path(makefile))
+    with open(cache_path(makefile), "r+b") as fp:
+        fp.seek(-4, os.SEEK_END)
+        fp.write(b"\xff\xff\xff\xff")
+
+    assert load(makefile) is None
+
+
+def test_unknown_validation_throws_ValueError(makefile):
+    with pytest.raises(ValueError):
+        parse_path_cached(makefile, "size")
+
+
+@pytest.mark.parametrize("validate", [VALIDATE_MTIME, VALIDATE_HASH])
+def test_edit_during_parse_is_not_cached(makefile, monkeypatch, validate):
+    def parse_then_edit(path):
+        entries = parse_path(path)
+        with open(path, "a") as fp:
+            fp.write("CFLAGS = -O2\n")
+        os.utime(path, ns=(1, 1))
+        return entries
+
+    monkeypatch.setattr("make.parse_cache.parse_path", parse_then_edit)
+    parse_path_cached(makefile, validate)
+
+    assert load(makefile, validate) is None
@@ -1,4 +1,5 @@
-from make.parser import parse_dependency_line, Rule, Macro, parse_file
+from make.parser import parse_dependency_line, Rule, Macro, parse_file, parse_path, LineCursor
+from io import StringIO, BytesIO
 import pytest
 
 class TestParseDependencyLine(object):
@@ -49,6 +50,16 @@ class TestParseMacro(object):
         line = ["FOOBAR = test.c"]
         assert Macro.parse_macro(line) == Macro("FOOBAR", "=", "test.c")
 
+    @pytest.mark.parametrize(("line", "expected"), [
+        ("CC := gcc", Macro("CC", ":=", "gcc")),
+        ("CC::=gcc", Macro("CC", "::=", "gcc")),
+        ("CFLAGS += -O2", Macro("CFLAGS", "+=", "-O2")),
+        ("PREFIX ?= /usr", Macro("PREFIX", "?=", "/usr")),
+        ("OPTS = a=b", Macro("OPTS", "=", "a=b")),
+    ])
+    def test_operators(self, line, expected):
+        assert Macro.parse_macro([line]) == expected
+
 
 SAMPLE_MAKE = """
 # Comment
@@ -72,4 +83,47 @@ SAMPLE_MAKE_EXPECTED = [
 def test_parse_file():
     actual = parse_file(SAMPLE_MAKE)
     
-    assert actual == SAMPLE_MAKE_EXPECTED
\ No newline at end of file
+    assert actual == SAMPLE_MAKE_EXPECTED
+
+class TestLineCursor(object):
+    def test_peek_does_not_consume(self):
+        cursor = LineCursor(["a", "b"])
+        assert cursor.peek() == "a"
+        assert cursor.peek() == "a"
+        assert cursor.pop() == "a"
+        assert cursor.pop() == "b"
+        assert not cursor
+
+    def test_pop_exhausted_throws_IndexError(self):
+        with pytest.raises(IndexError):
+            LineCursor([]).pop()
+
+
+def test_parse_rule_consumes_list():
+    lines = ["a: b", "\tc", "d = e"]
+    Rule.parse_rule(lines)
+    assert lines == ["d = e"]
+
+
+@pytest.mark.parametrize("source", [
+    SAMPLE_MAKE,
+    SAMPLE_MAKE.encode(),
+    StringIO(SAMPLE_MAKE),
+    BytesIO(SAMPLE_MAKE.replace("\n", "\r\n").encode()),
+])
+def test_parse_file_sources(source):
+    assert parse_file(source) == SAMPLE_MAKE_EXPECTED
+
+
+def test_parse_path(tmp_path):
+    makefile = tmp_path / "Makefile"
+    makefile.write_text(SAMPLE_MAKE)
+
+    assert parse_path(str(makefile)) == SAMPLE_MAKE_EXPECTED
+
+
+def test_parse_path_empty(tmp_path):
+    makefile = tmp_path / "Makefile"
+    makefile.write_text("")
+
+    assert parse_path(str(makefile)) == []
@@ -0,0 +1,263 @@
+from make.remote import RemoteExecutor, parse_address, is_relative
+from make.executor import Executor, Job
+from make.cli import make
+from io import StringIO
+import subprocess
+import threading
+import socket
+import time
+import sys
+import os
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_worker(directory, name: str, slots: int = 1) -> subprocess.Popen:
+    address = str(directory / f"{name}.sock")
+    proc = subprocess.Popen([sys.executable, "-m", "make.worker", "-j", str(slots), "--dir", str(directory / name),
+                             address], cwd=SRC)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(address):
+        if time.monotonic() > deadline or proc.poll() is not None:
+            proc.kill()
+            pytest.fail(f"worker {name} did not start")
+        time.sleep(0.01)
+
+    proc.address = address
+    return proc
+
+
+@pytest.fixture
+def workers(tmp_path):
+    procs = [start_worker(tmp_path, f"w{i}") for i in range(2)]
+    yield procs
+
+    for proc in procs:
+        proc.terminate()
+        proc.wait()
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    directory = tmp_path / "project"
+    (directory / "src").mkdir(parents=True)
+    (directory / "src" / "a.c").write_text("int a;\n")
+    (directory / "src" / "b.c").write_text("int b;\n")
+    monkeypatch.chdir(directory)
+    return directory
+
+
+def test_parse_address():
+    assert parse_address("/tmp/w.sock") == (socket.AF_UNIX, "/tmp/w.sock")
+    assert parse_address("w.sock") == (socket.AF_UNIX, "w.sock")
+    assert parse_address("build1:7000") == (socket.AF_INET, ("build1", 7000))
+    assert parse_address(":7000") == (socket.AF_INET, ("localhost", 7000))
+    with pytest.raises(ValueError):
+        parse_address("build1:http")
+
+
+def test_is_relative():
+    assert is_relative("obj/a.o")
+    assert not is_relative("/usr/include/stdio.h")
+    assert not is_relative("../a.o")
+    assert not is_relative("")
+
+
+def test_run_job(workers, project):
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address]) as executor:
+        job = Job("obj/a.o", ["cat src/a.c > obj/a.o", "@echo done", "@chmod +x obj/a.o"], ["src/a.c", "all"],
+                  ["obj/a.o"])
+        status = executor.run(job, {"PATH": os.environ["PATH"]}, f_out)
+
+    assert status == 0
+    assert f_out.getvalue() == "cat src/a.c > obj/a.o\ndone\n"
+    assert (project / "obj" / "a.o").read_text() == "int a;\n"
+    assert os.access(project / "obj" / "a.o", os.X_OK)
+
+
+def test_tcp_worker(project, tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        address = f"127.0.0.1:{probe.getsockname()[1]}"
+
+    proc = subprocess.Popen([sys.executable, "-m", "make.worker", "-j", "2", "--dir", str(tmp_path / "tcp"), address],
+                            cwd=SRC)
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                executor = RemoteExecutor([address])
+                break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    pytest.fail("worker did not start")
+                time.sleep(0.01)
+
+        with executor:
+            assert executor.slots == 2
+            assert executor.run(Job("a.o", ["@cp src/a.c a.o"], ["src/a.c"], ["a.o"]), {}, StringIO()) == 0
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    assert (project / "a.o").read_text() == "int a;\n"
+
+
+def test_run_job_failure(workers, project):
+    with RemoteExecutor([workers[0].address]) as executor:
+        assert executor.run(Job("x", ["@exit 3"], [], ["x"]), {}, StringIO()) == 3
+        assert not (project / "x").exists()
+
+
+def test_inputs_are_sent_once_over_a_pooled_connection(workers, project):
+    with RemoteExecutor([workers[0].address]) as executor:
+        for target in ("a.o", "b.o", "c.o"):
+            assert executor.run(Job(target, [f"cp src/a.c {target}"], ["src/a.c"], [target]), {}, StringIO()) == 0
+
+        worker = executor.workers[0]
+        assert (worker.jobs, worker.files_sent) == (3, 1)
+        assert len(worker.idle) == 1
+
+
+def test_placement_prefers_cached_inputs(workers, project):
+    with RemoteExecutor([w.address for w in workers]) as executor:
+        executor.run(Job("b.o", ["cp src/b.c b.o"], ["src/b.c"], ["b.o"]), {}, StringIO())
+        first = next(w for w in executor.workers if w.jobs)
+
+        for target in ("b2.o", "b3.o"):
+            executor.run(Job(target, [f"cp src/b.c {target}"], ["src/b.c"], [target]), {}, StringIO())
+
+        assert first.jobs == 3
+        assert sum(w.files_sent for w in executor.workers) == 1
+
+
+def test_placement_spreads_load(workers, project):
+    with RemoteExecutor([w.address for w in workers]) as executor:
+        assert executor.slots == 2
+
+        def run(target):
+            executor.run(Job(target, [f"sleep 0.2; cp src/a.c {target}"], ["src/a.c"], [target]), {}, StringIO())
+
+        threads = [threading.Thread(target=run, args=(t,)) for t in ("1.o", "2.o")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [w.jobs for w in executor.workers] == [1, 1]
+
+
+def test_unreachable_workers(workers, project, tmp_path):
+    with pytest.raises(OSError):
+        RemoteExecutor([str(tmp_path / "none.sock")])
+
+    with RemoteExecutor([str(tmp_path / "none.sock"), workers[0].address]) as executor:
+        assert executor.slots == 1
+        assert executor.run(Job("a.o", ["cp src/a.c a.o"], ["src/a.c"], ["a.o"]), {}, StringIO()) == 0
+
+
+def test_failed_worker_falls_back_to_local(workers, project):
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address]) as executor:
+        workers[0].terminate()
+        workers[0].wait()
+        for sock in executor.workers[0].idle:
+            sock.shutdown(socket.SHUT_RDWR)
+
+        assert executor.run(Job("a.o", ["@cp src/a.c a.o"], ["src/a.c"], ["a.o"]), {}, f_out) == 0
+
+    assert "failed" in f_out.getvalue()
+    assert (project / "a.o").read_text() == "int a;\n"
+
+
+def test_absolute_outputs_run_locally(workers, project, tmp_path):
+    output = tmp_path / "out.o"
+    with RemoteExecutor([workers[0].address]) as executor:
+        assert executor.run(Job(str(output), [f"@cp src/a.c {output}"], [], [str(output)]), {}, StringIO()) == 0
+        assert executor.workers[0].jobs == 0
+
+    assert output.exists()
+
+
+def test_make_with_workers(workers, project):
+    (project / "Makefile").write_text("all: a.o b.o\n\t@cat a.o b.o > all\n%s" % "".join(
+        f"{n}.o: src/{n}.c\n\t@cp src/{n}.c {n}.o\n" for n in "ab"))
+    f_out, f_err = StringIO(), StringIO()
+
+    assert make(["--workers", ",".join(w.address for w in workers)], {"PATH": os.environ["PATH"]}, f_out, f_err) == 0
+    assert (project / "all").read_text() == "int a;\nint b;\n"
+    assert f_err.getvalue() == ""
+
+
+def test_make_without_reachable_workers(project, tmp_path):
+    (project / "Makefile").write_text("a.o: src/a.c\n\t@cp src/a.c a.o\n")
+    f_err = StringIO()
+
+    assert make(["--workers", str(tmp_path / "none.sock")], {}, StringIO(), f_err) == 0
+    assert "running recipes locally" in f_err.getvalue()
+    assert (project / "a.o").exists()
+
+
+def test_executor_is_abstract():
+    with pytest.raises(TypeError):
+        Executor()
+
+
+def test_failed_job_is_reported(workers, project):
+    # src/b.c is not a prerequisite, so it is missing on the worker
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address]) as executor:
+        assert executor.run(Job("b.o", ["@cp src/b.c b.o"], ["src/a.c"], ["b.o"]), {}, f_out) != 0
+        assert not executor.workers[0].down
+
+    assert "No such file" in f_out.getvalue()
+    assert "running it locally" not in f_out.getvalue()
+    assert not (project / "b.o").exists()
+
+
+def test_failed_job_runs_locally(workers, project):
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address], retry_failed=True) as executor:
+        assert executor.run(Job("b.o", ["@cp src/b.c b.o"], ["src/a.c"], ["b.o"]), {}, f_out) == 0
+        assert not executor.workers[0].down
+
+    assert "failed on worker" in f_out.getvalue()
+    assert (project / "b.o").read_text() == "int b;\n"
+
+
+def test_side_outputs(workers, project):
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address]) as executor:
+        job = Job("a.o", ["@cp src/a.c a.o", "@echo 'a.o: src/a.c' > a.d", "@touch scratch"], ["src/a.c"],
+                  ["a.o", "a.d"])
+        assert executor.run(job, {"PATH": os.environ["PATH"]}, f_out) == 0
+
+    assert (project / "a.d").read_text() == "a.o: src/a.c\n"
+    assert not (project / "scratch").exists()
+    assert "'scratch' is not a target" in f_out.getvalue()
+
+
+def test_job_error_keeps_the_worker(workers, project):
+    f_out = StringIO()
+    with RemoteExecutor([workers[0].address]) as executor:
+        # An input that changes while it is sent does not match its digest
+        digest = executor.hasher.hash
+        executor.hasher.hash = lambda path: "0" * 64
+        assert executor.run(Job("a.o", ["@cp src/a.c a.o"], ["src/a.c"], ["a.o"]), {}, f_out) == 0
+        assert "could not run 'a.o'" in f_out.getvalue()
+
+        executor.hasher.hash = digest
+        assert executor.run(Job("b.o", ["@cp src/b.c b.o"], ["src/b.c"], ["b.o"]), {}, StringIO()) == 0
+        assert executor.workers[0].jobs == 2
+        assert not executor.workers[0].down
+
+
+def test_make_sends_back_rule_targets(workers, project):
+    (project / "Makefile").write_text("a.o a.d: src/a.c\n\t@cp src/a.c a.o; echo 'a.o: src/a.c' > a.d\n")
+    f_out = StringIO()
+
+    assert make(["--workers", workers[0].address, "a.o"], {"PATH": os.environ["PATH"]}, f_out, StringIO()) == 0
+    assert (project / "a.d").exists()
+    assert "not a target" not in f_out.getvalue()
@@ -0,0 +1,126 @@
+from make.graph import BuildGraph
+from make.parser import Rule
+from make.scheduler import schedule
+from make.aio import schedule_async
+import asyncio
+import threading
+import time
+import pytest
+
+
+def make_graph(*rules):
+    return BuildGraph([Rule(t.split(), c.split(), ["recipe"]) for t, c in rules])
+
+
+def test_runs_in_dependency_order():
+    graph = make_graph(("all", "a b"), ("a", "c"), ("b", "c"), ("c", ""))
+    ran = []
+    lock = threading.Lock()
+
+    def run(target):
+        with lock:
+            ran.append(target)
+        return 0
+
+    report = schedule(graph, graph.topological_order(["all"]), run, jobs=4)
+
+    assert ran[0] == "c" and ran[-1] == "all"
+    assert sorted(ran) == ["a", "all", "b", "c"]
+    assert report.failed == [] and report.skipped == []
+
+
+def test_runs_independent_targets_in_parallel():
+    graph = make_graph(("all", "a b c d"), ("a", ""), ("b", ""), ("c", ""), ("d", ""))
+    barrier = threading.Barrier(4, timeout=5)
+
+    def run(target):
+        if target != "all":
+            barrier.wait()
+        return 0
+
+    report = schedule(graph, graph.topological_order(["all"]), run, jobs=4)
+
+    assert len({report.jobs[t].worker for t in "abcd"}) == 4
+
+
+def test_failure_skips_dependents():
+    graph = make_graph(("all", "a b"), ("a", ""), ("b", ""))
+
+    report = schedule(graph, ["a", "b", "all"], lambda t: 1 if t == "a" else 0, jobs=1, keep_going=True)
+
+    assert report.failed == ["a"]
+    assert report.skipped == ["all"]
+    assert "b" in report.jobs
+
+
+def test_failure_stops_build():
+    graph = make_graph(("all", "a b"), ("a", ""), ("b", ""))
+
+    report = schedule(graph, ["a", "b", "all"], lambda t: 1 if t == "a" else 0, jobs=1)
+
+    assert report.failed == ["a"]
+    assert sorted(report.skipped) == ["all", "b"]
+
+
+def test_critical_path_and_utilization():
+    graph = make_graph(("all", "slow fast"), ("slow", "base"), ("fast", ""), ("base", ""))
+    delays = {"base": 0.05, "slow": 0.05, "fast": 0.0, "all": 0.0}
+
+    def run(target):
+        time.sleep(delays[target])
+        return 0
+
+    report = schedule(graph, graph.topological_order(["all"]), run, jobs=2)
+
+    assert report.critical_path == ["base", "slow", "all"]
+    assert report.critical_path_time >= 0.1
+    assert set(report.worker_busy) == {0, 1}
+    assert all(0.0 <= u <= 1.0 for u in report.utilization().values())
+
+
+def test_invalid_jobs_throws_ValueError():
+    with pytest.raises(ValueError):
+        schedule(make_graph(), [], lambda t: 0, jobs=0)
+
+
+def test_make_cli(tmp_path, monkeypatch):
+    from make.cli import make
+    from io import StringIO
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all: out\n\n.PHONY: all\nout:\n\t@touch out\n\techo built\n")
+
+    out, err = StringIO(), StringIO()
+    assert make(["-j", "2"], {"PATH": "/bin:/usr/bin"}, out, err) == 0
+    assert out.getvalue() == "echo built\nbuilt\n"
+    assert (tmp_path / "out").exists()
+
+
+def test_schedule_async():
+    graph = make_graph(("all", "a b c"), ("a", ""), ("b", ""), ("c", "a"))
+    ran = []
+
+    async def run(target):
+        await asyncio.sleep(0.01)
+        ran.append(target)
+        return 1 if target == "b" else 0
+
+    report = asyncio.run(schedule_async(graph, graph.topological_order(["all"]), run, jobs=3, keep_going=True))
+
+    assert sorted(ran) == ["a", "b", "c"]
+    assert ran.index("a") < ran.index("c")
+    assert report.failed == ["b"] and report.skipped == ["all"]
+
+
+def test_make_cli_asyncio(tmp_path, monkeypatch):
+    from make.cli import make
+    from io import StringIO
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all: a b\n\n.PHONY: all\na:\n\t@sleep 0.05; echo a1; echo a2\nb:\n\t@echo b1\n")
+
+    out, err = StringIO(), StringIO()
+    assert make(["-j", "2", "--scheduler", "asyncio"], {"PATH": "/bin:/usr/bin"}, out, err) == 0
+    assert out.getvalue() == "b1\na1\na2\n"
+
+    assert make(["--scheduler", "fibers"], {}, out, err) == 2
@@ -0,0 +1,228 @@
+from make.server import BuildServer, MakefileCache, DirectoryLock, JobSlots, unshare_working_directory
+from make.client import run_remote
+from main import main
+from io import StringIO
+import threading
+import pytest
+import sys
+import os
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def serve(tmp_path, jobs: int):
+    path = str(tmp_path / "make.sock")
+    cwd = os.getcwd()
+    server = BuildServer(path, jobs=jobs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    # Where builds cannot have a working directory of their own, the server changes that of the whole process
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def server(tmp_path):
+    yield from serve(tmp_path, 2)
+
+
+@pytest.fixture
+def single_slot_server(tmp_path):
+    yield from serve(tmp_path, 1)
+
+
+@pytest.fixture
+def project(tmp_path):
+    directory = tmp_path / "project"
+    directory.mkdir()
+    (directory / "Makefile").write_text("all: out.txt\n\t@echo done\nout.txt:\n\t@echo built > out.txt\n")
+    return directory
+
+
+def test_run_remote(server, project):
+    f_out, f_err = StringIO(), StringIO()
+
+    status = run_remote(server.server_address, [], {}, str(project), f_out, f_err)
+
+    assert status == 0
+    assert "done" in f_out.getvalue()
+    assert (project / "out.txt").read_text() == "built\n"
+
+
+def test_run_remote_reports_failure(server, project):
+    f_out, f_err = StringIO(), StringIO()
+
+    status = run_remote(server.server_address, ["missing"], {}, str(project), f_out, f_err)
+
+    assert status != 0
+    assert "missing" in f_err.getvalue()
+
+
+def test_run_remote_bad_directory(server, tmp_path):
+    f_err = StringIO()
+
+    assert run_remote(server.server_address, [], {}, str(tmp_path / "gone"), StringIO(), f_err) == 2
+    assert "make:" in f_err.getvalue()
+
+
+def test_makefile_cache_reuses_parse(server, project):
+    for _ in range(3):
+        assert run_remote(server.server_address, [], {}, str(project), StringIO(), StringIO()) == 0
+
+    assert server.makefiles.misses == 1
+    assert server.makefiles.hits == 2
+
+
+def test_makefile_cache_reparses_changes(tmp_path):
+    makefile = tmp_path / "Makefile"
+    makefile.write_text("a:\n")
+    cache = MakefileCache()
+
+    first = cache.parse(str(makefile))
+    makefile.write_text("a: b\nb:\n")
+
+    assert cache.parse(str(makefile)) != first
+    assert cache.misses == 2
+
+
+def test_concurrent_builds(server, tmp_path):
+    projects = []
+    for i in range(4):
+        directory = tmp_path / f"p{i}"
+        directory.mkdir()
+        (directory / "Makefile").write_text(f"all:\n\t@echo project {i}\n")
+        projects.append(directory)
+
+    results = {}
+
+    def build(i):
+        f_out = StringIO()
+        results[i] = (run_remote(server.server_address, [], {}, str(projects[i]), f_out, StringIO()),
+                      f_out.getvalue())
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: (0, f"project {i}\n") for i in range(4)}
+
+
+def test_directory_lock_serializes_directories(tmp_path):
+    lock = DirectoryLock()
+    cwd = os.getcwd()
+    order = []
+    try:
+        lock.acquire(str(tmp_path))
+        lock.acquire(str(tmp_path))
+
+        def other():
+            lock.acquire(cwd)
+            order.append("other")
+            lock.release()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        order.append("first")
+        lock.release()
+        lock.release()
+        thread.join()
+    finally:
+        os.chdir(cwd)
+
+    assert order == ["first", "other"]
+
+
+def test_builds_share_the_index(server, project):
+    (project / "out.txt").write_text("built\n")
+    old = os.stat(project).st_mtime - 60
+    os.utime(project, (old, old))
+
+    for _ in range(2):
+        assert run_remote(server.server_address, [], {}, str(project), StringIO(), StringIO()) == 0
+
+    # The second build only checks that the directory did not change
+    assert (server.index.hits, server.index.misses) == (1, 1)
+
+
+def test_job_slots_lend_the_recipe_slot():
+    pool = JobSlots(1)
+    parent = pool.start()
+    with parent:
+        nested = pool.start(parent.id)
+        # The recipe only holds one slot, so a second build it starts waits for a slot of its own
+        other = pool.start(parent.id)
+        assert nested.lender is parent and other.lender is None
+
+        with nested:
+            assert nested.held == 1
+            assert not pool.semaphore.acquire(blocking=False)
+
+        pool.finish(nested)
+        pool.finish(other)
+        assert parent.lent == 0
+
+    pool.finish(parent)
+    assert pool.semaphore.acquire(blocking=False)
+
+
+def test_main_uses_server(server, project, monkeypatch):
+    monkeypatch.chdir(project)
+    f_out = StringIO()
+
+    assert main(["main.py", "make"], {"PYMAKE_SERVER": server.server_address}, f_out=f_out, f_err=StringIO()) == 0
+    assert "done" in f_out.getvalue()
+    assert server.makefiles.misses == 1
+
+
+def test_main_falls_back_without_server(project, tmp_path, monkeypatch):
+    monkeypatch.chdir(project)
+    f_out = StringIO()
+
+    assert main(["main.py", "make"], {"PYMAKE_SERVER": str(tmp_path / "none.sock")}, f_out=f_out,
+                f_err=StringIO()) == 0
+    assert "done" in f_out.getvalue()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="builds share the working directory")
+@pytest.mark.parametrize("command", ["cd sub && {make}", "{make} -f sub/Makefile nested"])
+def test_nested_make(single_slot_server, project, command):
+    # A recipe that runs make through the server, which must neither wait for the directory nor for a job slot
+    (project / "sub").mkdir()
+    (project / "sub" / "Makefile").write_text("nested:\n\t@echo nested > nested.txt\n")
+    make = f"{sys.executable} {MAIN} make"
+    (project / "Makefile").write_text(f"all:\n\t@{command.format(make=make)}\n")
+    env = {"PATH": os.environ["PATH"], "PYMAKE_SERVER": single_slot_server.server_address}
+    result = []
+
+    thread = threading.Thread(target=lambda: result.append(
+        run_remote(single_slot_server.server_address, [], env, str(project), StringIO(), StringIO())), daemon=True)
+    thread.start()
+    thread.join(30)
+
+    assert result == [0]
+    assert single_slot_server.makefiles.misses == 2
+    assert os.path.exists(project / ("sub" if command.startswith("cd") else "") / "nested.txt")
+
+
+def test_unshare_working_directory(tmp_path):
+    cwd = os.getcwd()
+    seen = []
+
+    def build():
+        if unshare_working_directory():
+            os.chdir(tmp_path)
+        seen.append(os.getcwd())
+
+    thread = threading.Thread(target=build)
+    thread.start()
+    thread.join()
+
+    assert os.getcwd() == cwd
+    if sys.platform.startswith("linux"):
+        assert seen == [str(tmp_path)]
@@ -0,0 +1,74 @@
+from make import trace
+from make.cli import make
+from io import StringIO
+import json
+import threading
+import pytest
+
+
+@pytest.fixture
+def tracer():
+    yield trace.enable()
+    trace.disable()
+
+
+def test_span_is_noop_when_off():
+    assert trace.current() is None
+    assert trace.span("x", "y") is trace.NULL_SPAN
+
+    with trace.span("x", "y") as span:
+        span.args["status"] = 1
+    assert trace.NULL_SPAN.args == {}
+
+
+def test_span_records_complete_event(tracer):
+    with trace.span("work", "test", n=1) as span:
+        span.args["status"] = 0
+
+    thread = threading.Thread(target=tracer.instant, args=("mark", "test"))
+    thread.start()
+    thread.join()
+
+    work, mark = tracer.events
+    assert (work["name"], work["cat"], work["ph"]) == ("work", "test", "X")
+    assert work["dur"] >= 0 and work["args"]["n"] == 1 and work["args"]["status"] == 0
+    assert "thread_cpu_ms" in work["args"]
+    assert mark["ph"] == "i" and mark["tid"] != work["tid"]
+
+
+def test_span_records_errors(tracer):
+    with pytest.raises(KeyError):
+        with trace.span("fails", "test"):
+            raise KeyError("x")
+
+    assert tracer.events[0]["args"]["error"] == "KeyError('x')"
+
+
+def test_dump_names_threads(tracer):
+    tracer.instant("a", "test")
+    out = StringIO()
+    tracer.dump(out)
+
+    data = json.loads(out.getvalue())
+    assert data["traceEvents"][0]["ph"] == "M"
+    assert data["traceEvents"][0]["args"] == {"name": "thread 0"}
+    assert data["traceEvents"][1]["name"] == "a"
+
+
+@pytest.mark.parametrize("scheduler", ["threads", "asyncio"])
+def test_make_trace(tmp_path, monkeypatch, scheduler):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").write_text("")
+    (tmp_path / "Makefile").write_text("out: src\n\t@echo hi\n\t@true > out\n")
+
+    out, err = StringIO(), StringIO()
+    assert make(["--trace", "trace.json", "--scheduler", scheduler], {"PATH": "/bin:/usr/bin"}, out, err) == 0
+    assert trace.current() is None
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    names = {(e["cat"], e["name"]) for e in events if e["ph"] != "M"}
+    assert {("make", "parse"), ("make", "build graph"), ("make", "out of date"), ("stat", "out"),
+            ("stat", "src"), ("recipe", "out"), ("builtin", "echo"), ("command", "sh")} <= names
+
+    command = next(e for e in events if e.get("cat") == "command")
+    assert command["args"]["command"] == "true > out" and command["args"]["status"] == 0
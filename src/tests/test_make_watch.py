@@ -0,0 +1,125 @@
+from make.parser import iter_sections, parse_file
+from make.watch import SectionParser, Watcher
+from make.inotify import Inotify
+from pathlib import Path
+import threading
+import pytest
+
+MAKEFILE = "CC = cc\n# objects\nall: a.o b.o\n\t@echo linking\n\techo still recipe\n\na.o: a.c\n\t$(CC) -c a.c\nb.o: b.c\n"
+
+
+@pytest.fixture
+def inotify_available():
+    try:
+        Inotify().close()
+    except OSError:
+        pytest.skip("inotify is not available")
+
+
+def test_iter_sections():
+    sections = list(iter_sections(MAKEFILE.splitlines()))
+
+    assert sections == [["CC = cc"], ["# objects"], ["all: a.o b.o", "\t@echo linking", "\techo still recipe"], [""],
+                        ["a.o: a.c", "\t$(CC) -c a.c"], ["b.o: b.c"]]
+
+
+def test_section_parser_only_parses_changes():
+    parser = SectionParser()
+
+    assert parser.parse(MAKEFILE) == parse_file(MAKEFILE)
+    assert parser.parsed == 6
+
+    changed = MAKEFILE.replace("b.o: b.c", "b.o: b.c b.h")
+    assert parser.parse(changed) == parse_file(changed)
+    assert parser.parsed == 1
+
+    assert parser.parse(MAKEFILE) == parse_file(MAKEFILE)
+    assert parser.parsed == 1
+
+
+class Builds(object):
+    """Records each build and touches the targets that are files"""
+
+    def __init__(self):
+        self.targets = []
+        self.done = threading.Semaphore(0)
+
+    def __call__(self, graph, targets):
+        self.targets.append(targets)
+        for t in targets:
+            if t not in graph.phony:
+                Path(t).touch()
+        self.done.release()
+        return 0
+
+    def wait(self):
+        assert self.done.acquire(timeout=5), "no build happened"
+        return self.targets[-1]
+
+
+def test_affected(tmp_path, monkeypatch, inotify_available):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all: x y\nx: a\ny: b\nz: a\n.PHONY: all\n")
+
+    with Watcher("Makefile", [], {}, Builds()) as watcher:
+        watcher.load()
+
+        assert watcher.affected(["a"]) == {"a", "x", "z", "all"}
+        assert watcher.affected(["y"]) == {"y", "all"}
+
+
+def test_watch_rebuilds_affected_targets(tmp_path, monkeypatch, inotify_available):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    for name in ("a.c", "b.c"):
+        (tmp_path / "src" / name).write_text("")
+    (tmp_path / "Makefile").write_text("all: a.o b.o\na.o: src/a.c\nb.o: src/b.c\n.PHONY: all\n")
+
+    builds = Builds()
+    with Watcher("Makefile", [], {}, builds, debounce=0.05) as watcher:
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        try:
+            assert builds.wait() == ["a.o", "b.o", "all"]
+
+            (tmp_path / "src" / "b.c").write_text("changed")
+            assert builds.wait() == ["b.o", "all"]
+
+            # Only the new rule's section is parsed
+            (tmp_path / "Makefile").write_text("all: a.o b.o c.o\na.o: src/a.c\nb.o: src/b.c\n.PHONY: all\nc.o: src/a.c\n")
+            assert builds.wait() == ["c.o", "all"]
+            assert watcher.parser.parsed == 2
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        assert not thread.is_alive()
+        assert len(builds.targets) == 3
+
+
+def test_watch_reloads_included_files(tmp_path, monkeypatch, inotify_available):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.c", "a.h"):
+        (tmp_path / name).write_text("")
+    (tmp_path / "a.d").write_text("a.o: a.c\n")
+    (tmp_path / "Makefile").write_text("a.o: a.c\n-include a.d\n")
+
+    builds = Builds()
+    with Watcher("Makefile", [], {}, builds, debounce=0.05) as watcher:
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        try:
+            assert builds.wait() == ["a.o"]
+
+            # The compiler found a new header, which a.o now depends on
+            (tmp_path / "a.d").write_text("a.o: a.c a.h\n")
+            assert builds.done.acquire(timeout=0.5) is False
+            assert watcher.graph.rules["a.o"].components == ["a.c", "a.h"]
+
+            (tmp_path / "a.h").write_text("changed")
+            assert builds.wait() == ["a.o"]
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        assert not thread.is_alive()